@@ -9,7 +9,7 @@ from pythonjsonlogger.jsonlogger import JsonFormatter
 
 from app.middleware import RequestId
 from app.views import bp as app_views_bp
-from environment_settings import APP_X_FORWARDED_NUMBER
+from environment_settings import APP_X_FORWARDED_NUMBER, APP_CACHE_TYPE
 from payments.views import bp as payments_views_bp
 from autoclient_payments.views.views import bp as autoclient_payments_views_bp
 from liqpay_int.api import bp as liqpay_resources_bp
@@ -33,7 +33,7 @@ logger_root.setLevel(logging.INFO)
 
 # Flask
 
-cache = Cache(config={'CACHE_TYPE': 'simple'})
+cache = Cache(config={'CACHE_TYPE': APP_CACHE_TYPE})
 app = Flask(__name__, template_folder="templates")
 cache.init_app(app)
 
@@ -0,0 +1,105 @@
+import pickle
+from datetime import datetime, timedelta
+
+from bson import Binary
+from flask_caching.backends.base import BaseCache
+from pymongo.errors import PyMongoError, DuplicateKeyError
+
+from app.logging import getLogger
+from celery_worker.locks import get_mongodb_collection
+from environment_settings import APP_CACHE_COLLECTION, APP_CACHE_MAX_TIMEOUT
+
+logger = getLogger()
+
+
+class MongoDBCache(BaseCache):
+    """
+    Flask cache backend that is shared by all the app processes.
+    Values are pickled and stored with expireAt field, the documents are removed by a TTL index
+    (see edr_bot.results_db.init_cache_index), until then the expired ones are ignored.
+    Every value expires in max_timeout seconds at most, even if it's set without timeout,
+    so the collection doesn't grow forever.
+    The errors are logged and the cache acts as an empty one, so requests are processed without it
+
+    Usage: APP_CACHE_TYPE=app.cache.MongoDBCache
+    """
+
+    def __init__(self, default_timeout=300, collection_name=APP_CACHE_COLLECTION, max_timeout=APP_CACHE_MAX_TIMEOUT):
+        super().__init__(default_timeout=default_timeout)
+        self.collection_name = collection_name
+        self.max_timeout = max_timeout
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        return cls(*args, **kwargs)
+
+    @property
+    def collection(self):
+        return get_mongodb_collection(self.collection_name)
+
+    def _expire_at(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        if timeout <= 0 or timeout > self.max_timeout:
+            timeout = self.max_timeout
+        return datetime.utcnow() + timedelta(seconds=timeout)
+
+    def _document(self, key, value, timeout):
+        return {"_id": key, "value": Binary(pickle.dumps(value)), "expireAt": self._expire_at(timeout)}
+
+    def get(self, key):
+        try:
+            doc = self.collection.find_one({"_id": key})
+        except PyMongoError as e:
+            logger.exception(e, extra={"MESSAGE_ID": "APP_CACHE_MONGODB_EXCEPTION"})
+            return None
+        if doc is None or "expireAt" in doc and doc["expireAt"] <= datetime.utcnow():
+            return None
+        return pickle.loads(doc["value"])
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def set(self, key, value, timeout=None):
+        try:
+            self.collection.replace_one({"_id": key}, self._document(key, value, timeout), upsert=True)
+        except PyMongoError as e:
+            logger.exception(e, extra={"MESSAGE_ID": "APP_CACHE_MONGODB_EXCEPTION"})
+            return False
+        return True
+
+    def add(self, key, value, timeout=None):
+        """
+        Sets the value only if the key doesn't exist or is expired.
+        Returns True if mongodb isn't available, so the ones who use it as a lock aren't blocked
+        """
+        try:
+            self.collection.replace_one(
+                {"_id": key, "expireAt": {"$lte": datetime.utcnow()}},
+                self._document(key, value, timeout),
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        except PyMongoError as e:
+            logger.exception(e, extra={"MESSAGE_ID": "APP_CACHE_MONGODB_EXCEPTION"})
+            logger.warning(
+                f"Cache key {key} is considered added without storing it, the lock it guards isn't held",
+                extra={"MESSAGE_ID": "APP_CACHE_ADD_MONGODB_EXCEPTION"}
+            )
+        return True
+
+    def delete(self, key):
+        try:
+            result = self.collection.delete_one({"_id": key})
+        except PyMongoError as e:
+            logger.exception(e, extra={"MESSAGE_ID": "APP_CACHE_MONGODB_EXCEPTION"})
+            return False
+        return result.deleted_count > 0
+
+    def clear(self):
+        try:
+            self.collection.delete_many({})
+        except PyMongoError as e:
+            logger.exception(e, extra={"MESSAGE_ID": "APP_CACHE_MONGODB_EXCEPTION"})
+            return False
+        return True
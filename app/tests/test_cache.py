@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+from bson import Binary
+from unittest.mock import patch, Mock, ANY
+from pymongo.errors import DuplicateKeyError, ConnectionFailure
+from app.cache import MongoDBCache
+import pickle
+import unittest
+
+
+@patch("app.cache.get_mongodb_collection")
+class MongoDBCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = MongoDBCache(default_timeout=60, collection_name="test_cache")
+
+    def test_get(self, get_collection):
+        get_collection.return_value.find_one.return_value = {
+            "_id": "key",
+            "value": pickle.dumps({"data": [1]}),
+            "expireAt": datetime.utcnow() + timedelta(seconds=10),
+        }
+
+        self.assertEqual(self.cache.get("key"), {"data": [1]})
+        get_collection.assert_called_once_with("test_cache")
+        get_collection.return_value.find_one.assert_called_once_with({"_id": "key"})
+
+    def test_get_expired(self, get_collection):
+        get_collection.return_value.find_one.return_value = {
+            "_id": "key",
+            "value": pickle.dumps({"data": [1]}),
+            "expireAt": datetime.utcnow() - timedelta(seconds=1),
+        }
+
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_get_not_expiring(self, get_collection):
+        get_collection.return_value.find_one.return_value = {"_id": "key", "value": pickle.dumps(1)}
+
+        self.assertEqual(self.cache.get("key"), 1)
+
+    def test_get_missing(self, get_collection):
+        get_collection.return_value.find_one.return_value = None
+
+        self.assertIsNone(self.cache.get("key"))
+        self.assertFalse(self.cache.has("key"))
+
+    def test_get_error(self, get_collection):
+        get_collection.return_value.find_one.side_effect = ConnectionFailure()
+
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_set(self, get_collection):
+        self.assertTrue(self.cache.set("key", {"data": 1}, timeout=30))
+
+        get_collection.return_value.replace_one.assert_called_once_with(
+            {"_id": "key"},
+            {"_id": "key", "value": Binary(pickle.dumps({"data": 1})), "expireAt": ANY},
+            upsert=True,
+        )
+        doc = get_collection.return_value.replace_one.call_args[0][1]
+        self.assertAlmostEqual(
+            (doc["expireAt"] - datetime.utcnow()).total_seconds(), 30, delta=5
+        )
+
+    def test_set_no_timeout(self, get_collection):
+        cache = MongoDBCache(default_timeout=0, collection_name="test_cache", max_timeout=3600)
+
+        cache.set("key", 1)
+        cache.set("key", 1, timeout=7200)
+
+        for c in get_collection.return_value.replace_one.call_args_list:
+            self.assertAlmostEqual(
+                (c[0][1]["expireAt"] - datetime.utcnow()).total_seconds(), 3600, delta=5
+            )
+
+    def test_set_error(self, get_collection):
+        get_collection.return_value.replace_one.side_effect = ConnectionFailure()
+
+        self.assertFalse(self.cache.set("key", 1))
+
+    def test_add(self, get_collection):
+        self.assertTrue(self.cache.add("key", 1))
+
+        get_collection.return_value.replace_one.assert_called_once_with(
+            {"_id": "key", "expireAt": {"$lte": ANY}},
+            {"_id": "key", "value": Binary(pickle.dumps(1)), "expireAt": ANY},
+            upsert=True,
+        )
+
+    def test_add_exists(self, get_collection):
+        get_collection.return_value.replace_one.side_effect = DuplicateKeyError("E11000")
+
+        self.assertFalse(self.cache.add("key", 1))
+
+    @patch("app.cache.logger")
+    def test_add_error(self, logger, get_collection):
+        get_collection.return_value.replace_one.side_effect = ConnectionFailure()
+
+        self.assertTrue(self.cache.add("key", 1))
+        logger.warning.assert_called_once_with(ANY, extra={"MESSAGE_ID": "APP_CACHE_ADD_MONGODB_EXCEPTION"})
+
+    def test_delete(self, get_collection):
+        get_collection.return_value.delete_one.return_value = Mock(deleted_count=1)
+
+        self.assertTrue(self.cache.delete("key"))
+        get_collection.return_value.delete_one.assert_called_once_with({"_id": "key"})
+
+    def test_clear(self, get_collection):
+        self.assertTrue(self.cache.clear())
+
+        get_collection.return_value.delete_many.assert_called_once_with({})
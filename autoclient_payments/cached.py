@@ -1,5 +1,13 @@
 from app.app import cache
-from environment_settings import PUBLIC_API_HOST, CONNECT_TIMEOUT, READ_TIMEOUT
+from environment_settings import (
+    PUBLIC_API_HOST,
+    CONNECT_TIMEOUT,
+    READ_TIMEOUT,
+    PAYMENTS_RESULTS_TOTAL_CACHE_TIMEOUT,
+    PAYMENTS_HEALTH_CACHE_TIMEOUT,
+)
+from autoclient_payments.health import health
+from autoclient_payments.results_db import count_payment_results
 from autoclient_payments.utils import request_cdb_tender_data, request_cdb_complaint_data
 
 CACHE_TIMEOUT = 60 * 10
@@ -25,3 +33,21 @@ def get_complaint(params):
         return complaint
     except Exception:
         pass
+
+
+@cache.memoize(timeout=PAYMENTS_RESULTS_TOTAL_CACHE_TIMEOUT)
+def get_payment_results_total(filters):
+    """
+    Counting all the matched items is the slowest part of a list page,
+    so the total is shared by the pages of the same search for a while
+    """
+    return count_payment_results(filters)
+
+
+@cache.memoize(timeout=PAYMENTS_HEALTH_CACHE_TIMEOUT)
+def get_health():
+    """
+    Status page reloads share the latest probes instead of probing every time,
+    they aren't saved to the history, it's done by check_services_status task
+    """
+    return health()
@@ -4,7 +4,10 @@ from datetime import datetime, timedelta
 
 import kombu
 
+from concurrent.futures import ThreadPoolExecutor, wait
+
 from contextlib import contextmanager
+from functools import partial
 
 from celery_worker.celery import app
 from celery_worker.locks import get_mongodb_client
@@ -18,8 +21,9 @@ from environment_settings import (
     MONGODB_CONNECT_TIMEOUT,
     MONGODB_SOCKET_TIMEOUT,
     CELERY_BROKER_URL,
-    CONNECT_TIMEOUT,
-    READ_TIMEOUT,
+    PAYMENTS_HEALTH_CONNECT_TIMEOUT,
+    PAYMENTS_HEALTH_READ_TIMEOUT,
+    PAYMENTS_HEALTH_TIMEOUT,
 )
 from liqpay_int.utils import generate_liqpay_status_params, liqpay_request
 from autoclient_payments.results_db import get_statuses_list, save_status
@@ -31,6 +35,7 @@ STATUS_UNAVAILABLE = "unavailable"
 STATUS_DISABLED = "disabled"
 STATUS_INVALID = "invalid"
 SUCCESS_HEALTH_STATUSES = {STATUS_AVAILABLE, STATUS_DISABLED}
+HEALTH_REQUEST_TIMEOUT = (PAYMENTS_HEALTH_CONNECT_TIMEOUT, PAYMENTS_HEALTH_READ_TIMEOUT)
 
 
 def response_health_status(response):
@@ -69,24 +74,24 @@ def mongodb_info():
 
 
 def request_search():
-    return request_cdb_complaint_search("health")
+    return request_cdb_complaint_search("health", timeout=HEALTH_REQUEST_TIMEOUT)
 
 
 def request_public():
-    return request_cdb_head_spore(host=PUBLIC_API_HOST, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    return request_cdb_head_spore(host=PUBLIC_API_HOST, timeout=HEALTH_REQUEST_TIMEOUT)
 
 
 def request_lb():
-    return request_cdb_head_spore(host=API_HOST, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    return request_cdb_head_spore(host=API_HOST, timeout=HEALTH_REQUEST_TIMEOUT)
 
 
 def request_autoclient():
-    return request_pb_autoclient_head(timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    return request_pb_autoclient_head(timeout=HEALTH_REQUEST_TIMEOUT)
 
 
 def request_liqpay():
     params = generate_liqpay_status_params({"order_id": ""})
-    return liqpay_request(params, sandbox=False, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    return liqpay_request(params, sandbox=False, timeout=HEALTH_REQUEST_TIMEOUT)
 
 
 @contextmanager
@@ -107,8 +112,8 @@ def api_health(request_method):
         total_seconds = time.time() - start
         health_item = {
             "status": response_health_status(response),
-            "connect_timeout": CONNECT_TIMEOUT,
-            "read_timeout": READ_TIMEOUT,
+            "connect_timeout": PAYMENTS_HEALTH_CONNECT_TIMEOUT,
+            "read_timeout": PAYMENTS_HEALTH_READ_TIMEOUT,
             "total_seconds": total_seconds,
         }
         if response:
@@ -133,8 +138,8 @@ def autoclient_health(request_method):
         total_seconds = time.time() - start
         health_item = {
             "status": response_health_status(response),
-            "connect_timeout": CONNECT_TIMEOUT,
-            "read_timeout": READ_TIMEOUT,
+            "connect_timeout": PAYMENTS_HEALTH_CONNECT_TIMEOUT,
+            "read_timeout": PAYMENTS_HEALTH_READ_TIMEOUT,
             "total_seconds": total_seconds,
         }
         if response:
@@ -155,8 +160,8 @@ def liqpay_health(request_method):
         total_seconds = time.time() - start
         health_item = {
             "status": liqpay_health_status(response),
-            "connect_timeout": CONNECT_TIMEOUT,
-            "read_timeout": READ_TIMEOUT,
+            "connect_timeout": PAYMENTS_HEALTH_CONNECT_TIMEOUT,
+            "read_timeout": PAYMENTS_HEALTH_READ_TIMEOUT,
             "total_seconds": total_seconds,
         }
         if response:
@@ -209,16 +214,40 @@ def rabbitmq_health():
         return health_item
 
 
+def run_probes(probes, timeout=PAYMENTS_HEALTH_TIMEOUT):
+    """
+    Runs the probes concurrently, so the slowest one defines the total time.
+    The probes that aren't finished in timeout seconds are reported as unavailable,
+    their threads are left to finish in background.
+
+    :param probes: dict of name: function that returns health item
+    :return: dict of name: health item in the same order
+    """
+    executor = ThreadPoolExecutor(max_workers=len(probes))
+    futures = {name: executor.submit(probe) for name, probe in probes.items()}
+    done, _ = wait(futures.values(), timeout=timeout)
+    executor.shutdown(wait=False, cancel_futures=True)
+    health_data = {}
+    for name, future in futures.items():
+        if future in done:
+            health_data[name] = future.result()
+        else:
+            health_data[name] = {"status": STATUS_UNAVAILABLE, "total_seconds": timeout, "exception": "TimeoutError"}
+    return health_data
+
+
 def health():
-    health_data = {
-        "cdb_public": api_health(request_public),
-        "cdb_lb": api_health(request_lb),
-        "cdb_search": api_health(request_search),
-        "liqpay": liqpay_health(request_liqpay),
-        "autoclient": autoclient_health(request_autoclient),
-        "mongodb": mongodb_health(),
-        "rabbitmq": rabbitmq_health(),
-    }
+    health_data = run_probes(
+        {
+            "cdb_public": partial(api_health, request_public),
+            "cdb_lb": partial(api_health, request_lb),
+            "cdb_search": partial(api_health, request_search),
+            "liqpay": partial(liqpay_health, request_liqpay),
+            "autoclient": partial(autoclient_health, request_autoclient),
+            "mongodb": mongodb_health,
+            "rabbitmq": rabbitmq_health,
+        }
+    )
     health_statuses = [health_item["status"] for health_item in health_data.values()]
     health_overall = (
         STATUS_AVAILABLE
@@ -246,5 +275,11 @@ def save_health_data(data):
         return save_status(data)
 
 
+def check_health():
+    data = health()
+    save_health_data(data)
+    return data
+
+
 def get_health_data():
     return list(get_statuses_list())
@@ -14,6 +14,7 @@ from pymongo.errors import PyMongoError, OperationFailure, DuplicateKeyError
 
 from environment_settings import TIMEZONE
 from app.logging import log_exc
+from tasks_utils.pagination import get_keyset_page
 from autoclient_payments.data import (
     DESC_PROCESSING_CHOICES_DICT,
     MESSAGE_ID_PRIORITY,
@@ -35,12 +36,15 @@ UID_KEYS = (
     "REFN",
 )
 
+FIND_PAYMENT_RESULTS_BATCH_SIZE = 500
+
 
 def init_indexes():
     collection = get_mongodb_collection()
     # drop_indexes(collection)
     indexes = [
         dict(keys="createdAt", name="created_at"),
+        dict(keys=[("createdAt", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
         dict(keys="dateOper", name="date_oper"),
         dict(keys=[("payment.OSND", pymongo.TEXT)], name="payment_description"),
         dict(keys=[("payment.REF", ASCENDING), ("payment.REFN", ASCENDING)], name="payment_ref"),
@@ -151,77 +155,46 @@ def pipeline_payments_counts_date(field, date_wrapper=lambda x: x):
     ]
 
 
-def pipeline_payments_counts_total():
-    return [
-        {
-            "$group": {"_id": None, "total": {"$sum": 1}},
-        },
-        {
-            "$project": {
-                "_id": 0,
-            }
-        },
-    ]
-
-
-def pipeline_payments_results(page=None, limit=None):
-    pipeline = [
-        {"$sort": {"createdAt": DESCENDING}},
-    ]
-    if page and limit:
-        pipeline.append({"$skip": page * limit - limit})
-    if limit:
-        pipeline.append({"$limit": limit})
-    return pipeline
+def project_payments_results_counts(field):
+    return {"$arrayElemAt": [field, 0]}
 
 
-def project_payments_results_counts_total():
+@log_exc(logger, PyMongoError, "PAYMENTS_GET_RESULTS_MONGODB_EXCEPTION")
+def get_payment_results(filters=None, limit=None, after=None, before=None, **kwargs):
+    """
+    Items sorted by createdAt descending, paginated with keyset cursors (see tasks_utils.pagination)
+    """
+    collection = get_mongodb_collection()
+    results, next_cursor, prev_cursor = get_keyset_page(
+        collection, filters, limit=limit, after=after, before=before
+    )
     return {
-        "$arrayElemAt": [
-            {
-                "$cond": {
-                    "if": {"$eq": [{"$size": "$counts_total"}, 0]},
-                    "then": [{"total": 0}],
-                    "else": "$counts_total",
-                }
-            },
-            0,
-        ]
+        "results": results,
+        "meta": {
+            "limit": limit,
+            "next": next_cursor,
+            "prev": prev_cursor,
+        },
     }
 
 
-def project_payments_results_counts(field):
-    return {"$arrayElemAt": [field, 0]}
+@log_exc(logger, PyMongoError, "PAYMENTS_GET_RESULTS_COUNT_MONGODB_EXCEPTION")
+def count_payment_results(filters=None):
+    collection = get_mongodb_collection()
+    if not filters:
+        return collection.estimated_document_count()
+    return collection.count_documents(filters)
 
 
 @log_exc(logger, PyMongoError, "PAYMENTS_GET_RESULTS_MONGODB_EXCEPTION")
-def get_payment_results(filters=None, page=None, limit=None, **kwargs):
+def find_payment_results(filters=None, batch_size=FIND_PAYMENT_RESULTS_BATCH_SIZE):
+    """
+    Cursor over all the matching items in the order of get_payment_results,
+    the items are fetched in batches while it's iterated
+    """
     collection = get_mongodb_collection()
-    pipeline = [
-        {"$match": filters},
-        {
-            "$facet": {
-                "results": pipeline_payments_results(page, limit),
-                "counts_total": pipeline_payments_counts_total(),
-            }
-        },
-        {
-            "$project": {
-                "results": 1,
-                "meta": {
-                    "$mergeObjects": [
-                        project_payments_results_counts_total(),
-                        {
-                            "page": page,
-                            "limit": limit,
-                        },
-                    ]
-                },
-            }
-        },
-    ]
-    cursor = collection.aggregate(pipeline)
-    return list(cursor)[0]
+    cursor = collection.find(filters or {}).sort([("createdAt", DESCENDING), ("_id", DESCENDING)])
+    return cursor.batch_size(batch_size)
 
 
 def query_date_split(field):
@@ -7,7 +7,7 @@ from pymongo.errors import PyMongoError
 from kombu.exceptions import OperationalError
 
 from autoclient_payments.enums import TransactionType, TransactionKind, TransactionStatus
-from autoclient_payments.health import health, save_health_data
+from autoclient_payments.health import check_health
 from celery_worker.celery import app, formatter
 from autoclient_payments.data import STATUS_COMPLAINT_MISTAKEN, STATUS_COMPLAINT_PENDING
 from autoclient_payments.logging import PaymentResultsLoggerAdapter
@@ -711,5 +711,4 @@ def process_complaint_resolution(self, payment_data, complaint_data, *args, **kw
 
 @app.task(bind=True, max_retries=10)
 def check_services_status(self):
-    data = health()
-    save_health_data(data)
+    check_health()
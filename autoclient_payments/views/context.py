@@ -1,7 +1,7 @@
 from datetime import datetime
 
 from flask import request
-from flask_paginate import Pagination
+from app.utils import url_for_search
 from decimal import Decimal
 
 from autoclient_payments.data import value_amount_representation
@@ -13,7 +13,6 @@ from autoclient_payments.views.schemes import (
     REPORT_SCHEME,
 )
 
-DEFAULT_PAGE = 1
 DEFAULT_LIMIT = 10
 
 YES_CHOICE = "Так"
@@ -56,8 +55,9 @@ def get_date_param(name, date_format, default=None):
 
 
 def get_payment_search_params():
-    page = get_int_param("page", DEFAULT_PAGE)
     limit = get_int_param("limit", DEFAULT_LIMIT)
+    after = get_string_param("after")
+    before = get_string_param("before")
     payment_type = get_string_param("type")
     payment_source = get_string_param("source")
     processing_status = get_string_param("processing_status")
@@ -66,7 +66,8 @@ def get_payment_search_params():
     payment_date_to = get_date_param("date_oper_to", "%Y-%m-%d")
     return dict(
         limit=limit,
-        page=page,
+        after=after,
+        before=before,
         search=query,
         payment_type=payment_type,
         payment_source=payment_source,
@@ -100,18 +101,13 @@ def get_request_params():
     )
 
 
-def get_payment_pagination(total=None, page=None, limit=None, **kwargs):
-    return Pagination(
-        bs_version=4,
-        link_size="sm",
-        show_single_page=True,
-        record_name="payments",
-        per_page_parameter="limit",
-        page_parameter="page",
+def get_payment_pagination(total=None, next=None, prev=None, **kwargs):
+    exclude = ["page", "after", "before"]
+    endpoint = request.url_rule.endpoint
+    return dict(
         total=total,
-        page=page,
-        limit=limit,
-        **kwargs,
+        next_url=url_for_search(endpoint, exclude=exclude, include={"after": next}) if next else None,
+        prev_url=url_for_search(endpoint, exclude=exclude, include={"before": prev}) if prev else None,
     )
 
 
@@ -124,27 +120,22 @@ def get_payment(row):
 
 
 def get_report(rows, total=False):
-    data = []
-    headers = []
+    return list(iter_report(rows, total=total))
 
-    amount_total = 0
 
-    for key, value in REPORT_SCHEME.items():
-        headers.append(value["title"])
+def iter_report(rows, total=False):
+    """
+    Report rows one by one: headers first, then the payments and the total if it's requested
+    """
+    yield [value["title"] for value in REPORT_SCHEME.values()]
+
+    amount_total = 0
 
     for row in rows:
-        item = []
         if total:
             payment = row.get("payment", {})
             amount_total += Decimal(str(payment.get("SUM_E", 0.0)))
-        for key, scheme in REPORT_SCHEME.items():
-            value = get_scheme_value(row, scheme) or ""
-            item.append(value)
-        data.append(item)
-
-    data.insert(0, headers)
+        yield [get_scheme_value(row, scheme) or "" for scheme in REPORT_SCHEME.values()]
 
     if total:
-        data.append([DESC_REPORT_TOTAL, value_amount_representation(amount_total)])
-
-    return data
+        yield [DESC_REPORT_TOTAL, value_amount_representation(amount_total)]
@@ -1,12 +1,12 @@
-import io
 from datetime import timedelta
+from tempfile import SpooledTemporaryFile
 
-from flask import Blueprint, render_template, redirect, url_for, abort, make_response, request
+from flask import Blueprint, render_template, redirect, url_for, abort, request, send_file, Response
 from flask_restx import reqparse, inputs, Api
 
 from app.auth import login_groups_required, COUNTERPARTIES
 from autoclient_payments.enums import TransactionStatus, TransactionKind, TransactionType
-from autoclient_payments.health import health, save_health_data, get_health_data
+from autoclient_payments.health import check_health, get_health_data
 from autoclient_payments.message_ids import (
     PAYMENTS_INVALID_PATTERN,
     PAYMENTS_SEARCH_INVALID_COMPLAINT,
@@ -22,6 +22,7 @@ from autoclient_payments.results_db import (
     find_payment_item,
     update_payment_item,
     get_payment_results,
+    find_payment_results,
     query_payment_results,
     get_payment_stats,
 )
@@ -29,6 +30,8 @@ from autoclient_payments.views.context import (
     get_payment_search_params,
     get_payment_pagination,
     get_report,
+    iter_report,
+    get_string_param,
     get_payments,
     get_payment,
     get_report_params,
@@ -56,7 +59,9 @@ from autoclient_payments.data import (
 from autoclient_payments.utils import (
     store_payments_registry_fake,
     generate_report_file,
+    generate_report_csv,
     generate_report_filename,
+    REPORT_FILE_MAX_MEMORY_SIZE,
     generate_report_title,
     get_payments_registry_fake,
     dumps_payments_registry_fake,
@@ -101,8 +106,9 @@ def payment_list():
     report_kwargs = get_report_params()
     search_kwargs = get_payment_search_params()
 
-    page = search_kwargs.get("page")
     limit = search_kwargs.get("limit")
+    after = search_kwargs.get("after")
+    before = search_kwargs.get("before")
 
     resolution_date_from = report_kwargs.get("date_resolution_from")
     resolution_date_to = report_kwargs.get("date_resolution_to")
@@ -111,18 +117,20 @@ def payment_list():
 
     filters = query_payment_results(date_from, date_to, **search_kwargs)
 
-    data = get_payment_results(filters, page=page, limit=limit)
+    data = get_payment_results(filters, limit=limit, after=after, before=before)
 
     results = data["results"]
     meta = data["meta"]
-    total = meta["total"]
+
+    from autoclient_payments.cached import get_payment_results_total
+    total = get_payment_results_total(filters)
 
     rows = get_payments(results)
 
     return render_template(
         "autoclient_payments/payment_list.html",
         rows=rows,
-        pagination=get_payment_pagination(total=total, page=page, limit=limit),
+        pagination=get_payment_pagination(total=total, next=meta["next"], prev=meta["prev"]),
         total=total,
         counterparties_choices=list(COUNTERPARTIES.keys()) + [OTHER_COUNTERPARTIES],
         type_choices=TransactionType.as_dict(),
@@ -412,16 +420,26 @@ def report_download():
         abort(404)
         return
 
-    rows = get_payment_results(filters)["results"]
-    data = get_report(rows, total=True)
-    bytes_io = io.BytesIO()
-    title = generate_report_title(date_resolution_from, date_resolution_to, funds)
-    generate_report_file(bytes_io, data, title)
+    rows = find_payment_results(filters)
+    data = iter_report(rows, total=True)
     filename = generate_report_filename(date_resolution_from, date_resolution_to, funds)
-    response = make_response(bytes_io.getvalue())
-    response.headers["Content-Disposition"] = "attachment; filename=%s.xlsx" % filename
-    response.headers["Content-type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    return response
+
+    if get_string_param("format") == "csv":
+        response = Response(generate_report_csv(data), mimetype="text/csv")
+        response.headers["Content-Disposition"] = "attachment; filename=%s.csv" % filename
+        return response
+
+    # the workbook is kept in memory while it's small, bigger ones go to a temp file
+    file = SpooledTemporaryFile(max_size=REPORT_FILE_MAX_MEMORY_SIZE)
+    title = generate_report_title(date_resolution_from, date_resolution_to, funds)
+    generate_report_file(file, data, title)
+    file.seek(0)
+    return send_file(
+        file,
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        as_attachment=True,
+        download_name="%s.xlsx" % filename,
+    )
 
 
 @bp.route("/status", methods=["GET"])
@@ -430,7 +448,8 @@ def status():
     days = get_int_param("days", default=0)
     if not days:
         return redirect(url_for("autoclient_payments_views.status", days=1))
-    data = health()
+    from autoclient_payments.cached import get_health
+    data = get_health()
     return render_template("autoclient_payments/payment_status.html", rows=data)
 
 
@@ -444,8 +463,7 @@ class HealthCheckResource(Resource):
     )
 
     def get(self):
-        data = health()
-        save_health_data(data)
+        data = check_health()
         historical_requested = self.parser_query_healthcheck.parse_args().get("historical")
         if historical_requested:
             historical_list = get_health_data()
@@ -205,13 +205,14 @@ def remove_unique_lock(task):
 
 
 @doublewrap
-def concurrency_lock(task, timeout=10):
+def concurrency_lock(task, timeout=10, omit=None):
     """
     Use this task decorator to avoid concurrent execution of duplicate tasks
     it won't discard any tasks, only reschedule their execution
 
     :param task: celery task (automatically passed by doublewrap decorator)
     :param timeout: how long to prevent duplicates to run. 60sec will be added because of mongodb ttl interval
+    :param omit: list of keyword arguments that do not affect the lock
 
     Example:
         @app.task(bind=True)
@@ -222,18 +223,21 @@ def concurrency_lock(task, timeout=10):
         or
 
         @app.task(bind=True)
-        @concurrency_lock(timeout=30)
-        def echo_task(self):
+        @concurrency_lock(timeout=30, omit=["some"])
+        def echo_task(self, some="Some"):
             pass
     """
     concurrency_timeout = timeout
+    if not omit:
+        omit = []
 
     @wraps(task)
     def wrapper(*args, **kwargs):
         assert len(args) > 0, "Expected to used with bind tasks"
         self, *task_args = args  # *task_args creates a list instance, so I'll convert it to tuple
         assert isinstance(self, Task), "Expected to used with bind tasks"
-        task_uid = args_to_uid((task.__module__, task.__name__, tuple(task_args), kwargs))
+        filtered_kwargs = {key: value for key, value in kwargs.items() if key not in omit}
+        task_uid = args_to_uid((task.__module__, task.__name__, tuple(task_args), filtered_kwargs))
 
         collection = get_mongodb_collection(LOCK_COLLECTION_NAME)
         try:
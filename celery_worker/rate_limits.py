@@ -0,0 +1,165 @@
+from threading import Lock
+from time import time, sleep
+from celery.utils.log import get_task_logger
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError, DuplicateKeyError
+from celery_worker.locks import get_mongodb_collection
+from environment_settings import RATE_LIMIT_MAX_WAIT
+
+logger = get_task_logger(__name__)
+
+RATE_LIMIT_COLLECTION_NAME = "celery_worker_rate_limits"
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second with bursts up to `capacity` requests.
+    Implemented as GCRA: instead of counting tokens we keep the theoretical arrival time (tat)
+    of the next request, every acquired token moves it forward by 1 / rate seconds.
+
+    This one counts tokens of the current process only,
+    see MongoTokenBucket for the one that's shared by all the workers.
+
+    Example:
+        bucket = TokenBucket("edr", rate=2)
+        acquired, wait = bucket.acquire(max_wait=5)
+        if acquired:
+            sleep(wait)
+            requests.get(url)
+    """
+
+    def __init__(self, name, rate, capacity=1):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._tat = 0
+        self._lock = Lock()
+
+    @property
+    def interval(self):
+        return 1 / self.rate
+
+    @property
+    def tolerance(self):
+        return self.interval * (self.capacity - 1)
+
+    def acquire(self, max_wait=0):
+        """
+        Takes a token if it will be available in max_wait seconds
+        :param max_wait: seconds the caller agrees to wait for a token, None - any time
+        :return: (acquired, wait): seconds to wait before the request if the token is acquired,
+                 or before the next try if it's not
+        """
+        if not self.rate:  # no limit
+            return True, 0
+
+        now = time()
+        with self._lock:
+            tat = max(self._tat, now)
+            wait = max(tat - self.tolerance - now, 0)
+            if max_wait is not None and wait > max_wait:
+                return False, wait
+            self._tat = tat + self.interval
+        return True, wait
+
+    def reserve(self):
+        """
+        Takes the next token however late it is, so nobody else gets it
+        :return: timestamp when the token can be used
+        """
+        _, wait = self.acquire(max_wait=None)
+        return time() + wait
+
+
+class MongoTokenBucket(TokenBucket):
+    """
+    TokenBucket that is shared by all the processes using the same mongodb.
+    The bucket is one document updated atomically, the time of the workers is used,
+    so their clocks should be synchronized.
+    If mongodb isn't available, the in-process bucket is used
+    """
+
+    def __init__(self, name, rate, capacity=1, collection_name=RATE_LIMIT_COLLECTION_NAME):
+        super().__init__(name, rate, capacity=capacity)
+        self.collection_name = collection_name
+
+    def acquire(self, max_wait=0):
+        if not self.rate:
+            return True, 0
+
+        now = time()
+        query = {"_id": self.name}
+        if max_wait is not None:
+            query["tat"] = {"$lte": now + self.tolerance + max_wait}
+        collection = get_mongodb_collection(self.collection_name)
+        try:
+            doc = collection.find_one_and_update(
+                query,
+                [{"$set": {"tat": {"$add": [{"$max": ["$tat", now]}, self.interval]}}}],
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # the bucket exists, but it doesn't have a token for us in max_wait seconds
+            try:
+                doc = collection.find_one({"_id": self.name})
+            except PyMongoError as e:
+                logger.exception(e, extra={"MESSAGE_ID": "RATE_LIMIT_MONGODB_EXCEPTION"})
+                doc = None
+            tat = doc["tat"] if doc else now + self.interval
+            return False, max(tat - self.tolerance - now, 0)
+        except PyMongoError as e:
+            logger.exception(e, extra={"MESSAGE_ID": "RATE_LIMIT_MONGODB_EXCEPTION"})
+            return super().acquire(max_wait=max_wait)
+        else:
+            return True, max(doc["tat"] - self.interval - self.tolerance - now, 0)
+
+
+class RateLimitExceeded(Exception):
+    """
+    The token isn't available in time, slot is the timestamp when it's expected.
+    If it's raised by wait_for_token, the token is reserved at slot,
+    so the caller should come back at that time with the slot instead of taking another one
+    """
+
+    def __init__(self, name, slot):
+        super().__init__(f"Rate limit of {name} is reached, the token is reserved at {slot:.2f}")
+        self.name = name
+        self.slot = slot
+
+    @property
+    def wait(self):
+        return max(self.slot - time(), 0)
+
+
+def wait_for_token(limiter, slot=None, max_wait=RATE_LIMIT_MAX_WAIT):
+    """
+    Waits for a token of the limiter right before the limited request.
+    :param slot: the token reserved before (see RateLimitExceeded), a new one is reserved if it's None
+    :param max_wait: how long the caller can wait, RateLimitExceeded is raised if the token is later
+
+    Example:
+        try:
+            wait_for_token(limiter, slot=slot)
+        except RateLimitExceeded as exc:
+            task.apply_async(kwargs={**kwargs, "slot": exc.slot}, countdown=exc.wait)
+            raise Ignore()
+        requests.get(url)
+    """
+    if slot is None:
+        slot = limiter.reserve()
+    wait = slot - time()
+    if wait > max_wait:
+        raise RateLimitExceeded(limiter.name, slot)
+    if wait > 0:
+        sleep(wait)
+
+
+def take_free_token(limiter):
+    """
+    Takes a token only if it's free right now. The slots reserved by wait_for_token are in the future,
+    so they aren't taken. Nothing is reserved if RateLimitExceeded is raised
+    """
+    acquired, wait = limiter.acquire(max_wait=0)
+    if not acquired:
+        raise RateLimitExceeded(limiter.name, time() + wait)
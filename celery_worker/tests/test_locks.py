@@ -10,6 +10,7 @@ from celery_worker.locks import (
     args_to_uid,
     get_mongodb_collection,
     unique_lock,
+    concurrency_lock,
     DUPLICATE_COLLECTION_NAME,
 )
 from environment_settings import (
@@ -261,4 +262,24 @@ class LocksTestCase(unittest.TestCase):
             }
         )
 
+    @patch("celery_worker.locks.get_mongodb_collection")
+    def test_concurrency_lock_omit(self, get_collection):
+        test_method_procedure = Mock()
 
+        @app.task(bind=True, lazy=False)
+        @concurrency_lock(omit=["date_modified"])
+        def concurrency_test_method(self, *args, **kwargs):
+            test_method_procedure(self, *args, **kwargs)
+
+        concurrency_test_method(contract_id="1", date_modified="2020-01-01T00:00:00+02:00")
+        concurrency_test_method(contract_id="1", date_modified="2020-01-02T00:00:00+02:00")
+        concurrency_test_method(contract_id="2", date_modified="2020-01-02T00:00:00+02:00")
+
+        uids = [c[0][0]["_id"] for c in get_collection.return_value.insert_one.call_args_list]
+        self.assertEqual(uids[0], uids[1])
+        self.assertNotEqual(uids[0], uids[2])
+        task_uid = args_to_uid(
+            (concurrency_test_method.__module__, concurrency_test_method.__name__, (), dict(contract_id="1"))
+        )
+        self.assertEqual(uids[0], task_uid)
+        self.assertEqual(test_method_procedure.call_count, 3)
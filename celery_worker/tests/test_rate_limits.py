@@ -0,0 +1,183 @@
+from unittest.mock import patch, Mock
+from pymongo import ReturnDocument
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
+from celery_worker.rate_limits import (
+    TokenBucket, MongoTokenBucket, RateLimitExceeded, wait_for_token, take_free_token, RATE_LIMIT_COLLECTION_NAME,
+)
+import unittest
+
+
+class TokenBucketTestCase(unittest.TestCase):
+
+    @patch("celery_worker.rate_limits.time")
+    def test_rate(self, time_mock):
+        time_mock.return_value = 1000.0
+        bucket = TokenBucket("test", rate=2)
+
+        self.assertEqual(bucket.acquire(), (True, 0))
+        self.assertEqual(bucket.acquire(), (False, 0.5))
+        self.assertEqual(bucket.acquire(max_wait=1), (True, 0.5))
+        self.assertEqual(bucket.acquire(max_wait=1), (True, 1))
+        self.assertEqual(bucket.acquire(max_wait=1), (False, 1.5))
+
+        time_mock.return_value = 1002.0
+        self.assertEqual(bucket.acquire(), (True, 0))
+
+    @patch("celery_worker.rate_limits.time")
+    def test_burst(self, time_mock):
+        time_mock.return_value = 1000.0
+        bucket = TokenBucket("test", rate=1, capacity=3)
+
+        for _ in range(3):
+            self.assertEqual(bucket.acquire(), (True, 0))
+        self.assertEqual(bucket.acquire(), (False, 1))
+
+        time_mock.return_value = 1001.0
+        self.assertEqual(bucket.acquire(), (True, 0))
+        self.assertEqual(bucket.acquire(), (False, 1))
+
+    def test_no_limit(self):
+        bucket = TokenBucket("test", rate=0)
+
+        for _ in range(10):
+            self.assertEqual(bucket.acquire(), (True, 0))
+
+    @patch("celery_worker.rate_limits.time")
+    def test_reserve(self, time_mock):
+        time_mock.return_value = 1000.0
+        bucket = TokenBucket("test", rate=1)
+
+        self.assertEqual([bucket.reserve() for _ in range(3)], [1000.0, 1001.0, 1002.0])
+        self.assertEqual(bucket.acquire(max_wait=2), (False, 3))
+
+
+class MongoTokenBucketTestCase(unittest.TestCase):
+
+    @patch("celery_worker.rate_limits.time", Mock(return_value=1000.0))
+    @patch("celery_worker.rate_limits.get_mongodb_collection")
+    def test_acquire(self, get_collection):
+        get_collection.return_value.find_one_and_update.return_value = {"_id": "test", "tat": 1001.5}
+        bucket = MongoTokenBucket("test", rate=2, capacity=2)
+
+        result = bucket.acquire(max_wait=1)
+
+        self.assertEqual(result, (True, 0.5))
+        get_collection.assert_called_once_with(RATE_LIMIT_COLLECTION_NAME)
+        get_collection.return_value.find_one_and_update.assert_called_once_with(
+            {"_id": "test", "tat": {"$lte": 1001.5}},
+            [{"$set": {"tat": {"$add": [{"$max": ["$tat", 1000.0]}, 0.5]}}}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    @patch("celery_worker.rate_limits.time", Mock(return_value=1000.0))
+    @patch("celery_worker.rate_limits.get_mongodb_collection")
+    def test_no_tokens(self, get_collection):
+        get_collection.return_value.find_one_and_update.side_effect = DuplicateKeyError("E11000")
+        get_collection.return_value.find_one.return_value = {"_id": "test", "tat": 1003.0}
+        bucket = MongoTokenBucket("test", rate=1)
+
+        result = bucket.acquire(max_wait=1)
+
+        self.assertEqual(result, (False, 3))
+        get_collection.return_value.find_one.assert_called_once_with({"_id": "test"})
+
+    @patch("celery_worker.rate_limits.time", Mock(return_value=1000.0))
+    @patch("celery_worker.rate_limits.get_mongodb_collection")
+    def test_mongodb_error(self, get_collection):
+        get_collection.return_value.find_one_and_update.side_effect = ConnectionFailure()
+        bucket = MongoTokenBucket("test", rate=1)
+
+        self.assertEqual(bucket.acquire(), (True, 0))  # in-process bucket is used
+        self.assertEqual(bucket.acquire(), (False, 1))
+
+    @patch("celery_worker.rate_limits.time", Mock(return_value=1000.0))
+    @patch("celery_worker.rate_limits.get_mongodb_collection")
+    def test_reserve(self, get_collection):
+        get_collection.return_value.find_one_and_update.return_value = {"_id": "test", "tat": 1031.0}
+        bucket = MongoTokenBucket("test", rate=1)
+
+        self.assertEqual(bucket.reserve(), 1030.0)
+        get_collection.return_value.find_one_and_update.assert_called_once_with(
+            {"_id": "test"},
+            [{"$set": {"tat": {"$add": [{"$max": ["$tat", 1000.0]}, 1.0]}}}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    @patch("celery_worker.rate_limits.get_mongodb_collection")
+    def test_no_limit(self, get_collection):
+        bucket = MongoTokenBucket("test", rate=0)
+
+        self.assertEqual(bucket.acquire(), (True, 0))
+        get_collection.assert_not_called()
+
+
+@patch("celery_worker.rate_limits.time", Mock(return_value=1000.0))
+@patch("celery_worker.rate_limits.sleep")
+class WaitForTokenTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.limiter = Mock()
+        self.limiter.name = "test"
+
+    def test_reserved_now(self, sleep_mock):
+        self.limiter.reserve.return_value = 1000.0
+
+        wait_for_token(self.limiter, max_wait=3)
+
+        self.limiter.reserve.assert_called_once_with()
+        sleep_mock.assert_not_called()
+
+    def test_reserved_soon(self, sleep_mock):
+        self.limiter.reserve.return_value = 1002.5
+
+        wait_for_token(self.limiter, max_wait=3)
+
+        sleep_mock.assert_called_once_with(2.5)
+
+    def test_reserved_late(self, sleep_mock):
+        self.limiter.reserve.return_value = 1010.0
+
+        with self.assertRaises(RateLimitExceeded) as context:
+            wait_for_token(self.limiter, max_wait=3)
+
+        self.assertEqual(context.exception.slot, 1010.0)
+        self.assertEqual(context.exception.wait, 10)
+        sleep_mock.assert_not_called()
+
+    def test_slot(self, sleep_mock):
+        wait_for_token(self.limiter, slot=1001.0, max_wait=3)
+
+        self.limiter.reserve.assert_not_called()
+        sleep_mock.assert_called_once_with(1)
+
+    def test_slot_passed(self, sleep_mock):
+        wait_for_token(self.limiter, slot=990.0, max_wait=3)
+
+        self.limiter.reserve.assert_not_called()
+        sleep_mock.assert_not_called()
+
+
+@patch("celery_worker.rate_limits.time", Mock(return_value=1000.0))
+class TakeFreeTokenTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.limiter = Mock()
+        self.limiter.name = "test"
+
+    def test_free(self):
+        self.limiter.acquire.return_value = (True, 0)
+
+        take_free_token(self.limiter)
+
+        self.limiter.acquire.assert_called_once_with(max_wait=0)
+
+    def test_busy(self):
+        self.limiter.acquire.return_value = (False, 3)
+
+        with self.assertRaises(RateLimitExceeded) as context:
+            take_free_token(self.limiter)
+
+        self.assertEqual(context.exception.slot, 1003.0)
+        self.limiter.reserve.assert_not_called()
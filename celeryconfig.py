@@ -9,6 +9,7 @@ from environment_settings import (
     PB_AUTOCLIENT_NAME,
     PB_AUTOCLIENT_TOKEN,
     PB_ACCOUNT,
+    PAYMENTS_STATS_UPDATE_INTERVAL,
 )
 from celery.schedules import crontab
 
@@ -126,6 +127,14 @@ beat_schedule = {
         'task': 'payments.tasks.check_payments_status',
         'schedule': crontab(minute=0),
     },
+    'update-payments-stats': {
+        'task': 'payments.tasks.update_payments_stats',
+        'schedule': timedelta(seconds=PAYMENTS_STATS_UPDATE_INTERVAL),
+    },
+    'cleanup-payments-reports-every-day': {
+        'task': 'payments.tasks.cleanup_payments_reports',
+        'schedule': crontab(hour=3, minute=0),
+    },
 }
 
 if PB_AUTOCLIENT_NAME and PB_AUTOCLIENT_TOKEN:
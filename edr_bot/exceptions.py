@@ -1,5 +1,7 @@
-from flask import jsonify
+import json
+
 from werkzeug.exceptions import HTTPException
+from werkzeug.wrappers import Response
 
 
 def abort_json(code, error_message, headers=None, **extra):
@@ -7,8 +9,8 @@ def abort_json(code, error_message, headers=None, **extra):
         "status": "error",
         "errors": [error_message],
     }
-    response = jsonify(error_description, **extra)
-    response.status_code = code
+    # built without flask.jsonify, so it doesn't need the app context in edr_bot workers
+    response = Response(json.dumps({**error_description, **extra}), status=code, mimetype="application/json")
     if headers:
         response.headers.update(headers)
     exception = HTTPException(description=error_description)
@@ -1,11 +1,13 @@
 from asgiref.sync import sync_to_async
 
+from environment_settings import EDR_PREFETCH_ENABLED
 from .settings import (
     pre_qualification_procedures,
     qualification_procedures,
     qualification_procedures_limited,
+    prefetch_statuses,
 )
-from .tasks import process_tender
+from .tasks import process_tender, prefetch_tender
 
 
 def valid_qualification_tender(tender):
@@ -29,6 +31,14 @@ def valid_qualification_limited_tender(tender):
     )
 
 
+def valid_prefetch_tender(tender):
+    return (
+        EDR_PREFETCH_ENABLED and
+        tender.get('status') in prefetch_statuses and
+        tender.get('procurementMethodType') in qualification_procedures
+    )
+
+
 async def edr_bot_tender_handler(tender, **kwargs):
     if (
         valid_qualification_tender(tender) or
@@ -36,3 +46,5 @@ async def edr_bot_tender_handler(tender, **kwargs):
         valid_qualification_limited_tender(tender)
     ):
         await sync_to_async(process_tender.delay)(tender_id=tender['id'])
+    elif valid_prefetch_tender(tender):
+        await sync_to_async(prefetch_tender.delay)(tender_id=tender['id'])
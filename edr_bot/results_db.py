@@ -5,6 +5,10 @@ from celery_worker.locks import args_to_uid, get_mongodb_collection as base_get_
 from celery.signals import celeryd_init
 from functools import partial
 from pymongo.errors import PyMongoError, OperationFailure
+from app.cache import MongoDBCache
+from environment_settings import (
+    APP_CACHE_COLLECTION, EDR_API_DIRECT_VERSION, EDR_API_CACHE_TIMEOUT, EDR_API_NOT_FOUND_CACHE_TIMEOUT,
+)
 import sys
 
 logger = get_task_logger(__name__)
@@ -14,6 +18,21 @@ get_mongodb_collection = partial(
     collection_name="erd_bot_upload_results"
 )
 
+NOT_FOUND_CACHE_COLLECTION = "edr_bot_not_found_cache"
+
+# EDR responses used by both /edr/verify and edr_bot tasks,
+# it doesn't need the flask app, so the workers don't import it
+edr_cache = MongoDBCache(
+    default_timeout=EDR_API_CACHE_TIMEOUT,
+    collection_name=APP_CACHE_COLLECTION,
+)
+
+# EDR "notFound" results used by both /edr/verify and get_edr_data task
+not_found_cache = MongoDBCache(
+    default_timeout=EDR_API_NOT_FOUND_CACHE_TIMEOUT,
+    collection_name=NOT_FOUND_CACHE_COLLECTION,
+)
+
 
 @app.task(bind=True)
 def init_db_index(self):
@@ -32,11 +51,25 @@ def init_db_index(self):
     return "success"
 
 
+@app.task(bind=True, max_retries=20)
+def init_cache_index(self):
+    """
+    EDR responses are stored in the app cache (see app.cache.MongoDBCache)
+    """
+    try:
+        for collection_name in (APP_CACHE_COLLECTION, NOT_FOUND_CACHE_COLLECTION):
+            base_get_mongodb_collection(collection_name).create_index("expireAt", expireAfterSeconds=0)
+    except PyMongoError as e:
+        logger.exception(e, extra={"MESSAGE_ID": "MONGODB_INDEX_CREATION_ERROR"})
+        raise self.retry()
+
+
 if "test" not in sys.argv[0]:  # pragma: no cover
 
     @celeryd_init.connect
     def task_sent_handler(*args, **kwargs):
         init_db_index.delay()
+        init_cache_index.delay()
 
 
 def get_upload_results(self, *args):
@@ -80,3 +113,18 @@ def set_upload_results_attached(*args):
         logger.exception(exc, extra={"MESSAGE_ID": "EDR_UPDATE_RESULTS_MONGODB_EXCEPTION"})
     else:
         return uid
+
+
+def get_edr_not_found(code):
+    """
+    Returns the description of EDR "notFound" error if the code hasn't been found recently
+    """
+    result = not_found_cache.get(f"not_found_{EDR_API_DIRECT_VERSION}_{code}")
+    if result is not None:
+        logger.info(f"Code {code} was found in not found cache", extra={"MESSAGE_ID": "EDR_NOT_FOUND_CACHE_HIT"})
+    return result
+
+
+def save_edr_not_found(code, description):
+    if not_found_cache.set(f"not_found_{EDR_API_DIRECT_VERSION}_{code}", description):
+        logger.info(f"Code {code} was saved to not found cache", extra={"MESSAGE_ID": "EDR_NOT_FOUND_CACHE_SAVE"})
@@ -27,6 +27,12 @@ qualification_procedures = (
 qualification_procedures_limited = (
     'reporting',
 )
+# bids are public, but awards aren't created yet
+prefetch_statuses = (
+    'active.pre-qualification.stand-still',
+    'active.auction',
+)
+PREFETCH_BID_STATUSES = ('active', 'pending')
 ID_PASSPORT_LEN = 9
 
 EDR_REGISTRATION_STATUSES = {
@@ -41,3 +47,5 @@ EDR_REGISTRATION_STATUSES = {
 
 EDR_IDENTIFICATION_SCHEMA = "UA-EDR"
 EDR_ACTIVITY_KIND_SCHEME = "КВЕД"
+
+EDR_CACHE_LOCK_POLL_INTERVAL = 0.2  # seconds between checks of a request lock
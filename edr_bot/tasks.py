@@ -1,15 +1,18 @@
 from celery_worker.celery import app, formatter
 from celery_worker.locks import unique_lock, concurrency_lock
+from celery_worker.rate_limits import wait_for_token, take_free_token, RateLimitExceeded, MongoTokenBucket
+from celery.exceptions import Ignore
 from celery.utils.log import get_task_logger
 from tasks_utils.requests import (
     get_request_retry_countdown,
     get_exponential_request_retry_countdown,
     get_task_retry_logger_method,
+    get_public_api_data,
 )
 from edr_bot.settings import (
     DOC_TYPES, IDENTIFICATION_SCHEME, DOC_AUTHOR,
     VERSION as EDR_BOT_VERSION,
-    FILE_NAME, ID_PASSPORT_LEN, EDR_REGISTRATION_STATUSES,
+    FILE_NAME, EDR_REGISTRATION_STATUSES, PREFETCH_BID_STATUSES,
 )
 from edr_bot.results_db import (
     get_upload_results,
@@ -18,18 +21,23 @@ from edr_bot.results_db import (
 )
 from environment_settings import (
     API_HOST, API_TOKEN, PUBLIC_API_HOST, API_VERSION,
-    EDR_API_USER, EDR_API_PASSWORD, EDR_API_DIRECT_VERSION,
+    EDR_API_DIRECT_VERSION,
     DS_HOST, DS_USER, DS_PASSWORD,
-    SPREAD_TENDER_TASKS_INTERVAL, CONNECT_TIMEOUT, READ_TIMEOUT, TASKS_API_URI,
+    EDR_RATE_LIMIT, EDR_RATE_LIMIT_BURST, CONNECT_TIMEOUT, READ_TIMEOUT,
 )
+from edr_bot.utils import request_edr_data, get_edr_param
 from uuid import uuid4
+from functools import partial
 import requests
 import json
 import yaml
 import io
 
 from tasks_utils.settings import DEFAULT_HEADERS
+from tasks_utils.cookies import server_id_cookies
+from tasks_utils.tenders import TenderIndex
 from tasks_utils.tasks import ATTACH_DOC_MAX_RETRIES
+from tasks_utils.results_db import get_content_hash, get_ds_upload, save_ds_upload
 
 logger = get_task_logger(__name__)
 
@@ -38,6 +46,8 @@ RETRY_REQUESTS_EXCEPTIONS = (
     requests.exceptions.ConnectionError,
 )
 
+edr_rate_limiter = MongoTokenBucket("edr", rate=EDR_RATE_LIMIT, capacity=EDR_RATE_LIMIT_BURST)
+
 
 @app.task(bind=True)
 def process_tender(self, tender_id, *args, **kwargs):
@@ -76,33 +86,31 @@ def process_tender(self, tender_id, *args, **kwargs):
             return
 
         # --------
-        i = 0  # spread in time tasks that belongs to a single tender CS-3854
+        # EDR requests are spread in time by the rate limit of get_edr_data CS-3854
+        index = TenderIndex(tender_data)
         if 'awards' in tender_data:
             for award in tender_data['awards']:
                 if should_process_item(award):
                     for supplier in award['suppliers']:
-                        process_award_supplier(response, tender_data, award, supplier, i)
-                        i += 1
+                        process_award_supplier(response, tender_data, award, supplier, index=index)
 
         elif 'qualifications' in tender_data:
             for qualification in tender_data['qualifications']:
                 if should_process_item(qualification):
-                    process_qualification(response, tender_data, qualification, i)
-                    i += 1
+                    process_qualification(response, tender_data, qualification, index=index)
 
 
-def process_award_supplier(response, tender, award, supplier, item_number):
+def process_award_supplier(response, tender, award, supplier, index=None):
     if not is_valid_identifier(supplier['identifier']):
         logger.warning('Tender {} award {} identifier {} is not valid.'.format(
             tender['id'], award["id"], supplier['identifier']
         ), extra={"MESSAGE_ID": "EDR_INVALID_IDENTIFIER"})
-    elif not check_related_lot_status(tender, award):
+    elif not check_related_lot_status(tender, award, index=index):
         logger.warning("Tender {} bid {} award {} related lot has been cancelled".format(
             tender['id'], award['bid_id'], award['id']
         ), extra={"MESSAGE_ID": "EDR_CANCELLED_LOT"})
     else:
         get_edr_data.apply_async(
-            countdown=SPREAD_TENDER_TASKS_INTERVAL * item_number,
             kwargs=dict(
                 code=str(supplier['identifier']['id']),
                 tender_id=tender['id'],
@@ -112,19 +120,19 @@ def process_award_supplier(response, tender, award, supplier, item_number):
         )
 
 
-def process_qualification(response, tender, qualification, item_number):
-    appropriate_bids = [b for b in tender.get("bids", [])
-                        if b['id'] == qualification['bidID']]
-    if not appropriate_bids:
+def process_qualification(response, tender, qualification, index=None):
+    index = index or TenderIndex(tender)
+    bid = index.get_bid(qualification['bidID'])
+    if not bid:
         logger.warning('Tender {} bid {} is missed.'.format(
             tender['id'], qualification['bidID']
         ), extra={"MESSAGE_ID": "EDR_BID_ID_INVALID"})
         return
 
-    tenderers = appropriate_bids[0].get('tenderers')
+    tenderers = bid.get('tenderers')
     if not tenderers:
         logger.warning('Tender {} bid {} tenderers are missed.'.format(
-            tender['id'], appropriate_bids[0]['id']
+            tender['id'], bid['id']
         ), extra={"MESSAGE_ID": "EDR_TENDERER_KEY_MISSED"})
         return
 
@@ -134,7 +142,6 @@ def process_qualification(response, tender, qualification, item_number):
         ), extra={"MESSAGE_ID": "EDR_INVALID_IDENTIFIER"})
     else:
         get_edr_data.apply_async(
-            countdown=SPREAD_TENDER_TASKS_INTERVAL * item_number,
             kwargs=dict(
                 code=str(tenderers[0]['identifier']['id']),
                 tender_id=tender['id'],
@@ -159,16 +166,12 @@ def should_process_item(item):
                     for document in item.get('documents', [])))
 
 
-def check_related_lot_status(tender, award):
+def check_related_lot_status(tender, award, index=None):
     """Check if related lot not in status cancelled"""
     lot_id = award.get('lotID')
     if lot_id:
-        lot_statuses = [
-            l['status']
-            for l in tender.get('lots', [])
-            if l['id'] == lot_id
-        ]
-        return lot_statuses and 'active' in lot_statuses
+        lot = (index or TenderIndex(tender)).get_lot(lot_id)
+        return lot is not None and lot['status'] == 'active'
     return True
 
 
@@ -179,10 +182,11 @@ def is_valid_identifier(identifier):
 # ------- GET EDR DATA
 @app.task(bind=True, max_retries=20)
 @concurrency_lock
-@unique_lock
-def get_edr_data(self, code, tender_id, item_name, item_id, request_id=None):
+@unique_lock(omit=["edr_slot"])
+def get_edr_data(self, code, tender_id, item_name, item_id, request_id=None, edr_slot=None):
     """
     request_id: is deprecated, should be removed in the next releases
+    edr_slot: rate limit token reserved by the previous run of the task (see wait_for_token)
     """
     meta = {
         'id': uuid4().hex,
@@ -190,37 +194,31 @@ def get_edr_data(self, code, tender_id, item_name, item_id, request_id=None):
         'sourceRequests': [],
         'version': EDR_BOT_VERSION,
     }
-    param = 'code' if code.isdigit() and len(code) != ID_PASSPORT_LEN else 'passport'
-    url = "{tasks_uri}/edr/verify?{param}={code}".format(
-        tasks_uri=TASKS_API_URI,
-        param=param,
-        code=code,
-    )
+    param = get_edr_param(code)
     try:
-        response = requests.get(
-            url,
-            auth=(EDR_API_USER, EDR_API_PASSWORD),
-            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
-            headers={
-                "X-Client-Request-ID": meta["id"],
-                **DEFAULT_HEADERS,
-            }
+        response = request_edr_data(
+            code, meta["id"],
+            acquire_token=partial(wait_for_token, edr_rate_limiter, slot=edr_slot),
+        )
+    except RateLimitExceeded as exc:
+        # the token is reserved, the task comes back for it without spending its retries
+        logger.info(f"Rate limit of {exc.name} is reached, postponing {code} for {exc.wait:.2f} seconds",
+                    extra={"MESSAGE_ID": "EDR_RATE_LIMIT_POSTPONE"})
+        self.apply_async(
+            kwargs=dict(code=code, tender_id=tender_id, item_name=item_name, item_id=item_id, edr_slot=exc.slot),
+            countdown=exc.wait,
         )
+        raise Ignore()
     except RETRY_REQUESTS_EXCEPTIONS as exc:
         logger.exception(exc, extra={"MESSAGE_ID": "EDR_GET_DATA_EXCEPTION"})
         raise self.retry(exc=exc)
+    except json.decoder.JSONDecodeError as exc:
+        logger.warning("JSONDecodeError on edr request", extra={"MESSAGE_ID": "EDR_JSON_DECODE_EXCEPTION"})
+        countdown = get_exponential_request_retry_countdown(self)
+        raise self.retry(exc=exc, countdown=countdown)
     else:
         meta['sourceRequests'].append(response.headers.get('X-Request-ID', ''))
-
-        try:
-            resp_json = response.json()
-        except json.decoder.JSONDecodeError as exc:
-            logger.warning(
-                "JSONDecodeError on edr request with status {}: ".format(response.status_code),
-                extra={"MESSAGE_ID": "EDR_JSON_DECODE_EXCEPTION"}
-            )
-            countdown = get_exponential_request_retry_countdown(self, response)
-            raise self.retry(exc=exc, countdown=countdown)
+        resp_json = response.json()
 
         data_list = []
 
@@ -267,6 +265,46 @@ def get_edr_data(self, code, tender_id, item_name, item_id, request_id=None):
             upload_to_doc_service.delay(data=data, tender_id=tender_id, item_name=item_name, item_id=item_id, edr_code=code)
 
 
+# ------- PREFETCH EDR DATA
+@app.task(bind=True)
+@unique_lock
+def prefetch_tender(self, tender_id):
+    """
+    Requests EDR data of the bidders before the tender's qualification,
+    so get_edr_data mostly gets it from the cache
+    """
+    tender = get_public_api_data(self, tender_id, "tender")
+    codes = sorted({
+        str(tenderer['identifier']['id'])
+        for bid in tender.get('bids', [])
+        if bid.get('status') in PREFETCH_BID_STATUSES
+        for tenderer in bid.get('tenderers', [])
+        if is_valid_identifier(tenderer['identifier'])
+    })
+    for code in codes:
+        prefetch_edr_data.delay(code=code)
+
+
+@app.task(bind=True)
+@unique_lock
+def prefetch_edr_data(self, code):
+    try:
+        # only a token that's free right now, the ones reserved by get_edr_data aren't taken
+        response = request_edr_data(code, uuid4().hex, acquire_token=partial(take_free_token, edr_rate_limiter))
+    except RateLimitExceeded:
+        # not marked as done by unique_lock, so the code can be prefetched for another tender
+        logger.info(f"Skip prefetching EDR data for {code}: no free tokens", extra={"MESSAGE_ID": "EDR_PREFETCH_SKIP"})
+        raise Ignore()
+    except RETRY_REQUESTS_EXCEPTIONS as exc:
+        # it's going to be requested again at qualification anyway
+        logger.warning(f"Failed to prefetch EDR data for {code}: {exc}", extra={"MESSAGE_ID": "EDR_PREFETCH_EXCEPTION"})
+    else:
+        logger.info(f"Prefetched EDR data for {code} with status {response.status_code}", extra={
+            "MESSAGE_ID": "EDR_PREFETCH_DATA",
+            "STATUS_CODE": response.status_code,
+        })
+
+
 # --------- UPLOAD TO DS
 @app.task(bind=True)
 @formatter.omit(["data"])
@@ -284,38 +322,45 @@ def upload_to_doc_service(self, data, tender_id, item_name, item_id, edr_code):
     if upload_results is None:
         # generate file data
         contents = yaml.safe_dump(data, allow_unicode=True, default_flow_style=False)
-        temporary_file = io.StringIO(contents)
-        temporary_file.name = file_name
-
-        files = {'file': (file_name, temporary_file, 'application/yaml')}
-
-        try:
-            response = requests.post(
-                '{host}/upload'.format(host=DS_HOST),
-                auth=(DS_USER, DS_PASSWORD),
-                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
-                files=files,
-                headers={
-                    'X-Client-Request-ID': data['meta']['id'],
-                    **DEFAULT_HEADERS,
-                }
-            )
-        except RETRY_REQUESTS_EXCEPTIONS as exc:
-            logger.exception(exc, extra={"MESSAGE_ID": "EDR_POST_DOC_EXCEPTION"})
-            raise self.retry(exc=exc)
+        # the file is reused only if it's the same, including meta (retries after upload results misses)
+        content_hash = get_content_hash(file_name, contents)
+        document_data = get_ds_upload(content_hash)
+        if document_data is not None:
+            response_json = {'data': document_data}
         else:
-            if response.status_code != 200:
-                logger_method = get_task_retry_logger_method(self, logger)
-                logger_method(
-                    "Incorrect upload status for doc {}".format(data['meta']['id']),
-                    extra={
-                        "MESSAGE_ID": "EDR_POST_DOC_ERROR",
-                        "STATUS_CODE": response.status_code,
-                    })
-                raise self.retry(countdown=get_request_retry_countdown(response))
-
-            response_json = response.json()
-            response_json['meta'] = {'id': data['meta']['id']}
+            temporary_file = io.StringIO(contents)
+            temporary_file.name = file_name
+
+            files = {'file': (file_name, temporary_file, 'application/yaml')}
+
+            try:
+                response = requests.post(
+                    '{host}/upload'.format(host=DS_HOST),
+                    auth=(DS_USER, DS_PASSWORD),
+                    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                    files=files,
+                    headers={
+                        'X-Client-Request-ID': data['meta']['id'],
+                        **DEFAULT_HEADERS,
+                    }
+                )
+            except RETRY_REQUESTS_EXCEPTIONS as exc:
+                logger.exception(exc, extra={"MESSAGE_ID": "EDR_POST_DOC_EXCEPTION"})
+                raise self.retry(exc=exc)
+            else:
+                if response.status_code != 200:
+                    logger_method = get_task_retry_logger_method(self, logger)
+                    logger_method(
+                        "Incorrect upload status for doc {}".format(data['meta']['id']),
+                        extra={
+                            "MESSAGE_ID": "EDR_POST_DOC_ERROR",
+                            "STATUS_CODE": response.status_code,
+                        })
+                    raise self.retry(countdown=get_request_retry_countdown(response))
+
+                response_json = response.json()
+                save_ds_upload(content_hash, dict(response_json['data']))
+        response_json['meta'] = {'id': data['meta']['id']}
         # save response to mongodb, so that the file won't be uploaded again
         # fail silently: if mongodb isn't available, the task will neither fail nor retry
         # in worst case there might be a duplicate attached to the tender
@@ -362,16 +407,18 @@ def attach_doc_to_tender(self, file_data, data, tender_id, item_name, item_id):
     )
 
     meta_id = file_data['meta']['id']
-    # get SERVER_ID cookie
+    # get SERVER_ID cookie, HEAD request is made only if the process doesn't know a valid one
     try:
-        head_response = requests.head(
-            url,
-            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
-            headers={
-                'Authorization': 'Bearer {}'.format(API_TOKEN),
-                'X-Client-Request-ID': meta_id,
-                **DEFAULT_HEADERS,
-            }
+        cookies = server_id_cookies.get_cookies(
+            lambda: requests.head(
+                url,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                headers={
+                    'Authorization': 'Bearer {}'.format(API_TOKEN),
+                    'X-Client-Request-ID': meta_id,
+                    **DEFAULT_HEADERS,
+                }
+            ).cookies
         )
     except RETRY_REQUESTS_EXCEPTIONS as exc:
         logger.exception(exc, extra={"MESSAGE_ID": "EDR_ATTACH_DOC_HEAD_EXCEPTION"})
@@ -389,12 +436,15 @@ def attach_doc_to_tender(self, file_data, data, tender_id, item_name, item_id):
                     'X-Client-Request-ID': meta_id,
                     **DEFAULT_HEADERS,
                 },
-                cookies=head_response.cookies,
+                cookies=cookies,
             )
         except RETRY_REQUESTS_EXCEPTIONS as exc:
             logger.exception(exc, extra={"MESSAGE_ID": "EDR_ATTACH_DOC_POST_EXCEPTION"})
             raise self.retry(exc=exc)
         else:
+            if response.status_code == 412:
+                server_id_cookies.refresh(response.cookies)
+
             # handle response code
             if response.status_code == 422:
                 logger.error("Incorrect document data while attaching doc {} to tender {}: {}".format(
@@ -4,10 +4,14 @@ from unittest.mock import patch, Mock
 from celery.exceptions import Retry
 import unittest
 import requests
+from tasks_utils.cookies import server_id_cookies
 
 
 class AttachDocTestCase(unittest.TestCase):
 
+    def setUp(self):
+        server_id_cookies.reset()
+
     @patch("edr_bot.tasks.get_upload_results")
     def test_handle_head_connection_error(self, get_upload_results):
         get_upload_results.return_value = None
@@ -289,3 +293,51 @@ class AttachDocTestCase(unittest.TestCase):
         get_upload_results.assert_called_once_with(attach_doc_to_tender, data, tender_id, item_name, item_id)
         set_upload_results_attached.assert_not_called()
 
+
+    @patch("edr_bot.tasks.set_upload_results_attached")
+    @patch("edr_bot.tasks.get_upload_results")
+    def test_reuse_server_id_cookie(self, get_upload_results, set_upload_results_attached):
+        get_upload_results.return_value = None
+        file_data, data = {"meta": {"id": 1}, "data": {'test': 3}}, {}
+        tender_id, item_name, item_id = "f" * 32, "award", "a" * 32
+
+        server_id = "e" * 32
+        with patch("edr_bot.tasks.requests") as requests_mock:
+            requests_mock.post.return_value = Mock(status_code=201)
+            requests_mock.head.return_value = Mock(cookies={'SERVER_ID': server_id})
+            attach_doc_to_tender.retry = Mock(side_effect=Retry)
+
+            for _ in range(3):
+                attach_doc_to_tender(file_data=file_data, data=data,
+                                     tender_id=tender_id, item_name=item_name, item_id=item_id)
+
+        requests_mock.head.assert_called_once()
+        self.assertEqual(requests_mock.post.call_count, 3)
+        for post_call in requests_mock.post.call_args_list:
+            self.assertEqual(post_call[1]["cookies"], {'SERVER_ID': server_id})
+        self.assertEqual(server_id_cookies.stats["fetches"], 1)
+        self.assertEqual(server_id_cookies.stats["hits"], 2)
+
+    @patch("edr_bot.tasks.get_upload_results")
+    def test_handle_post_412_response(self, get_upload_results):
+        get_upload_results.return_value = None
+        file_data, data = {"meta": {"id": 1}, "data": {'test': 3}}, {}
+        tender_id, item_name, item_id = "f" * 32, "award", "a" * 32
+
+        with patch("edr_bot.tasks.requests") as requests_mock:
+            requests_mock.post.return_value = Mock(
+                status_code=412,
+                headers={'Retry-After': 1},
+                cookies={'SERVER_ID': "b" * 32},
+            )
+            requests_mock.head.return_value = Mock(cookies={'SERVER_ID': "a" * 32})
+            attach_doc_to_tender.retry = Mock(side_effect=Retry)
+
+            with self.assertRaises(Retry):
+                attach_doc_to_tender(file_data=file_data, data=data,
+                                     tender_id=tender_id, item_name=item_name, item_id=item_id)
+
+        attach_doc_to_tender.retry.assert_called_once_with(countdown=1.0)
+        self.assertEqual(requests_mock.post.call_args[1]["cookies"], {'SERVER_ID': "a" * 32})
+        self.assertEqual(server_id_cookies.get_cookies(Mock()), {'SERVER_ID': "b" * 32})
+        self.assertEqual(server_id_cookies.stats["refreshes"], 1)
@@ -1,8 +1,12 @@
 from edr_bot.settings import VERSION, DOC_AUTHOR
-from edr_bot.tasks import get_edr_data
+from edr_bot.tasks import get_edr_data, edr_rate_limiter
+from edr_bot.utils import request_edr_data
+from celery_worker.rate_limits import RateLimitExceeded
+from edr_bot.exceptions import abort_json
+from environment_settings import EDR_API_USER
 from uuid import uuid4
-from unittest.mock import patch, Mock, call
-from celery.exceptions import Retry
+from unittest.mock import patch, Mock, call, ANY
+from celery.exceptions import Retry, Ignore
 import unittest
 import requests
 
@@ -11,25 +15,77 @@ import requests
        Mock(return_value=Mock(find_one=Mock(return_value=None))))
 class TestHandlerCase(unittest.TestCase):
 
+    def test_rate_limit_postponed(self):
+        code = "1234"
+        tender_id, item_name, item_id = "f" * 32, "award", "a" * 32
+
+        with patch("edr_bot.tasks.request_edr_data") as request_edr_data_mock, \
+             patch.object(get_edr_data, "apply_async") as apply_async_mock, \
+             patch.object(get_edr_data, "retry") as retry_mock, \
+             patch("celery_worker.rate_limits.time", Mock(return_value=1000.0)):
+            request_edr_data_mock.side_effect = RateLimitExceeded("edr", 1030.0)
+
+            with self.assertRaises(Ignore):
+                get_edr_data(code, tender_id, item_name, item_id)
+
+        apply_async_mock.assert_called_once_with(
+            kwargs=dict(code=code, tender_id=tender_id, item_name=item_name, item_id=item_id, edr_slot=1030.0),
+            countdown=30.0,
+        )
+        retry_mock.assert_not_called()
+
+    @patch("edr_bot.tasks.upload_to_doc_service", Mock())
+    @patch("celery_worker.rate_limits.sleep")
+    def test_rate_limit_slot(self, sleep_mock):
+        code = "1234"
+        tender_id, item_name, item_id = "f" * 32, "award", "a" * 32
+
+        with patch("edr_bot.tasks.request_edr_data") as request_edr_data_mock, \
+             patch.object(edr_rate_limiter, "reserve") as reserve_mock:
+            request_edr_data_mock.return_value = Mock(status_code=200, json=Mock(return_value={
+                "data": [{"test": 1}], "meta": {"detailsSourceDate": []},
+            }), headers={})
+
+            get_edr_data(code, tender_id, item_name, item_id, edr_slot=1.0)
+
+            # the reserved token is used, a new one isn't taken
+            acquire_token = request_edr_data_mock.call_args[1]["acquire_token"]
+            acquire_token()
+        reserve_mock.assert_not_called()
+        sleep_mock.assert_not_called()
+
     def test_handle_connection_error(self):
         code = "1234"
         tender_id, item_name, item_id = "f" * 32, "award", "a" * 32
 
-        with patch("edr_bot.tasks.requests") as requests_mock:
-            requests_mock.get.side_effect = requests.exceptions.ConnectionError()
+        with patch("edr_bot.tasks.request_edr_data") as request_edr_data:
+            request_edr_data.side_effect = requests.exceptions.ConnectionError()
 
             get_edr_data.retry = Mock(side_effect=Retry)
             with self.assertRaises(Retry):
                 get_edr_data(code, tender_id, item_name, item_id)
 
-            get_edr_data.retry.assert_called_once_with(exc=requests_mock.get.side_effect)
+            get_edr_data.retry.assert_called_once_with(exc=request_edr_data.side_effect)
+
+    def test_handle_json_decode_error(self):
+        code = "1234"
+        tender_id, item_name, item_id = "f" * 32, "award", "a" * 32
+
+        with patch("edr_bot.tasks.request_edr_data") as request_edr_data_mock:
+            request_edr_data_mock.side_effect = requests.exceptions.JSONDecodeError("Expecting value", "<html>", 0)
+
+            with patch.object(get_edr_data, "retry", Mock(side_effect=Retry)) as retry_mock:
+                with self.assertRaises(Retry):
+                    get_edr_data(code, tender_id, item_name, item_id)
+
+            retry_mock.assert_called_once_with(exc=request_edr_data_mock.side_effect, countdown=ANY)
 
     def test_handle_429_response(self):
         code = "1234"
         tender_id, item_name, item_id = "f" * 32, "award", "a" * 32
 
-        with patch("edr_bot.tasks.requests") as requests:
-            requests.get.return_value = Mock(
+        with patch("edr_bot.tasks.request_edr_data") as request_edr_data:
+            request_edr_data.return_value = Mock(
                 status_code=429,
                 headers={'Retry-After': "13"}
             )
@@ -47,8 +103,8 @@ class TestHandlerCase(unittest.TestCase):
 
         ret_aft, resp_id = 13, uuid4().hex
         source_date = ["2018-12-25T19:00:00+02:00"]
-        with patch("edr_bot.tasks.requests") as requests:
-            requests.get.return_value = Mock(
+        with patch("edr_bot.tasks.request_edr_data") as request_edr_data:
+            request_edr_data.return_value = Mock(
                 status_code=404,
                 json=Mock(return_value={
                     'errors': [
@@ -103,8 +159,8 @@ class TestHandlerCase(unittest.TestCase):
         tender_id, item_name, item_id = "f" * 32, "award", "a" * 32
         source_date = ["2018-12-25T19:00:00+02:00"]
 
-        with patch("edr_bot.tasks.requests") as requests_mock:
-            requests_mock.get.return_value = Mock(
+        with patch("edr_bot.tasks.request_edr_data") as request_edr_data:
+            request_edr_data.return_value = Mock(
                 status_code=200,
                 json=Mock(return_value={
                     'data': [{"test": 1}],
@@ -148,8 +204,8 @@ class TestHandlerCase(unittest.TestCase):
         tender_id, item_name, item_id = "f" * 32, "award", "a" * 32
         source_date = ["2018-12-25T19:00:00+02:00"]
 
-        with patch("edr_bot.tasks.requests") as requests_mock:
-            requests_mock.get.return_value = Mock(
+        with patch("edr_bot.tasks.request_edr_data") as request_edr_data:
+            request_edr_data.return_value = Mock(
                 status_code=200,
                 json=Mock(return_value={
                     'data': [{"test": 1}, {"test": 2}],
@@ -201,3 +257,38 @@ class TestHandlerCase(unittest.TestCase):
                 )
             ]
         )
+
+
+class RequestEDRDataTestCase(unittest.TestCase):
+
+    @patch("edr_bot.utils.verify_code")
+    def test_data(self, verify_code):
+        verify_code.return_value = {"data": [{"test": 1}], "meta": {"detailsSourceDate": []}}
+
+        response = request_edr_data("14360570", "b" * 32)
+
+        verify_code.assert_called_once_with("code", "14360570", role=EDR_API_USER, acquire_token=None)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), verify_code.return_value)
+        self.assertEqual(response.headers["X-Client-Request-ID"], "b" * 32)
+        self.assertTrue(response.headers["X-Request-ID"].startswith("req-"))
+
+    @patch("edr_bot.utils.verify_code")
+    def test_error(self, verify_code):
+        error_message = {
+            "location": "body",
+            "name": "data",
+            "description": [{"message": "Retry request after 30 seconds."}],
+        }
+        verify_code.side_effect = lambda *args, **kwargs: abort_json(
+            code=429, error_message=error_message, headers={"Retry-After": 30},
+        )
+
+        response = request_edr_data("123456789", "b" * 32)
+
+        verify_code.assert_called_once_with("passport", "123456789", role=EDR_API_USER, acquire_token=None)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json(), {"status": "error", "errors": [error_message]})
+        self.assertEqual(response.headers["Retry-After"], "30")
+        self.assertEqual(response.headers["X-Client-Request-ID"], "b" * 32)
+        self.assertTrue(response.headers["X-Request-ID"].startswith("req-"))
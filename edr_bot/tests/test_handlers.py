@@ -112,3 +112,29 @@ class TestHandlerCase(unittest.TestCase):
         with patch("edr_bot.handlers.process_tender") as process_tender:
             await edr_bot_tender_handler(tender)
         process_tender.delay.assert_called_with(tender_id="qwe")
+
+    @async_test
+    async def test_prefetch(self):
+        tender = {
+            "id": "qwr",
+            "status": "active.pre-qualification.stand-still",
+            "procurementMethodType": test_qualification_procedures[0],
+        }
+        with patch("edr_bot.handlers.process_tender") as process_tender, \
+             patch("edr_bot.handlers.prefetch_tender") as prefetch_tender, \
+             patch("edr_bot.handlers.EDR_PREFETCH_ENABLED", True):
+            await edr_bot_tender_handler(tender)
+        process_tender.delay.assert_not_called()
+        prefetch_tender.delay.assert_called_once_with(tender_id="qwr")
+
+    @async_test
+    async def test_prefetch_disabled(self):
+        tender = {
+            "id": "qwr",
+            "status": "active.auction",
+            "procurementMethodType": test_qualification_procedures[0],
+        }
+        with patch("edr_bot.handlers.prefetch_tender") as prefetch_tender, \
+             patch("edr_bot.handlers.EDR_PREFETCH_ENABLED", False):
+            await edr_bot_tender_handler(tender)
+        prefetch_tender.delay.assert_not_called()
@@ -0,0 +1,78 @@
+from edr_bot.tasks import prefetch_tender, prefetch_edr_data, edr_rate_limiter
+from unittest.mock import patch, Mock, call, ANY
+from celery.exceptions import Ignore
+from celery_worker.rate_limits import RateLimitExceeded
+import requests
+import unittest
+
+
+@patch('celery_worker.locks.get_mongodb_collection',
+       Mock(return_value=Mock(find_one=Mock(return_value=None))))
+class PrefetchTestCase(unittest.TestCase):
+
+    @patch("edr_bot.tasks.prefetch_edr_data")
+    @patch("edr_bot.tasks.get_public_api_data")
+    def test_prefetch_tender(self, get_public_api_data, prefetch_edr_data_mock):
+        get_public_api_data.return_value = {
+            "id": "f" * 32,
+            "bids": [
+                {
+                    "status": "active",
+                    "tenderers": [
+                        {"identifier": {"id": "14360570", "scheme": "UA-EDR"}},
+                        {"identifier": {"id": 1234567, "scheme": "UA-EDR"}},
+                    ],
+                },
+                {
+                    "status": "pending",
+                    "tenderers": [
+                        {"identifier": {"id": "14360570", "scheme": "UA-EDR"}},
+                        {"identifier": {"id": "AB123456", "scheme": "UA-EDR"}},  # not valid
+                        {"identifier": {"id": "12345", "scheme": "UA-IPN"}},  # not valid
+                    ],
+                },
+                {
+                    "status": "unsuccessful",
+                    "tenderers": [{"identifier": {"id": "7777777", "scheme": "UA-EDR"}}],
+                },
+                {"status": "active"},
+            ]
+        }
+
+        prefetch_tender("f" * 32)
+
+        get_public_api_data.assert_called_once_with(prefetch_tender, "f" * 32, "tender")
+        self.assertEqual(
+            prefetch_edr_data_mock.delay.call_args_list,
+            [call(code="1234567"), call(code="14360570")]
+        )
+
+    @patch("edr_bot.tasks.request_edr_data")
+    def test_prefetch_edr_data(self, request_edr_data):
+        request_edr_data.return_value = Mock(status_code=200)
+
+        prefetch_edr_data(code="14360570")
+
+        request_edr_data.assert_called_once_with("14360570", ANY, acquire_token=ANY)
+        with patch.object(edr_rate_limiter, "acquire", Mock(return_value=(True, 0))) as acquire_mock:
+            request_edr_data.call_args[1]["acquire_token"]()
+        acquire_mock.assert_called_once_with(max_wait=0)
+
+    @patch("edr_bot.tasks.request_edr_data")
+    def test_prefetch_edr_data_error(self, request_edr_data):
+        request_edr_data.side_effect = requests.exceptions.ConnectionError()
+
+        with patch.object(prefetch_edr_data, "retry") as retry_mock:
+            prefetch_edr_data(code="14360570")
+
+        retry_mock.assert_not_called()
+
+    @patch("edr_bot.tasks.request_edr_data")
+    def test_prefetch_edr_data_no_tokens(self, request_edr_data):
+        request_edr_data.side_effect = RateLimitExceeded("edr", 1003.0)
+
+        with patch.object(prefetch_edr_data, "retry") as retry_mock:
+            with self.assertRaises(Ignore):
+                prefetch_edr_data(code="14360570")
+
+        retry_mock.assert_not_called()
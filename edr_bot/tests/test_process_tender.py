@@ -1,4 +1,4 @@
-from environment_settings import SPREAD_TENDER_TASKS_INTERVAL, DEFAULT_RETRY_AFTER
+from environment_settings import DEFAULT_RETRY_AFTER
 from uuid import uuid4
 from unittest.mock import patch, Mock, call
 from celery.exceptions import Retry
@@ -125,7 +125,6 @@ class TestHandlerCase(unittest.TestCase):
             get_edr_data.apply_async.call_args_list,
             [
                 call(
-                    countdown=0,
                     kwargs=dict(
                         code=code_1,
                         item_id=item_id,
@@ -134,7 +133,6 @@ class TestHandlerCase(unittest.TestCase):
                     )
                 ),
                 call(
-                    countdown=SPREAD_TENDER_TASKS_INTERVAL,
                     kwargs=dict(
                         code=code_2,
                         item_id=item_id,
@@ -338,7 +336,6 @@ class TestHandlerCase(unittest.TestCase):
             get_edr_data.apply_async.call_args_list,
             [
                 call(
-                    countdown=0,
                     kwargs=dict(
                         code=code_1,
                         item_id=item_id,
@@ -347,7 +344,6 @@ class TestHandlerCase(unittest.TestCase):
                     )
                 ),
                 call(
-                    countdown=SPREAD_TENDER_TASKS_INTERVAL,
                     kwargs=dict(
                         code=code_1,
                         item_id=item_id,
@@ -356,7 +352,6 @@ class TestHandlerCase(unittest.TestCase):
                     )
                 ),
                 call(
-                    countdown=SPREAD_TENDER_TASKS_INTERVAL * 2,
                     kwargs=dict(
                         code=code_1,
                         item_id=item_id,
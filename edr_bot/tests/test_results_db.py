@@ -6,7 +6,11 @@ from edr_bot.results_db import (
     get_upload_results,
     save_upload_results,
     set_upload_results_attached,
+    get_edr_not_found,
+    save_edr_not_found,
+    not_found_cache,
 )
+from environment_settings import EDR_API_DIRECT_VERSION, EDR_API_NOT_FOUND_CACHE_TIMEOUT
 import unittest
 
 
@@ -118,3 +122,22 @@ class ResultsDBTestCase(unittest.TestCase):
             {"$set": {'attached': True}}
         )
         self.assertIs(result, None)
+
+
+class NotFoundCacheTestCase(unittest.TestCase):
+
+    def test_get_edr_not_found(self):
+        with patch.object(not_found_cache, "get") as get_mock:
+            get_mock.return_value = {"error": {"code": "notFound"}}
+            result = get_edr_not_found("123")
+
+        self.assertEqual(result, {"error": {"code": "notFound"}})
+        get_mock.assert_called_once_with(f"not_found_{EDR_API_DIRECT_VERSION}_123")
+
+    def test_save_edr_not_found(self):
+        with patch.object(not_found_cache, "set") as set_mock:
+            save_edr_not_found("123", {"error": {"code": "notFound"}})
+
+        set_mock.assert_called_once_with(f"not_found_{EDR_API_DIRECT_VERSION}_123", {"error": {"code": "notFound"}})
+        self.assertEqual(not_found_cache.default_timeout, EDR_API_NOT_FOUND_CACHE_TIMEOUT)
+        self.assertEqual(not_found_cache.collection_name, "edr_bot_not_found_cache")
@@ -1,10 +1,13 @@
 from edr_bot.tasks import upload_to_doc_service
+from tasks_utils.results_db import get_content_hash
 from unittest.mock import patch, Mock
 from celery.exceptions import Retry
 import unittest
 import requests
 
 
+@patch("edr_bot.tasks.get_ds_upload", Mock(return_value=None))
+@patch("edr_bot.tasks.save_ds_upload", Mock())
 class UploadDocTestCase(unittest.TestCase):
 
     @patch("edr_bot.tasks.get_upload_results")
@@ -104,3 +107,33 @@ class UploadDocTestCase(unittest.TestCase):
             item_id
         )
         save_upload_results.assert_not_called()
+
+    @patch("edr_bot.tasks.save_upload_results")
+    @patch("edr_bot.tasks.get_upload_results")
+    @patch("edr_bot.tasks.attach_doc_to_tender")
+    def test_handle_uploaded_content(self, attach_doc_to_tender, get_upload_results, save_upload_results):
+        get_upload_results.return_value = None
+
+        data, tender_id, item_name, item_id = {"meta": {"id": 2}, "data": {"content": "test"}}, "f" * 32, "award", "a" * 32
+
+        with patch("edr_bot.tasks.requests") as requests_mock, \
+             patch("edr_bot.tasks.get_ds_upload") as get_ds_upload, \
+             patch("edr_bot.tasks.save_ds_upload") as save_ds_upload:
+            get_ds_upload.return_value = {"test": 1}
+            upload_to_doc_service(data=data, tender_id=tender_id, item_name=item_name, item_id=item_id, edr_code="test")
+
+        requests_mock.post.assert_not_called()
+        save_ds_upload.assert_not_called()
+        # the whole file is compared, including meta
+        get_ds_upload.assert_called_once_with(
+            get_content_hash("edr_test_other.yaml", "data:\n  content: test\nmeta:\n  id: 2\n")
+        )
+        file_data = {'data': {"test": 1}, 'meta': {'id': 2}}
+        attach_doc_to_tender.delay.assert_called_once_with(
+            file_data=file_data,
+            data=data,
+            tender_id=tender_id,
+            item_name=item_name,
+            item_id=item_id
+        )
+        save_upload_results.assert_called_once_with(file_data, {"data": {"content": "test"}}, tender_id, item_name, item_id)
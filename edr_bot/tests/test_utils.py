@@ -0,0 +1,165 @@
+from unittest.mock import patch, call, Mock, ANY
+from requests.exceptions import ReadTimeout
+from werkzeug.exceptions import HTTPException
+from celery_worker.rate_limits import RateLimitExceeded
+from edr_bot.utils import edr_request_lock, user_details, verify_code
+from environment_settings import EDR_API_DIRECT_VERSION
+import unittest
+
+
+class EDRRequestLockTestCase(unittest.TestCase):
+
+    @patch("edr_bot.utils.sleep")
+    @patch("edr_bot.utils.edr_cache")
+    def test_acquired(self, cache, sleep):
+        cache.add.return_value = True
+
+        with edr_request_lock("123", "robot") as waited:
+            self.assertFalse(waited)
+            cache.delete.assert_not_called()
+
+        cache.add.assert_called_once_with(f"lock_details_{EDR_API_DIRECT_VERSION}_123", True, timeout=30)
+        cache.delete.assert_called_once_with(f"lock_details_{EDR_API_DIRECT_VERSION}_123")
+        sleep.assert_not_called()
+
+    @patch("edr_bot.utils.sleep")
+    @patch("edr_bot.utils.edr_cache")
+    def test_waited(self, cache, sleep):
+        cache.add.side_effect = [False, False, True]
+
+        with edr_request_lock("123", "platform") as waited:
+            self.assertTrue(waited)
+
+        self.assertEqual(sleep.call_count, 2)
+        cache.delete.assert_called_once_with(f"lock_verify_{EDR_API_DIRECT_VERSION}_123")
+
+    @patch("edr_bot.utils.sleep")
+    @patch("edr_bot.utils.edr_cache")
+    def test_released_on_error(self, cache, sleep):
+        cache.add.return_value = True
+
+        with self.assertRaises(ValueError):
+            with edr_request_lock("123", "platform"):
+                raise ValueError("EDR error")
+
+        cache.delete.assert_called_once()
+
+    @patch("edr_bot.utils.time")
+    @patch("edr_bot.utils.sleep")
+    @patch("edr_bot.utils.edr_cache")
+    def test_timeout(self, cache, sleep, time):
+        cache.add.return_value = False
+        time.side_effect = [0, 10, 31]
+
+        with edr_request_lock("123", "platform") as waited:
+            self.assertTrue(waited)
+
+        self.assertEqual(sleep.mock_calls, [call(0.2)])
+        cache.delete.assert_not_called()  # the lock isn't ours
+
+
+def details_response(internal_id, status_code=200):
+    return Mock(
+        status_code=status_code,
+        json=Mock(return_value={"id": internal_id}),
+        headers={
+            "Content-Type": "application/json",
+            "Date": "Tue, 25 Dec 2018 19:00:00 UTC",
+        },
+    )
+
+
+@patch("edr_bot.utils.edr_cache")
+class UserDetailsTestCase(unittest.TestCase):
+
+    @patch("edr_bot.utils.get_edr_subject_details_data")
+    def test_order(self, get_details, cache):
+        cache.get.side_effect = lambda key: {
+            f"subject_{EDR_API_DIRECT_VERSION}_2": {"data": {"id": "2"}, "sourceDate": "2018-12-24T19:00:00+00:00"},
+        }.get(key)
+        get_details.side_effect = details_response
+
+        result = user_details(["1", "2", "3"])
+
+        self.assertEqual(
+            result,
+            {
+                "data": [{"id": "1"}, {"id": "2"}, {"id": "3"}],
+                "meta": {
+                    "sourceDate": "2018-12-25T19:00:00+00:00",
+                    "detailsSourceDate": [
+                        "2018-12-25T19:00:00+00:00",
+                        "2018-12-24T19:00:00+00:00",
+                        "2018-12-25T19:00:00+00:00",
+                    ],
+                },
+            }
+        )
+        self.assertEqual(sorted(c[0][0] for c in get_details.call_args_list), ["1", "3"])
+        cache.set.assert_any_call(
+            f"subject_{EDR_API_DIRECT_VERSION}_1",
+            {"data": {"id": "1"}, "sourceDate": "2018-12-25T19:00:00+00:00"},
+            timeout=ANY,
+        )
+        self.assertEqual(cache.set.call_count, 2)
+
+    @patch("edr_bot.utils.get_edr_subject_details_data")
+    def test_error(self, get_details, cache):
+        cache.get.return_value = None
+        get_details.side_effect = lambda internal_id: details_response(
+            internal_id, status_code=502 if internal_id == "2" else 200
+        )
+
+        with self.assertRaises(HTTPException) as e:
+            user_details(["1", "2", "3"])
+
+        self.assertEqual(
+            e.exception.data["errors"][0]["description"],
+            [{"message": "Service is disabled or upgrade."}],
+        )
+        # the received details are cached for the next try
+        self.assertEqual(
+            sorted(c[0][0] for c in cache.set.call_args_list),
+            [f"subject_{EDR_API_DIRECT_VERSION}_1", f"subject_{EDR_API_DIRECT_VERSION}_3"]
+        )
+
+    @patch("edr_bot.utils.get_edr_subject_details_data")
+    def test_timeout(self, get_details, cache):
+        cache.get.return_value = None
+        get_details.side_effect = ReadTimeout()
+
+        with self.assertRaises(HTTPException) as e:
+            user_details(["1"])
+
+        self.assertEqual(e.exception.code, 403)
+        self.assertEqual(e.exception.data["errors"][0]["description"], [{"message": "Gateway Timeout Error"}])
+        cache.set.assert_not_called()
+
+
+@patch("edr_bot.utils.edr_cache")
+class VerifyCodeAcquireTokenTestCase(unittest.TestCase):
+
+    @patch("edr_bot.utils.get_edr_subject_data")
+    def test_cached(self, get_data, cache):
+        cache.get.return_value = {"data": [{"id": "1"}], "meta": {}}
+        acquire_token = Mock()
+
+        result = verify_code("code", "123", "platform", acquire_token=acquire_token)
+
+        self.assertEqual(result, cache.get.return_value)
+        acquire_token.assert_not_called()
+        get_data.assert_not_called()
+
+    @patch("edr_bot.utils.get_edr_not_found", Mock(return_value=None))
+    @patch("edr_bot.utils.get_edr_subject_data")
+    def test_not_cached(self, get_data, cache):
+        cache.get.return_value = None
+        cache.add.return_value = True
+        acquire_token = Mock(side_effect=RateLimitExceeded("edr", 1030.0))
+
+        with self.assertRaises(RateLimitExceeded):
+            verify_code("code", "123", "platform", acquire_token=acquire_token)
+
+        acquire_token.assert_called_once_with()
+        get_data.assert_not_called()
+        cache.delete.assert_called_once()  # the lock is released
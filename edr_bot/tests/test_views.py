@@ -15,6 +15,10 @@ def basic_auth(username, password):
     return f'Basic {token}'
 
 
+@patch("edr_bot.utils.edr_cache.add", Mock(return_value=True))
+@patch("edr_bot.utils.edr_cache.delete", Mock())
+@patch("edr_bot.utils.get_edr_not_found", Mock(return_value=None))
+@patch("edr_bot.utils.save_edr_not_found", Mock())
 class MainApiTestCase(BaseTestCase):
     def test_permission_forbidden(self):
         response = self.client.get(
@@ -48,8 +52,8 @@ class MainApiTestCase(BaseTestCase):
         )
         self.assertEqual(response.status_code, 403)
 
-    @patch("app.app.cache.get")
-    @patch("app.app.cache.set")
+    @patch("edr_bot.utils.edr_cache.get")
+    @patch("edr_bot.utils.edr_cache.set")
     @patch("edr_bot.utils.get_edr_subject_data")
     @patch("edr_bot.utils.get_edr_subject_details_data")
     def test_cached_response_for_bot(self, mock_get_edr_details_data, mock_get_edr_data, mock_cache_set, mock_cache_get):
@@ -108,9 +112,16 @@ class MainApiTestCase(BaseTestCase):
         mock_get_edr_data.assert_not_called()
         mock_get_edr_details_data.assert_any_call("3")
         mock_get_edr_details_data.assert_any_call("1")
-        mock_cache_set.assert_called_once()
+        self.assertEqual(
+            [c[0][0] for c in mock_cache_set.call_args_list],
+            [
+                f"subject_{EDR_API_DIRECT_VERSION}_1",
+                f"subject_{EDR_API_DIRECT_VERSION}_3",
+                f"details_{EDR_API_DIRECT_VERSION}_789",
+            ]
+        )
 
-    @patch("app.app.cache.get")
+    @patch("edr_bot.utils.edr_cache.get")
     @patch("edr_bot.utils.get_edr_subject_data")
     @patch("edr_bot.utils.get_edr_subject_details_data")
     def test_cached_response_for_platform(self, mock_get_edr_details_data, mock_get_edr_data, mock_cache_get):
@@ -143,9 +154,9 @@ class MainApiTestCase(BaseTestCase):
         mock_get_edr_data.assert_not_called()
         mock_get_edr_details_data.assert_not_called()
 
-    @patch("app.app.cache.get")
+    @patch("edr_bot.utils.edr_cache.get")
     @patch("edr_bot.utils.get_edr_subject_data")
-    @patch("edr_bot.views.SANDBOX_MODE")
+    @patch("edr_bot.utils.SANDBOX_MODE")
     def test_get_sandbox_data(self, mock_sandbox_mode, mock_get_edr_data, mock_cache_get):
         mock_sandbox_mode.return_value = True
         mock_cache_get.return_value = None
@@ -252,9 +263,9 @@ class MainApiTestCase(BaseTestCase):
         )
         self.assertEqual(response.status_code, 200)
 
-    @patch("app.app.cache.get")
+    @patch("edr_bot.utils.edr_cache.get")
     @patch("edr_bot.utils.get_edr_subject_data")
-    @patch("edr_bot.views.SANDBOX_MODE")
+    @patch("edr_bot.utils.SANDBOX_MODE")
     def test_get_edr_data_errors(self, mock_sandbox_mode, mock_get_edr_data, mock_cache_get):
         mock_sandbox_mode.return_value = True
         mock_cache_get.return_value = None
@@ -365,3 +376,73 @@ class MainApiTestCase(BaseTestCase):
             }
         )
         self.assertEqual(response.status_code, 403)
+
+    @patch("edr_bot.utils.edr_cache.get")
+    @patch("edr_bot.utils.get_edr_subject_data")
+    @patch("edr_bot.utils.edr_request_lock")
+    def test_wait_for_concurrent_request(self, mock_lock, mock_get_edr_data, mock_cache_get):
+        mock_lock.return_value.__enter__.return_value = True  # waited for another request
+        mock_cache_get.side_effect = [None, {"data": [{"x_edrInternalId": "2"}]}]
+
+        response = self.client.get(
+            '/edr/verify?code=123',
+            headers={'Authorization': basic_auth("platform", "platform")}
+        )
+
+        self.assertEqual(response.json, {"data": [{"x_edrInternalId": "2"}]})
+        self.assertEqual(response.status_code, 200)
+        mock_lock.assert_called_once_with("123", "platform")
+        mock_get_edr_data.assert_not_called()
+
+    @patch("edr_bot.utils.edr_cache.get")
+    @patch("edr_bot.utils.edr_cache.set")
+    @patch("edr_bot.utils.get_edr_subject_data")
+    def test_not_found(self, mock_get_edr_data, mock_cache_set, mock_cache_get):
+        mock_cache_get.return_value = None
+        mock_get_edr_data.return_value = Mock(
+            status_code=200,
+            json=Mock(return_value=[]),
+            headers={'Date': 'Tue, 25 Dec 2018 19:00:00 UTC'},
+        )
+        description = {
+            "error": {
+                "errorDetails": "Couldn't find this code in EDR.",
+                "code": "notFound"
+            },
+            "meta": {"sourceDate": "2018-12-25T19:00:00+00:00"},
+        }
+
+        # the class patch is applied after the method ones
+        with patch("edr_bot.utils.save_edr_not_found") as mock_save_not_found:
+            response = self.client.get(
+                '/edr/verify?code=123',
+                headers={'Authorization': basic_auth("robot", "robot")}
+            )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json["errors"][0]["description"], [description])
+        mock_save_not_found.assert_called_once_with("123", description)
+        mock_cache_set.assert_not_called()
+
+    @patch("edr_bot.utils.edr_cache.get")
+    @patch("edr_bot.utils.get_edr_subject_data")
+    def test_cached_not_found(self, mock_get_edr_data, mock_cache_get):
+        mock_cache_get.return_value = None
+        description = {
+            "error": {
+                "errorDetails": "Couldn't find this code in EDR.",
+                "code": "notFound"
+            },
+            "meta": {"sourceDate": "2018-12-25T19:00:00+00:00"},
+        }
+
+        for role in ("robot", "platform"):
+            with patch("edr_bot.utils.get_edr_not_found", Mock(return_value=description)):
+                response = self.client.get(
+                    '/edr/verify?code=123',
+                    headers={'Authorization': basic_auth(role, role)}
+                )
+
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json["errors"][0]["description"], [description])
+        mock_get_edr_data.assert_not_called()
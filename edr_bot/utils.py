@@ -1,15 +1,24 @@
+from contextlib import contextmanager
 from datetime import datetime
+from functools import partial
+from time import time, sleep
 
 import requests
 
+from werkzeug.exceptions import HTTPException
 from flask_restx._http import HTTPStatus
 from celery.utils.log import get_task_logger
 from pytz import UTC
 
 from edr_bot.exceptions import abort_json
-from edr_bot.settings import EDR_REGISTRATION_STATUSES, EDR_IDENTIFICATION_SCHEMA, EDR_ACTIVITY_KIND_SCHEME
+from edr_bot.results_db import edr_cache, get_edr_not_found, save_edr_not_found
+from edr_bot.settings import EDR_REGISTRATION_STATUSES, EDR_IDENTIFICATION_SCHEMA, EDR_ACTIVITY_KIND_SCHEME, \
+    EDR_CACHE_LOCK_POLL_INTERVAL, ID_PASSPORT_LEN
 from environment_settings import EDR_API_DIRECT_VERSION, EDR_API_DIRECT_URI, EDR_API_DIRECT_TOKEN, \
-    CONNECT_TIMEOUT, READ_TIMEOUT, EDR_API_CACHE_TIMEOUT, TIMEZONE, WEB_PROXIES
+    CONNECT_TIMEOUT, READ_TIMEOUT, EDR_API_CACHE_TIMEOUT, EDR_API_CACHE_LOCK_TIMEOUT, EDR_API_DETAILS_MAX_WORKERS, \
+    TIMEZONE, WEB_PROXIES, SANDBOX_MODE, EDR_API_USER
+from tasks_utils.requests import run_concurrently
+from app.utils import generate_request_id
 
 logger = get_task_logger(__name__)
 
@@ -153,55 +162,85 @@ def handle_error(response):
     )
 
 
+def get_edr_subject_details(internal_id):
+    """Returns EDR response or None if EDR hasn't answered in time"""
+    try:
+        return get_edr_subject_details_data(internal_id)
+    except (requests.exceptions.ReadTimeout,
+            requests.exceptions.ConnectTimeout):
+        return None
+
+
 def user_details(internal_ids):
-    """Composes array of detailed reference files"""
-    data = []
-    details_source_date = []
-    for internal_id in internal_ids:
-        try:
-            response = get_edr_subject_details_data(internal_id)
-        except (requests.exceptions.ReadTimeout,
-                requests.exceptions.ConnectTimeout):
+    """
+    Composes array of detailed reference files.
+    Details of the subjects are requested concurrently and cached one by one,
+    so the ones received before an error aren't requested again
+    """
+    details = {
+        internal_id: edr_cache.get(f"subject_{EDR_API_DIRECT_VERSION}_{internal_id}")
+        for internal_id in internal_ids
+    }
+    missing = [internal_id for internal_id, subject in details.items() if subject is None]
+    responses = run_concurrently(
+        None,
+        [partial(get_edr_subject_details, internal_id) for internal_id in missing],
+        max_workers=EDR_API_DETAILS_MAX_WORKERS,
+    )
+    for internal_id, response in zip(missing, responses):
+        if response is not None and response.status_code == 200:
+            logger.info(f"Return detailed data from EDR service for {internal_id}")
+            details[internal_id] = {
+                "data": prepare_data_details(response.json()),
+                "sourceDate": meta_data(response.headers['Date']),
+            }
+            edr_cache.set(f"subject_{EDR_API_DIRECT_VERSION}_{internal_id}", details[internal_id],
+                          timeout=EDR_API_CACHE_TIMEOUT)
+
+    # the first error in the order of the ids is returned
+    for response in responses:
+        if response is None:
             abort_json(
                 code=HTTPStatus.FORBIDDEN,
                 error_message={"location": "body", "name": "data", "description": [{"message": "Gateway Timeout Error"}]},
             )
         if response.status_code != 200:
             return handle_error(response)
-        else:
-            logger.info(f"Return detailed data from EDR service for {internal_id}")
-            data.append(prepare_data_details(response.json()))
-            details_source_date.append(meta_data(response.headers['Date']))
+
+    data = [details[internal_id]["data"] for internal_id in internal_ids]
+    details_source_date = [details[internal_id]["sourceDate"] for internal_id in internal_ids]
     return {"data": data, "meta": {"sourceDate": details_source_date[-1], "detailsSourceDate": details_source_date}}
 
 
+def abort_not_found(description):
+    abort_json(
+        code=HTTPStatus.NOT_FOUND,
+        error_message={"location": "body", "name": "data", "description": [description]},
+    )
+
+
 def form_edr_response(response, code, role):
     """Form data after making a request to EDR"""
-    from app.app import cache
     if response.status_code == 200:
         logger.info(f"Response code {response.status_code} for code {code}")
         data = response.json()
         if not data:
             logger.warning(f"Accept empty response from EDR service for {code}")
-            abort_json(
-                code=HTTPStatus.NOT_FOUND,
-                error_message={
-                    "location": "body",
-                    "name": "data",
-                    "description": [{
-                        "meta": {"sourceDate": meta_data(response.headers['Date'])},
-                        "error": {
-                            "errorDetails": "Couldn't find this code in EDR.",
-                            "code": "notFound"
-                        }
-                    }]},
-            )
+            description = {
+                "meta": {"sourceDate": meta_data(response.headers['Date'])},
+                "error": {
+                    "errorDetails": "Couldn't find this code in EDR.",
+                    "code": "notFound"
+                }
+            }
+            save_edr_not_found(code, description)
+            abort_not_found(description)
         res = {'data': [prepare_data(d) for d in data], 'meta': {'sourceDate': meta_data(response.headers['Date'])}}
-        cache.set(f"verify_{EDR_API_DIRECT_VERSION}_{code}", res, EDR_API_CACHE_TIMEOUT)
+        edr_cache.set(f"verify_{EDR_API_DIRECT_VERSION}_{code}", res, EDR_API_CACHE_TIMEOUT)
         if role == 'robot':  # get details for edr-bot
             data_details = user_details([obj['id'] for obj in data])
             if not data_details.get("errors"):
-                cache.set(f"details_{EDR_API_DIRECT_VERSION}_{code}", data_details, timeout=EDR_API_CACHE_TIMEOUT)
+                edr_cache.set(f"details_{EDR_API_DIRECT_VERSION}_{code}", data_details, timeout=EDR_API_CACHE_TIMEOUT)
             return data_details
         return res
     else:
@@ -210,26 +249,92 @@ def form_edr_response(response, code, role):
 
 def cached_details(code):
     """Return cached data from EDR to robot"""
-    from app.app import cache
-    if cached_details_data := cache.get(f"details_{EDR_API_DIRECT_VERSION}_{code}"):
+    if cached_details_data := edr_cache.get(f"details_{EDR_API_DIRECT_VERSION}_{code}"):
         logger.info(f"Code {code} was found in cache at details")
         return cached_details_data
-    elif cached_verify_data := cache.get(f"verify_{EDR_API_DIRECT_VERSION}_{code}"):
+    elif cached_verify_data := edr_cache.get(f"verify_{EDR_API_DIRECT_VERSION}_{code}"):
         data_details = user_details([obj['x_edrInternalId'] for obj in cached_verify_data['data']])
         if not data_details.get("errors"):
-            cache.set(f"details_{EDR_API_DIRECT_VERSION}_{code}", data_details, timeout=EDR_API_CACHE_TIMEOUT)
+            edr_cache.set(f"details_{EDR_API_DIRECT_VERSION}_{code}", data_details, timeout=EDR_API_CACHE_TIMEOUT)
         return data_details
 
 def cached_data(code, role):
-    from app.app import cache
     if role == "robot":
-        return cached_details(code)
-    elif cached_verify_data := cache.get(f"verify_{EDR_API_DIRECT_VERSION}_{code}"):
+        if cached_details_data := cached_details(code):
+            return cached_details_data
+    elif cached_verify_data := edr_cache.get(f"verify_{EDR_API_DIRECT_VERSION}_{code}"):
         logger.info(f"Code {code} was found in cache at verify")
         return cached_verify_data
+    if not_found := get_edr_not_found(code):
+        abort_not_found(not_found)
     logger.info(f'Code {code} was not found in cache at {"details" if role == "robot" else "verify"}')
 
 
+@contextmanager
+def edr_request_lock(code, role):
+    """
+    Lets only one request per code go to EDR, the concurrent ones wait until it's finished
+    to check the cache again. The lock is stored in edr_cache, so it's shared by the app and the workers.
+    Yields True if the caller has waited for another request
+    """
+    lock_key = f'lock_{"details" if role == "robot" else "verify"}_{EDR_API_DIRECT_VERSION}_{code}'
+    deadline = time() + EDR_API_CACHE_LOCK_TIMEOUT
+    waited = False
+    while not (acquired := edr_cache.add(lock_key, True, timeout=EDR_API_CACHE_LOCK_TIMEOUT)):
+        if time() >= deadline:
+            logger.warning(f"Code {code} is still locked after {EDR_API_CACHE_LOCK_TIMEOUT} seconds")
+            break
+        waited = True
+        sleep(EDR_CACHE_LOCK_POLL_INTERVAL)
+    try:
+        yield waited
+    finally:
+        if acquired:
+            edr_cache.delete(lock_key)
+
+
+def verify_code(param_name, code, role, acquire_token=None):
+    """
+    Returns EDR data of the code or raises HTTPException with the error response.
+    Used by /edr/verify and in-process by edr_bot tasks (see request_edr_data)
+    :param acquire_token: called right before the request to EDR API, so the cached codes don't spend
+                          the rate limit tokens (see celery_worker.rate_limits.wait_for_token)
+    """
+    # Try to get data from cache
+    if res := cached_data(code, role):
+        return res
+
+    # Only one request per code goes to EDR API, the others get its result from cache
+    with edr_request_lock(code, role) as waited:
+        if waited and (res := cached_data(code, role)):
+            return res
+
+        if acquire_token is not None:
+            acquire_token()
+
+        # Try to get data from EDR API
+        #  - for "robot" role, it will be paid data ("details" endpoint)
+        #  - for normal users, it will be free data ("verify" endpoint)
+        try:
+            response = get_edr_subject_data(param_name, code)
+        except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectTimeout):
+            abort_json(
+                code=HTTPStatus.FORBIDDEN,
+                error_message={
+                    "location": "body",
+                    "name": "data",
+                    "description": [{"message": "Gateway Timeout Error"}],
+                },
+            )
+
+        # Return fake data for sandbox mode if real data if we reached request limit in test api
+        if SANDBOX_MODE and response.status_code == 402:
+            return get_sandbox_data(code, role)
+
+        # Process EDR API response
+        return form_edr_response(response, code, role)
+
+
 def read_json(name):
     import os.path
     from json import loads
@@ -278,3 +383,39 @@ def get_sandbox_data(code, role):
                     }
                 }]},
         )
+
+
+def get_edr_param(code):
+    return 'code' if code.isdigit() and len(code) != ID_PASSPORT_LEN else 'passport'
+
+
+class EDRResponse:
+    """
+    The part of requests.Response that edr_bot tasks use
+    """
+
+    def __init__(self, status_code, data, headers=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return self.data
+
+
+def request_edr_data(code, client_request_id, acquire_token=None):
+    """
+    Gets EDR data of the code the same way /edr/verify does, but in the worker process,
+    so the same caches are used. Errors have the json of the endpoint errors.
+    Every call gets its own X-Request-ID, like the /edr/verify requests did
+    """
+    request_id = generate_request_id()
+    headers = {"X-Request-ID": request_id, "X-Client-Request-ID": client_request_id}
+    logger.info(f"Requesting EDR data of {code}",
+                extra={"MESSAGE_ID": "EDR_REQUEST_DATA", "REQUEST_ID": request_id,
+                       "CLIENT_REQUEST_ID": client_request_id})
+    try:
+        data = verify_code(get_edr_param(code), code, role=EDR_API_USER, acquire_token=acquire_token)
+    except HTTPException as e:
+        return EDRResponse(e.code, e.data, headers={**e.response.headers, **headers})
+    return EDRResponse(200, data, headers=headers)
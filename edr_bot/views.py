@@ -5,9 +5,7 @@ from flask_restx import Api, representations
 from app.utils import set_output_status
 from edr_bot.exceptions import abort_json
 from app.resources import Resource as BaseResource
-from environment_settings import SANDBOX_MODE
 from payments.context import get_string_param
-from requests.exceptions import ReadTimeout, ConnectTimeout
 from app.logging import getLogger
 from app.auth import auth, USERS, login_group_required
 
@@ -39,7 +37,7 @@ class VerifyResource(BaseResource):
     @api.param("passport", description="EDR subject passport (if code is not provided)", _in="query")
     @api.param("code", description="EDR subject code", _in="query")
     def get(self):
-        from edr_bot.utils import cached_data, get_edr_subject_data, form_edr_response, get_sandbox_data
+        from edr_bot.utils import verify_code
 
         # Default parameter name is "code"
         param_name = "code"
@@ -66,34 +64,7 @@ class VerifyResource(BaseResource):
         user_id = auth.authenticate(authorization, None)
         role = USERS.get(user_id, {}).get("username")
 
-        # Try to get data from cache
-        if res := cached_data(code, role):
-            return res
-
-        # Try to get data from EDR API
-        #  - for "robot" role, it will be paid data ("details" endpoint)
-        #  - for normal users, it will be free data ("verify" endpoint)
-        try:
-            response = get_edr_subject_data(param_name, code)
-        except (ReadTimeout, ConnectTimeout):
-            abort_json(
-                code=HTTPStatus.FORBIDDEN,
-                error_message={
-                    "location": "body",
-                    "name": "data",
-                    "description": [{"message": "Gateway Timeout Error"}],
-                },
-            )
-
-        # Return fake data for sandbox mode if real data if we reached request limit in test api
-        if SANDBOX_MODE and response.status_code == 402:
-            return get_sandbox_data(code, role)
-
-        # Process EDR API response
-        data = form_edr_response(response, code, role)
-
-        # Return processed data
-        return data
+        return verify_code(param_name, code, role)
 
 
 @api.representation("application/json")
@@ -36,25 +36,44 @@ MONGODB_CONNECT_TIMEOUT = int(os.environ.get("MONGODB_CONNECT_TIMEOUT", 5))
 MONGODB_SOCKET_TIMEOUT = int(os.environ.get("MONGODB_SOCKET_TIMEOUT", 5))
 MONGODB_MAX_POOL_SIZE = int(os.environ.get("MONGODB_MAX_POOL_SIZE", 100))
 
+RATE_LIMIT_MAX_WAIT = float(os.environ.get("RATE_LIMIT_MAX_WAIT", 5))  # seconds a task can wait for a token
+
+# flask cache shared by all the app processes, "simple" makes a per-process one
+APP_CACHE_TYPE = os.environ.get("APP_CACHE_TYPE", "app.cache.MongoDBCache")
+APP_CACHE_COLLECTION = os.environ.get("APP_CACHE_COLLECTION", "app_cache")
+# the longest time a value is kept in the shared cache, also used for the values set without timeout (0)
+APP_CACHE_MAX_TIMEOUT = int(os.environ.get("APP_CACHE_MAX_TIMEOUT", 24 * 3600))
+
 PUBLIC_API_HOST = os.environ.get("PUBLIC_API_HOST", "https://public.api.openprocurement.org")
 API_HOST = os.environ.get("API_HOST", "https://lb.api.openprocurement.org")
 API_VERSION = os.environ.get("API_VERSION", "2.4")
 API_TOKEN = os.environ.get("API_TOKEN", "robot")
+# how long a process reuses the same SERVER_ID cookie for CDB requests (in seconds)
+SERVER_ID_COOKIE_MAX_AGE = int(os.environ.get("SERVER_ID_COOKIE_MAX_AGE", 5 * 60))
 
 DS_HOST = os.environ.get("DS_HOST", "https://upload-docs.prozorro.gov.ua")
 DS_USER = os.environ.get("DS_USER", "bot")
 DS_PASSWORD = os.environ.get("DS_PASSWORD", "bot")
+# how long an uploaded file is reused for the identical ones (in seconds), delete index when you've changed this
+DS_UPLOAD_DEDUP_TIMEOUT = int(os.environ.get("DS_UPLOAD_DEDUP_TIMEOUT", 24 * 3600))
 
 EDR_API_USER = os.environ.get("EDR_API_USER", "robot")
-EDR_API_PASSWORD = os.environ.get("EDR_API_PASSWORD", "robot")
-SPREAD_TENDER_TASKS_INTERVAL = float(os.environ.get("EDR_BOT_SPREAD_TENDER_TASKS_INTERVAL", "30"))
+EDR_RATE_LIMIT = float(os.environ.get("EDR_RATE_LIMIT", 1))  # requests per second for all workers, 0 - no limit
+EDR_RATE_LIMIT_BURST = int(os.environ.get("EDR_RATE_LIMIT_BURST", 1))
+# request EDR data of the bidders before qualification, only when an EDR_RATE_LIMIT token is free at the moment
+EDR_PREFETCH_ENABLED = os.environ.get("EDR_PREFETCH_ENABLED", False) in TRUE_VARS
 
 # settings for direct requests to EDR server
 EDR_API_DIRECT_URI = os.environ.get("EDR_API_DIRECT_URI", "https://edr-api.edu.nais.gov.ua")
 EDR_API_DIRECT_VERSION = os.environ.get("EDR_API_DIRECT_VERSION", "2.0")
 EDR_API_DIRECT_TOKEN = os.environ.get("EDR_API_DIRECT_TOKEN", "token")
 EDR_API_CACHE_TIMEOUT = int(os.environ.get("EDR_API_CACHE_TIMEOUT", 0))
-TASKS_API_URI = os.environ.get("TASKS_API_URI", "http://app:8000")
+# codes that EDR hasn't found are remembered for a shorter time, they can be registered soon
+EDR_API_NOT_FOUND_CACHE_TIMEOUT = int(os.environ.get("EDR_API_NOT_FOUND_CACHE_TIMEOUT", 3600))
+# how long concurrent requests for the same code wait for the one that went to EDR (in seconds)
+EDR_API_CACHE_LOCK_TIMEOUT = int(os.environ.get("EDR_API_CACHE_LOCK_TIMEOUT", 30))
+# concurrent requests for details of the subjects found by one code
+EDR_API_DETAILS_MAX_WORKERS = int(os.environ.get("EDR_API_DETAILS_MAX_WORKERS", 4))
 
 NAZK_API_HOST = os.environ.get("NAZK_API_HOST", "https://corruptinfo.nazk.gov.ua")
 NAZK_API_INFO_URI = os.environ.get("NAZK_API_INFO_URI", "ep_test/1.0/corrupt/getEntityInfo")
@@ -99,6 +118,15 @@ LIQPAY_SANDBOX_BY_DEFAULT_ENABLED = os.environ.get("LIQPAY_SANDBOX_BY_DEFAULT_EN
 LIQPAY_TAX_PERCENTAGE = float(os.environ.get("LIQPAY_TAX_PERCENTAGE", 0))
 
 PAYMENTS_SKIP_TENDER_DAYS = int(os.environ.get("PAYMENTS_SKIP_TENDER_DAYS", 10))
+PAYMENTS_RESULTS_TOTAL_CACHE_TIMEOUT = int(os.environ.get("PAYMENTS_RESULTS_TOTAL_CACHE_TIMEOUT", 60))
+PAYMENTS_STATS_UPDATE_INTERVAL = int(os.environ.get("PAYMENTS_STATS_UPDATE_INTERVAL", 60 * 5))
+PAYMENTS_REPORT_PENDING_TIMEOUT = int(os.environ.get("PAYMENTS_REPORT_PENDING_TIMEOUT", 60 * 30))
+PAYMENTS_REPORT_FILE_TIMEOUT = int(os.environ.get("PAYMENTS_REPORT_FILE_TIMEOUT", 60 * 60 * 24 * 7))
+PAYMENTS_REPORT_REFRESH_INTERVAL = int(os.environ.get("PAYMENTS_REPORT_REFRESH_INTERVAL", 5))
+PAYMENTS_HEALTH_CONNECT_TIMEOUT = float(os.environ.get("PAYMENTS_HEALTH_CONNECT_TIMEOUT", 3.0))
+PAYMENTS_HEALTH_READ_TIMEOUT = float(os.environ.get("PAYMENTS_HEALTH_READ_TIMEOUT", 10.0))
+PAYMENTS_HEALTH_TIMEOUT = float(os.environ.get("PAYMENTS_HEALTH_TIMEOUT", 15.0))
+PAYMENTS_HEALTH_CACHE_TIMEOUT = int(os.environ.get("PAYMENTS_HEALTH_CACHE_TIMEOUT", 60))
 
 PORTAL_HOST = os.environ.get("PORTAL_HOST", "https://prozorro.gov.ua")
 
@@ -116,6 +144,11 @@ TREASURY_CONTEXT_COLLECTION = os.environ.get("TREASURY_CONTEXT_COLLECTION", "tre
 TREASURY_ORG_COLLECTION = os.environ.get("TREASURY_ORG_COLLECTION", "organisations")
 TREASURY_XML_TEMPLATES_COLLECTION = os.environ.get("TREASURY_XML_TEMPLATES_COLLECTION", "xml_templates")
 TREASURY_OBLIGATION_COLLECTION = os.environ.get("TREASURY_OBLIGATION_COLLECTION", "obligations")
+TREASURY_PLANS_COLLECTION = os.environ.get("TREASURY_PLANS_COLLECTION", "plans")
+TREASURY_PLAN_CACHE_TIMEOUT = int(os.environ.get("TREASURY_PLAN_CACHE_TIMEOUT", 24 * 3600))
+TREASURY_AUDITS_COLLECTION = os.environ.get("TREASURY_AUDITS_COLLECTION", "auction_audits")
+TREASURY_AUDIT_CACHE_TIMEOUT = int(os.environ.get("TREASURY_AUDIT_CACHE_TIMEOUT", 24 * 3600))
+TREASURY_FETCH_CONCURRENCY = int(os.environ.get("TREASURY_FETCH_CONCURRENCY", 4))
 TREASURY_DATETIME_FMT = os.environ.get("TREASURY_DATETIME_FMT", "%Y-%m-%dT%H:%M:%S")
 
 CERTIFICATES_DIR = os.environ.get("CERTIFICATES_DIR", os.path.join(BASE_DIR, "certificates"))
@@ -22,6 +22,7 @@ from fiscal_bot.utils import (
 from tasks_utils.datetime import get_now, get_working_datetime, working_days_count_since
 from tasks_utils.tasks import upload_to_doc_service
 from tasks_utils.results_db import get_task_result, save_task_result
+from tasks_utils.tenders import TenderIndex
 from tasks_utils.settings import RETRY_REQUESTS_EXCEPTIONS, DEFAULT_HEADERS
 from tasks_utils.requests import (
     get_filename_from_response,
@@ -65,11 +66,11 @@ def process_tender(self, tender_id, *args, **kwargs):
             raise self.retry(countdown=response.headers.get('Retry-After', DEFAULT_RETRY_AFTER))
 
         tender = response.json()["data"]
+        index = TenderIndex(tender)
 
         for award in tender.get('awards', []):
             if award["status"] == "active" and award["date"] > FISCAL_BOT_START_DATE:
                 if not any(doc.get('documentType') == DOC_TYPE for doc in award.get('documents', [])):
-                    lot_ids = [l.get("id") for l in tender.get('lots', [])]
 
                     for supplier in award['suppliers']:
                         identifier = str(supplier['identifier']['id'])
@@ -85,7 +86,7 @@ def process_tender(self, tender_id, *args, **kwargs):
                                 supplier=dict(
                                     tender_id=tender['id'],
                                     tenderID=tender['tenderID'],
-                                    lot_index=lot_ids.index(award['lotID']) if "lotID" in award else None,
+                                    lot_index=index.get_lot_position(award['lotID'], required=True) if "lotID" in award else None,
                                     award_id=award['id'],
                                     identifier=identifier,
                                     name=name,
@@ -7,7 +7,7 @@ from app.utils import set_output_status
 from liqpay_int.provider.namespaces import api as provider_ns
 from liqpay_int.broker.namespaces import api as broker_ns
 from liqpay_int.resources import Resource
-from payments.health import health, save_health_data, get_health_data
+from payments.health import check_health, get_health_data
 from payments.results_db import init_indexes
 from autoclient_payments.results_db import init_indexes as init_autoclient_indexes
 
@@ -43,8 +43,7 @@ class HealthCheckResource(Resource):
     )
 
     def get(self):
-        data = health()
-        save_health_data(data)
+        data = check_health()
         if self.parser_query_healthcheck.parse_args().get("historical"):
             historical_list = get_health_data()
             data["historical"] = [{
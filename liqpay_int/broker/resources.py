@@ -46,6 +46,7 @@ from liqpay_int.broker.responses import (
     model_response_receipt_error,
     model_response_sign,
 )
+from tasks_utils.cookies import server_id_cookies
 from payments.utils import (
     check_complaint_code,
     check_complaint_value,
@@ -96,6 +97,7 @@ class CheckoutResource(Resource):
 
             response = request_cdb_complaint_search(complaint_pretty_id, cookies=cookies)
             if response.status_code == 412:
+                server_id_cookies.refresh(response.cookies)
                 raise ProzorroApiPreconditionFailedHTTPException()
             if response.status_code != 200:
                 raise PaymentComplaintNotFoundHTTPException()
@@ -122,6 +124,7 @@ class CheckoutResource(Resource):
                 cookies=cookies
             )
             if response.status_code == 412:
+                server_id_cookies.refresh(response.cookies)
                 raise ProzorroApiPreconditionFailedHTTPException()
             if response.status_code != 200:
                 raise PaymentComplaintNotFoundHTTPException()
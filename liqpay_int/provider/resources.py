@@ -18,7 +18,7 @@ from liqpay_int.responses import (
     model_response_error,
     model_response_failure,
 )
-from payments.results_db import save_payment_item
+from payments.results_db import save_payment_item, get_payment_uid
 from liqpay_int.tasks import process_payment_data
 
 logger = getLogger()
@@ -49,7 +49,8 @@ class PushResource(Resource):
             logger.info("Payment push skipped after autoclient release date.", extra=extra)
             return {"status": "success"}
         try:
-            save_payment_item(api.payload, (get_network_data() or {}).get("username"))
+            result = save_payment_item(api.payload, (get_network_data() or {}).get("username"))
+            payment_uid = result.inserted_id if result else get_payment_uid(api.payload)
         except PyMongoError:
             logger.error("Payment save failed.", extra=extra)
             abort(code=HTTPStatus.SERVICE_UNAVAILABLE)
@@ -57,7 +58,8 @@ class PushResource(Resource):
         if api.payload.get("type") == "credit":
             try:
                 process_payment_data.apply_async(kwargs=dict(
-                    payment_data=api.payload
+                    payment_data=api.payload,
+                    payment_uid=payment_uid,
                 ))
             except (OperationalError):
                 logger.error("Payment send task failed.", extra=extra)
@@ -31,7 +31,7 @@ from payments.message_ids import (
     PAYMENTS_GET_COMPLAINT_RECHECK_EXCEPTION,
     PAYMENTS_GET_COMPLAINT_RECHECK_CODE_ERROR,
 )
-from payments.results_db import set_payment_params, set_payment_complaint_author
+from payments.results_db import set_payment_params, set_payment_complaint_author, get_payment_uid
 from payments.utils import (
     get_payment_params,
     request_cdb_complaint_search,
@@ -64,12 +64,14 @@ COMPLAINT_NOT_FOUND_MAX_RETRIES = 20
 
 
 @app.task(bind=True, max_retries=1000)
-def process_payment_data(self, payment_data, *args, **kwargs):
+def process_payment_data(self, payment_data, payment_uid=None, *args, **kwargs):
     """
     Process and validate payment data
 
     :param self:
     :param payment_data: dict
+    :param payment_uid: canonical id of the payment item, it's passed to the next tasks
+                        so they update the item by id instead of searching it by the payment data
 
     Example:
     >>> {
@@ -80,25 +82,33 @@ def process_payment_data(self, payment_data, *args, **kwargs):
 
     :return:
     """
+    if payment_uid is None:
+        try:
+            payment_uid = get_payment_uid(payment_data)
+        except PyMongoError as exc:
+            countdown = get_exponential_request_retry_countdown(self)
+            raise self.retry(countdown=countdown, exc=exc)
+
     description = payment_data.get("description", "")
     payment_params = get_payment_params(description)
 
     if not payment_params:
         logger.warning("Invalid pattern for \"{}\"".format(
             description
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_INVALID_PATTERN
         })
         return
 
     process_payment_complaint_search.apply_async(kwargs=dict(
         payment_data=payment_data,
+        payment_uid=payment_uid,
         payment_params=payment_params,
     ))
 
 
 @app.task(bind=True, max_retries=1000)
-def process_payment_complaint_search(self, payment_data, payment_params, cookies=None, *args, **kwargs):
+def process_payment_complaint_search(self, payment_data, payment_params, cookies=None, payment_uid=None, *args, **kwargs):
     complaint_pretty_id = payment_params.get("complaint")
     client_request_id = uuid4().hex
     try:
@@ -111,7 +121,7 @@ def process_payment_complaint_search(self, payment_data, payment_params, cookies
         countdown = get_exponential_request_retry_countdown(self)
         logger.exception("Request failed: {}, next retry in {} seconds".format(
             str(exc), countdown
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_SEARCH_EXCEPTION,
             "CDB_CLIENT_REQUEST_ID": client_request_id,
         })
@@ -123,13 +133,14 @@ def process_payment_complaint_search(self, payment_data, payment_params, cookies
     if response.status_code != 200:
         logger.warning("Unexpected status code {} while searching complaint {}".format(
             response.status_code, complaint_pretty_id
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_SEARCH_CODE_ERROR,
             "STATUS_CODE": response.status_code,
         })
         if response.status_code == 412:
             raise self.retry(countdown=0, kwargs=dict(
                 payment_data=payment_data,
+                payment_uid=payment_uid,
                 payment_params=payment_params,
                 cookies=cookies,
             ))
@@ -141,13 +152,13 @@ def process_payment_complaint_search(self, payment_data, payment_params, cookies
     if len(search_complaints_data) == 0:
         logger.warning("Invalid payment complaint {}".format(
             complaint_pretty_id
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_SEARCH_FAILED
         })
         if self.request.retries >= COMPLAINT_NOT_FOUND_MAX_RETRIES:
             logger.warning("Invalid payment complaint {}".format(
                 complaint_pretty_id
-            ), payment_data=payment_data, task=self, extra={
+            ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
                 "MESSAGE_ID": PAYMENTS_SEARCH_INVALID_COMPLAINT
             })
             return
@@ -159,40 +170,41 @@ def process_payment_complaint_search(self, payment_data, payment_params, cookies
     complaint_params = search_complaint_data.get("params")
 
     try:
-        set_payment_params(payment_data, complaint_params)
+        set_payment_params(payment_data, complaint_params, uid=payment_uid)
     except PyMongoError as exc:
         countdown = get_exponential_request_retry_countdown(self)
         raise self.retry(countdown=countdown, exc=exc)
 
     logger.info("Successfully found complaint {}".format(
         complaint_pretty_id
-    ), payment_data=payment_data, task=self, extra={
+    ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
         "MESSAGE_ID": PAYMENTS_SEARCH_SUCCESS
     })
 
     if not check_complaint_code(search_complaint_data, payment_params):
         logger.info("Invalid payment code {} while searching complaint {}".format(
             payment_params.get("code"), complaint_pretty_id
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_SEARCH_INVALID_CODE
         })
         return
 
     logger.info("Successfully matched payment code {} for complaint {}".format(
         payment_params.get("code"), complaint_pretty_id
-    ), payment_data=payment_data, task=self, extra={
+    ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
         "MESSAGE_ID": PAYMENTS_SEARCH_VALID_CODE
     })
 
     process_payment_complaint_data.apply_async(kwargs=dict(
         complaint_params=complaint_params,
         payment_data=payment_data,
+        payment_uid=payment_uid,
         cookies=cookies
     ))
 
 
 @app.task(bind=True, max_retries=1000)
-def process_payment_complaint_data(self, complaint_params, payment_data, cookies=None, *args, **kwargs):
+def process_payment_complaint_data(self, complaint_params, payment_data, cookies=None, payment_uid=None, *args, **kwargs):
     tender_id = complaint_params.get("tender_id")
     item_type = complaint_params.get("item_type")
     item_id = complaint_params.get("item_id")
@@ -211,7 +223,7 @@ def process_payment_complaint_data(self, complaint_params, payment_data, cookies
         countdown = get_exponential_request_retry_countdown(self)
         logger.exception("Request failed: {}, next retry in {} seconds".format(
             str(exc), countdown
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_GET_COMPLAINT_EXCEPTION,
             "CDB_CLIENT_REQUEST_ID": client_request_id,
         })
@@ -224,7 +236,7 @@ def process_payment_complaint_data(self, complaint_params, payment_data, cookies
         logger_method = get_task_retry_logger_method(self, logger)
         logger_method("Unexpected status code {} while getting complaint {}".format(
             response.status_code, complaint_id
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_GET_COMPLAINT_CODE_ERROR,
             "STATUS_CODE": response.status_code,
         })
@@ -232,6 +244,7 @@ def process_payment_complaint_data(self, complaint_params, payment_data, cookies
             raise self.retry(countdown=0, kwargs=dict(
                 complaint_params=complaint_params,
                 payment_data=payment_data,
+                payment_uid=payment_uid,
                 cookies=cookies,
             ))
         countdown = get_exponential_request_retry_countdown(self, response)
@@ -239,7 +252,7 @@ def process_payment_complaint_data(self, complaint_params, payment_data, cookies
     else:
         logger.info("Successfully retrieved complaint {}".format(
             complaint_id
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_GET_COMPLAINT_SUCCESS
         })
 
@@ -251,7 +264,7 @@ def process_payment_complaint_data(self, complaint_params, payment_data, cookies
     if not check_complaint_status(complaint_data):
         logger.warning("Invalid complaint status: {}".format(
             complaint_data["status"]
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_INVALID_STATUS
         })
         return
@@ -259,7 +272,7 @@ def process_payment_complaint_data(self, complaint_params, payment_data, cookies
     if not check_complaint_value(complaint_data):
         logger.info("Invalid complaint value amount or currency for complaint {}".format(
             complaint_id
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_INVALID_COMPLAINT_VALUE
         })
         return
@@ -269,11 +282,12 @@ def process_payment_complaint_data(self, complaint_params, payment_data, cookies
     if not check_complaint_value_amount(complaint_data, payment_data):
         logger.warning("Invalid payment amount for complaint {}: {} not equal {}".format(
             complaint_id, payment_data.get("amount"), value.get("amount")
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_INVALID_AMOUNT
         })
         process_payment_complaint_patch.apply_async(kwargs=dict(
             payment_data=payment_data,
+            payment_uid=payment_uid,
             complaint_params=complaint_params,
             patch_data={"status": STATUS_COMPLAINT_MISTAKEN},
             cookies=cookies
@@ -283,11 +297,12 @@ def process_payment_complaint_data(self, complaint_params, payment_data, cookies
     if not check_complaint_value_currency(complaint_data, payment_data):
         logger.warning("Invalid payment amount for complaint {}: {} not equal {}".format(
             complaint_id, payment_data.get("currency"), value.get("currency")
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_INVALID_CURRENCY
         })
         process_payment_complaint_patch.apply_async(kwargs=dict(
             payment_data=payment_data,
+            payment_uid=payment_uid,
             complaint_params=complaint_params,
             patch_data={"status": STATUS_COMPLAINT_MISTAKEN},
             cookies=cookies
@@ -296,10 +311,11 @@ def process_payment_complaint_data(self, complaint_params, payment_data, cookies
 
     logger.info("Successfully matched payment for complaint {}".format(
         complaint_id
-    ), payment_data=payment_data, task=self, extra={"MESSAGE_ID": PAYMENTS_VALID_PAYMENT})
+    ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={"MESSAGE_ID": PAYMENTS_VALID_PAYMENT})
 
     process_payment_complaint_patch.apply_async(kwargs=dict(
         payment_data=payment_data,
+        payment_uid=payment_uid,
         complaint_params=complaint_params,
         patch_data={"status": STATUS_COMPLAINT_PENDING},
         cookies=cookies
@@ -307,7 +323,7 @@ def process_payment_complaint_data(self, complaint_params, payment_data, cookies
 
 
 @app.task(bind=True, max_retries=1000)
-def process_payment_complaint_patch(self, payment_data, complaint_params, patch_data, cookies=None, *args, **kwargs):
+def process_payment_complaint_patch(self, payment_data, complaint_params, patch_data, cookies=None, payment_uid=None, *args, **kwargs):
     tender_id = complaint_params.get("tender_id")
     item_type = complaint_params.get("item_type")
     item_id = complaint_params.get("item_id")
@@ -327,7 +343,7 @@ def process_payment_complaint_patch(self, payment_data, complaint_params, patch_
         countdown = get_exponential_request_retry_countdown(self)
         logger.exception("Request failed: {}, next retry in {} seconds".format(
             str(exc), countdown
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_PATCH_COMPLAINT_EXCEPTION,
             "CDB_CLIENT_REQUEST_ID": client_request_id,
         })
@@ -340,13 +356,14 @@ def process_payment_complaint_patch(self, payment_data, complaint_params, patch_
         logger_method = get_task_retry_logger_method(self, logger)
         logger_method("Unexpected status code {} while patching complaint {} of tender {}: {}".format(
             response.status_code, complaint_id, tender_id, patch_data
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_PATCH_COMPLAINT_CODE_ERROR,
             "STATUS_CODE": response.status_code,
         })
         if response.status_code == 412:
             raise self.retry(countdown=0, kwargs=dict(
                 payment_data=payment_data,
+                payment_uid=payment_uid,
                 complaint_params=complaint_params,
                 patch_data=patch_data,
                 cookies=cookies,
@@ -354,6 +371,7 @@ def process_payment_complaint_patch(self, payment_data, complaint_params, patch_
         elif response.status_code == 403:
             process_payment_complaint_recheck.apply_async(kwargs=dict(
                 payment_data=payment_data,
+                payment_uid=payment_uid,
                 complaint_params=complaint_params,
                 patch_data=patch_data,
                 cookies=cookies
@@ -367,7 +385,7 @@ def process_payment_complaint_patch(self, payment_data, complaint_params, patch_
         author = complaint_data.get("author")
         if author:
             try:
-                set_payment_complaint_author(payment_data, author)
+                set_payment_complaint_author(payment_data, author, uid=payment_uid)
             except PyMongoError as exc:
                 pass
         if patch_data.get("status") == STATUS_COMPLAINT_PENDING:
@@ -376,13 +394,13 @@ def process_payment_complaint_patch(self, payment_data, complaint_params, patch_
             message_id = PAYMENTS_PATCH_COMPLAINT_NOT_PENDING_SUCCESS
         logger.info("Successfully updated complaint {} of tender {}: {}".format(
             complaint_id, tender_id, patch_data
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": message_id
         })
 
 
 @app.task(bind=True, max_retries=1000)
-def process_payment_complaint_recheck(self, payment_data, complaint_params, patch_data, cookies=None, *args, **kwargs):
+def process_payment_complaint_recheck(self, payment_data, complaint_params, patch_data, cookies=None, payment_uid=None, *args, **kwargs):
     tender_id = complaint_params.get("tender_id")
     item_type = complaint_params.get("item_type")
     item_id = complaint_params.get("item_id")
@@ -401,7 +419,7 @@ def process_payment_complaint_recheck(self, payment_data, complaint_params, patc
         countdown = get_exponential_request_retry_countdown(self)
         logger.exception("Request failed: {}, next retry in {} seconds".format(
             str(exc), countdown
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_GET_COMPLAINT_RECHECK_EXCEPTION,
             "CDB_CLIENT_REQUEST_ID": client_request_id,
         })
@@ -417,13 +435,14 @@ def process_payment_complaint_recheck(self, payment_data, complaint_params, patc
         logger_method = get_task_retry_logger_method(self, logger)
         logger_method("Unexpected status code {} while getting complaint {} of tender {}".format(
             response.status_code, complaint_id, tender_id
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_GET_COMPLAINT_RECHECK_CODE_ERROR,
             "STATUS_CODE": response.status_code,
         })
         if response.status_code == 412:
             raise self.retry(countdown=0, kwargs=dict(
                 payment_data=payment_data,
+                payment_uid=payment_uid,
                 complaint_params=complaint_params,
                 patch_data=patch_data,
                 cookies=cookies,
@@ -440,12 +459,13 @@ def process_payment_complaint_recheck(self, payment_data, complaint_params, patc
                 message_id = PAYMENTS_PATCH_COMPLAINT_NOT_PENDING_SUCCESS
             logger.info("Successfully updated complaint {} of tender {}: {}".format(
                 complaint_id, tender_id, patch_data
-            ), payment_data=payment_data, task=self, extra={
+            ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
                 "MESSAGE_ID": message_id
             })
         else:
             process_payment_complaint_data.apply_async(kwargs=dict(
                 payment_data=payment_data,
+                payment_uid=payment_uid,
                 complaint_params=complaint_params,
                 cookies=cookies
             ))
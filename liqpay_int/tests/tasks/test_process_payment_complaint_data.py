@@ -42,7 +42,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_EXCEPTION, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_EXCEPTION, ANY, uid=None),
                 ]
             )
 
@@ -80,7 +80,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -114,7 +114,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -123,6 +123,7 @@ class TestHandlerCase(unittest.TestCase):
             kwargs=dict(
                 complaint_params=complaint_params,
                 payment_data=payment_data,
+                payment_uid=None,
                 cookies=cookies,
             )
         )
@@ -154,7 +155,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -189,7 +190,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -237,14 +238,15 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_SUCCESS, ANY),
-                    call(payment_data, PAYMENTS_VALID_PAYMENT, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_SUCCESS, ANY, uid=None),
+                    call(payment_data, PAYMENTS_VALID_PAYMENT, ANY, uid=None),
                 ]
             )
 
         process_payment_complaint_patch.apply_async.assert_called_once_with(
             kwargs=dict(
                 payment_data=payment_data,
+                payment_uid=None,
                 complaint_params=complaint_params,
                 patch_data={"status": STATUS_COMPLAINT_PENDING},
                 cookies=cookies
@@ -291,8 +293,8 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_SUCCESS, ANY),
-                    call(payment_data, PAYMENTS_INVALID_STATUS, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_SUCCESS, ANY, uid=None),
+                    call(payment_data, PAYMENTS_INVALID_STATUS, ANY, uid=None),
                 ]
             )
 
@@ -334,8 +336,8 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_SUCCESS, ANY),
-                    call(payment_data, PAYMENTS_INVALID_COMPLAINT_VALUE, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_SUCCESS, ANY, uid=None),
+                    call(payment_data, PAYMENTS_INVALID_COMPLAINT_VALUE, ANY, uid=None),
                 ]
             )
 
@@ -381,14 +383,15 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_SUCCESS, ANY),
-                    call(payment_data, PAYMENTS_INVALID_AMOUNT, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_SUCCESS, ANY, uid=None),
+                    call(payment_data, PAYMENTS_INVALID_AMOUNT, ANY, uid=None),
                 ]
             )
 
         process_payment_complaint_patch.apply_async.assert_called_once_with(
             kwargs=dict(
                 payment_data=payment_data,
+                payment_uid=None,
                 complaint_params=complaint_params,
                 patch_data={"status": STATUS_COMPLAINT_MISTAKEN},
                 cookies=cookies
@@ -435,14 +438,15 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_SUCCESS, ANY),
-                    call(payment_data, PAYMENTS_INVALID_CURRENCY, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_SUCCESS, ANY, uid=None),
+                    call(payment_data, PAYMENTS_INVALID_CURRENCY, ANY, uid=None),
                 ]
             )
 
         process_payment_complaint_patch.apply_async.assert_called_once_with(
             kwargs=dict(
                 payment_data=payment_data,
+                payment_uid=None,
                 complaint_params=complaint_params,
                 patch_data={"status": STATUS_COMPLAINT_MISTAKEN},
                 cookies=cookies
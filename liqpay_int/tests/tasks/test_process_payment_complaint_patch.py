@@ -38,7 +38,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_EXCEPTION, ANY),
+                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_EXCEPTION, ANY, uid=None),
                 ]
             )
 
@@ -78,7 +78,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -114,7 +114,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -122,6 +122,7 @@ class TestHandlerCase(unittest.TestCase):
             countdown=0,
             kwargs=dict(
                 payment_data=payment_data,
+                payment_uid=None,
                 complaint_params=complaint_params,
                 patch_data=patch_data,
                 cookies=cookies,
@@ -157,7 +158,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -194,7 +195,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -227,13 +228,14 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
         process_payment_complaint_recheck.apply_async.assert_called_once_with(
             kwargs=dict(
                 payment_data=payment_data,
+                payment_uid=None,
                 complaint_params=complaint_params,
                 patch_data=patch_data,
                 cookies=cookies
@@ -267,7 +269,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_PENDING_SUCCESS, ANY),
+                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_PENDING_SUCCESS, ANY, uid=None),
                 ]
             )
 
@@ -298,6 +300,6 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_NOT_PENDING_SUCCESS, ANY),
+                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_NOT_PENDING_SUCCESS, ANY, uid=None),
                 ]
             )
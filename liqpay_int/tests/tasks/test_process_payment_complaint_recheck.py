@@ -38,7 +38,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_RECHECK_EXCEPTION, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_RECHECK_EXCEPTION, ANY, uid=None),
                 ]
             )
 
@@ -78,7 +78,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_RECHECK_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_RECHECK_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -114,7 +114,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_RECHECK_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_RECHECK_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -123,6 +123,7 @@ class TestHandlerCase(unittest.TestCase):
             kwargs=dict(
                 complaint_params=complaint_params,
                 payment_data=payment_data,
+                payment_uid=None,
                 patch_data=patch_data,
                 cookies=cookies,
             )
@@ -157,7 +158,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_RECHECK_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_RECHECK_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -194,7 +195,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_GET_COMPLAINT_RECHECK_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_GET_COMPLAINT_RECHECK_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -228,7 +229,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_PENDING_SUCCESS, ANY),
+                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_PENDING_SUCCESS, ANY, uid=None),
                 ]
             )
 
@@ -258,6 +259,6 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_NOT_PENDING_SUCCESS, ANY),
+                    call(payment_data, PAYMENTS_PATCH_COMPLAINT_NOT_PENDING_SUCCESS, ANY, uid=None),
                 ]
             )
@@ -39,7 +39,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_SEARCH_EXCEPTION, ANY),
+                    call(payment_data, PAYMENTS_SEARCH_EXCEPTION, ANY, uid=None),
                 ]
             )
 
@@ -124,7 +124,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_SEARCH_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_SEARCH_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -158,7 +158,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_SEARCH_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_SEARCH_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -166,6 +166,7 @@ class TestHandlerCase(unittest.TestCase):
             countdown=0,
             kwargs=dict(
                 payment_data=payment_data,
+                payment_uid=None,
                 payment_params=payment_params,
                 cookies=cookies,
             )
@@ -198,7 +199,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_SEARCH_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_SEARCH_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -233,7 +234,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_SEARCH_CODE_ERROR, ANY),
+                    call(payment_data, PAYMENTS_SEARCH_CODE_ERROR, ANY, uid=None),
                 ]
             )
 
@@ -272,14 +273,14 @@ class TestHandlerCase(unittest.TestCase):
             process_payment_complaint_search(payment_data, payment_params)
 
             set_payment_params.assert_called_once_with(
-                payment_data, complaint_params
+                payment_data, complaint_params, uid=None
             )
 
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_SEARCH_SUCCESS, ANY),
-                    call(payment_data, PAYMENTS_SEARCH_VALID_CODE, ANY),
+                    call(payment_data, PAYMENTS_SEARCH_SUCCESS, ANY, uid=None),
+                    call(payment_data, PAYMENTS_SEARCH_VALID_CODE, ANY, uid=None),
                 ]
             )
 
@@ -287,6 +288,7 @@ class TestHandlerCase(unittest.TestCase):
             kwargs=dict(
                 complaint_params=complaint_params,
                 payment_data=payment_data,
+                payment_uid=None,
                 cookies=cookies
             )
         )
@@ -327,7 +329,7 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_SEARCH_FAILED, ANY),
+                    call(payment_data, PAYMENTS_SEARCH_FAILED, ANY, uid=None),
                 ]
             )
 
@@ -369,8 +371,8 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_SEARCH_FAILED, ANY),
-                    call(payment_data, PAYMENTS_SEARCH_INVALID_COMPLAINT, ANY),
+                    call(payment_data, PAYMENTS_SEARCH_FAILED, ANY, uid=None),
+                    call(payment_data, PAYMENTS_SEARCH_INVALID_COMPLAINT, ANY, uid=None),
                 ]
             )
 
@@ -409,8 +411,8 @@ class TestHandlerCase(unittest.TestCase):
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_SEARCH_SUCCESS, ANY),
-                    call(payment_data, PAYMENTS_SEARCH_INVALID_CODE, ANY),
+                    call(payment_data, PAYMENTS_SEARCH_SUCCESS, ANY, uid=None),
+                    call(payment_data, PAYMENTS_SEARCH_INVALID_CODE, ANY, uid=None),
                 ]
             )
 
@@ -1,13 +1,18 @@
 import unittest
 
-from unittest.mock import patch, ANY
+from unittest.mock import patch, Mock, ANY
 
+from celery.exceptions import Retry
+from pymongo.errors import PyMongoError
+
+from environment_settings import DEFAULT_RETRY_AFTER
 from payments.message_ids import PAYMENTS_INVALID_PATTERN
 from liqpay_int.tasks import process_payment_data
 
 
 class TestHandlerCase(unittest.TestCase):
 
+    @patch("liqpay_int.tasks.get_payment_uid", Mock(return_value="test_uid"))
     @patch("liqpay_int.tasks.process_payment_complaint_search")
     def test_handle_valid_description(self, process_payment_complaint_search):
         payment_data = {"description": "UA-2020-03-17-000090-a.a2-12AD3F12"}
@@ -17,6 +22,7 @@ class TestHandlerCase(unittest.TestCase):
         process_payment_complaint_search.apply_async.assert_called_once_with(
             kwargs=dict(
                 payment_data=payment_data,
+                payment_uid="test_uid",
                 payment_params={
                     "complaint": "UA-2020-03-17-000090-a.a2",
                     "code": "12AD3F12"
@@ -24,7 +30,7 @@ class TestHandlerCase(unittest.TestCase):
             )
         )
 
-
+    @patch("liqpay_int.tasks.get_payment_uid", Mock(return_value="test_uid"))
     @patch("payments.logging.push_payment_message")
     @patch("liqpay_int.tasks.process_payment_complaint_search")
     def test_handle_invalid_description(self, process_payment_complaint_search, push_payment_message):
@@ -33,7 +39,36 @@ class TestHandlerCase(unittest.TestCase):
         process_payment_data(payment_data)
 
         push_payment_message.assert_called_once_with(
-            payment_data, PAYMENTS_INVALID_PATTERN, ANY
+            payment_data, PAYMENTS_INVALID_PATTERN, ANY, uid="test_uid"
         )
 
         process_payment_complaint_search.apply_async.assert_not_called()
+
+    @patch("liqpay_int.tasks.get_payment_uid")
+    @patch("liqpay_int.tasks.process_payment_complaint_search")
+    def test_handle_payment_uid(self, process_payment_complaint_search, get_payment_uid):
+        payment_data = {"description": "UA-2020-03-17-000090-a.a2-12AD3F12"}
+
+        process_payment_data(payment_data, payment_uid="test_uid")
+
+        get_payment_uid.assert_not_called()
+        process_payment_complaint_search.apply_async.assert_called_once_with(
+            kwargs=dict(
+                payment_data=payment_data,
+                payment_uid="test_uid",
+                payment_params=ANY,
+            )
+        )
+
+    @patch("liqpay_int.tasks.get_payment_uid", Mock(side_effect=PyMongoError()))
+    @patch("liqpay_int.tasks.process_payment_complaint_search")
+    def test_handle_mongodb_error(self, process_payment_complaint_search):
+        payment_data = {"description": "UA-2020-03-17-000090-a.a2-12AD3F12"}
+
+        with patch.object(process_payment_data, "retry", Mock(side_effect=Retry)):
+            with self.assertRaises(Retry):
+                process_payment_data(payment_data)
+
+            process_payment_data.retry.assert_called_once_with(countdown=DEFAULT_RETRY_AFTER, exc=ANY)
+
+        process_payment_complaint_search.apply_async.assert_not_called()
@@ -142,7 +142,7 @@ def lazy_set_author(func):
                 if author and complaint_data.get("status") != STATUS_COMPLAINT_DRAFT:
                     from payments.results_db import set_payment_complaint_author
                     try:
-                        set_payment_complaint_author(data.get("payment"), author)
+                        set_payment_complaint_author(data.get("payment"), author, uid=data.get("_id"))
                     except PyMongoError as exc:
                         pass
                 data["author"] = author
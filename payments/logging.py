@@ -14,11 +14,12 @@ class PaymentResultsLoggerAdapter(logging.LoggerAdapter):
         extra = kwargs.setdefault("extra", self.extra or {})
         task = kwargs.pop("task", None)
         payment_data = kwargs.pop("payment_data", None)
+        payment_uid = kwargs.pop("payment_uid", None)
         message_id = extra.get("MESSAGE_ID", None)
 
         if payment_data and message_id:
             try:
-                push_payment_message(payment_data, message_id, msg)
+                push_payment_message(payment_data, message_id, msg, uid=payment_uid)
             except PyMongoError as exc:
                 if task:
                     countdown = get_exponential_request_retry_countdown(task)
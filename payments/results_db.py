@@ -1,22 +1,30 @@
 import pymongo
 from datetime import datetime, timedelta, date
 from celery.utils.log import get_task_logger
-from pymongo import ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
 from pytz import UTC
 
 from celery_worker.locks import args_to_uid, get_mongodb_collection as base_get_mongodb_collection
 from functools import partial
 from pymongo.errors import PyMongoError, OperationFailure, DuplicateKeyError
 
-from environment_settings import TIMEZONE
+from environment_settings import TIMEZONE, PAYMENTS_REPORT_FILE_TIMEOUT
 from app.logging import log_exc
+from tasks_utils.pagination import get_keyset_page
 from payments.data import (
     DESC_PROCESSING_CHOICES_DICT,
     MESSAGE_ID_PRIORITY,
     PAYMENTS_FAILED_MESSAGE_ID_LIST,
     PAYMENTS_NOT_FAILED_MESSAGE_ID_LIST,
     PAYMENTS_MESSAGE_IDS,
+    FUNDS_STATE,
+    FUNDS_COMPLAINANT,
+    FUNDS_UNKNOWN,
+    FUNDS_ALL,
 )
+from payments.settings import PAYMENT_DATE_OPER_FORMAT
 from payments.utils import filter_payment_data
 
 logger = get_task_logger(__name__)
@@ -31,6 +39,23 @@ get_mongodb_status_collection = partial(
     collection_name="payments_status"
 )
 
+get_mongodb_stats_collection = partial(
+    base_get_mongodb_collection,
+    collection_name="payments_stats_daily"
+)
+
+get_mongodb_reports_collection = partial(
+    base_get_mongodb_collection,
+    collection_name="payments_reports"
+)
+
+get_mongodb_reports_versions_collection = partial(
+    base_get_mongodb_collection,
+    collection_name="payments_reports_versions"
+)
+
+REPORTS_FILES_BUCKET_NAME = "payments_reports_files"
+
 UID_KEYS_1 = [
     "description",
     "amount",
@@ -51,15 +76,53 @@ UID_KEYS_3 = UID_KEYS_2 + [
     "odb_ref",
 ]
 
+UID_KEYS_LIST = [UID_KEYS_3, UID_KEYS_2, UID_KEYS_1]
+
+FIND_PAYMENT_ITEMS_BATCH_SIZE = 500
+
+BACKFILL_DATE_OPER_BATCH_SIZE = 1000
+
+FIND_PAYMENT_RESULTS_BATCH_SIZE = 500
+
+STATS_DAY_FORMAT = "%Y-%m-%d"
+STATS_COUNTS_FIELDS = ("type", "source", "date_oper", "date_resolution")
+# marker documents of the daily stats collection, they're never in a range of days
+STATS_INITIALIZED_ID = "initialized"
+STATS_DATE_OPER_BACKFILLED_ID = "date_oper_backfilled"
+# the stats page recalculates only a few changed days, the others are left to update_payments_stats task
+STATS_UPDATE_ON_READ_LIMIT = 3
+
+REPORT_DAY_FORMAT = "%Y-%m-%d"
+# projection of the fields that define the days of the reports containing an item
+REPORT_DAYS_PROJECTION = {"messages.createdAt": 1, "resolution.date": 1}
+
+
+INDEXES = [
+    dict(keys="createdAt", name="created_at"),
+    dict(keys=[("createdAt", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+    dict(keys="dateOper", name="date_oper"),
+    dict(keys=[("payment.description", pymongo.TEXT)], name="payment_description_text"),
+    dict(keys="payment.odb_ref", name="payment_odb_ref"),
+    dict(
+        keys=[
+            ("params.complaint_id", ASCENDING),
+            ("params.tender_id", ASCENDING),
+            ("params.item_id", ASCENDING),
+            ("params.item_type", ASCENDING),
+            ("messages.message_id", ASCENDING),
+        ],
+        name="payment_params",
+    ),
+    dict(keys=[("messages.message_id", ASCENDING), ("messages.createdAt", ASCENDING)], name="payment_messages"),
+    dict(keys=[("resolution.funds", ASCENDING), ("resolution.date", ASCENDING)], name="payment_resolutions"),
+    dict(keys="resolution.date", name="resolution_date"),
+]
+
 
 def init_indexes():
     collection = get_mongodb_collection()
     # drop_indexes(collection)
-    indexes = [
-        dict(keys="createdAt", name="created_at"),
-        dict(keys=[("payment.description", pymongo.TEXT)], name="payment_description_text"),
-    ]
-    for kwargs in indexes:
+    for kwargs in INDEXES:
         try:
             init_index(collection, **kwargs)
         except OperationFailure:
@@ -73,6 +136,13 @@ def init_indexes():
         # Index already exists
         pass
 
+    reports_collection = get_mongodb_reports_collection()
+    try:
+        init_index(reports_collection, keys="expireAt", expireAfterSeconds=0)
+    except OperationFailure:
+        # Index already exists
+        pass
+
 
 @log_exc(logger, PyMongoError, "MONGODB_INDEX_DROP_UNEXPECTED_ERROR")
 def drop_indexes(collection):
@@ -93,6 +163,24 @@ def data_to_uid(data, keys=None):
     ]))
 
 
+def localize_date(value):
+    return UTC.normalize(TIMEZONE.localize(value))
+
+
+def get_date_oper(data):
+    """
+    Parsed payment.date_oper, it's saved as dateOper so the date range filters can use an index
+    """
+    try:
+        return localize_date(datetime.strptime(data["date_oper"], PAYMENT_DATE_OPER_FORMAT))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def data_to_uids(data):
+    return [data_to_uid(data, keys=keys) for keys in UID_KEYS_LIST]
+
+
 def query_payment_find(data):
     return {
         "$or": [
@@ -107,9 +195,7 @@ def query_payment_find(data):
                     {"payment.odb_ref": {"$exists": False}},
                     {
                         "$or": [
-                            {"_id": data_to_uid(data, keys=UID_KEYS_3)},
-                            {"_id": data_to_uid(data, keys=UID_KEYS_2)},
-                            {"_id": data_to_uid(data, keys=UID_KEYS_1)},
+                            {"_id": uid} for uid in data_to_uids(data)
                         ]
                     },
                 ]
@@ -118,6 +204,16 @@ def query_payment_find(data):
     }
 
 
+def query_payment_item(data, uid=None):
+    """
+    Point query by the canonical uid if it's known,
+    otherwise the item is searched by the payment data (see query_payment_find)
+    """
+    if uid is not None:
+        return {"_id": uid}
+    return query_payment_find(data)
+
+
 def pipeline_payments_count(field):
     return [
         {
@@ -160,77 +256,46 @@ def pipeline_payments_counts_date(field, date_wrapper=lambda x: x):
     ]
 
 
-def pipeline_payments_counts_total():
-    return [
-        {
-            "$group": {
-                "_id": None,
-                "total": {'$sum': 1}
-            },
-        },
-        {
-            "$project": {
-                "_id": 0,
-            }
-        },
-    ]
-
-
-def pipeline_payments_results(page=None, limit=None):
-    pipeline = [
-        {"$sort": {"createdAt": DESCENDING}},
-    ]
-    if page and limit:
-        pipeline.append({"$skip": page * limit - limit})
-    if limit:
-        pipeline.append({"$limit": limit})
-    return pipeline
+def project_payments_results_counts(field):
+    return {"$arrayElemAt": [field, 0]}
 
 
-def project_payments_results_counts_total():
+@log_exc(logger, PyMongoError, "PAYMENTS_GET_RESULTS_MONGODB_EXCEPTION")
+def get_payment_results(filters=None, limit=None, after=None, before=None, **kwargs):
+    """
+    Items sorted by createdAt descending, paginated with keyset cursors (see tasks_utils.pagination)
+    """
+    collection = get_mongodb_collection()
+    results, next_cursor, prev_cursor = get_keyset_page(
+        collection, filters, limit=limit, after=after, before=before
+    )
     return {
-        "$arrayElemAt": [{
-            "$cond": {
-                "if": {"$eq": [{"$size": "$counts_total"}, 0]},
-                "then": [{"total": 0}],
-                "else": "$counts_total"
-            }
-        }, 0]
+        "results": results,
+        "meta": {
+            "limit": limit,
+            "next": next_cursor,
+            "prev": prev_cursor,
+        },
     }
 
 
-def project_payments_results_counts(field):
-    return {"$arrayElemAt": [field, 0]}
+@log_exc(logger, PyMongoError, "PAYMENTS_GET_RESULTS_COUNT_MONGODB_EXCEPTION")
+def count_payment_results(filters=None):
+    collection = get_mongodb_collection()
+    if not filters:
+        return collection.estimated_document_count()
+    return collection.count_documents(filters)
 
 
 @log_exc(logger, PyMongoError, "PAYMENTS_GET_RESULTS_MONGODB_EXCEPTION")
-def get_payment_results(filters=None, page=None, limit=None, **kwargs):
+def find_payment_results(filters=None, batch_size=FIND_PAYMENT_RESULTS_BATCH_SIZE):
+    """
+    Cursor over all the matching items in the order of get_payment_results,
+    the items are fetched in batches while it's iterated
+    """
     collection = get_mongodb_collection()
-    pipeline = [
-        {"$match": filters},
-        {
-            "$facet": {
-                "results": pipeline_payments_results(page, limit),
-                "counts_total": pipeline_payments_counts_total(),
-            }
-        },
-        {
-            "$project": {
-                "results": 1,
-                "meta": {
-                    "$mergeObjects": [
-                        project_payments_results_counts_total(),
-                        {
-                            "page": page,
-                            "limit": limit,
-                        }
-                    ]
-                }
-            }
-        }
-    ]
-    cursor = collection.aggregate(pipeline)
-    return list(cursor)[0]
+    cursor = collection.find(filters or {}).sort([("createdAt", DESCENDING), ("_id", DESCENDING)])
+    return cursor.batch_size(batch_size)
 
 
 def query_date_split(field):
@@ -248,8 +313,8 @@ def get_payment_stats(filters=None, page=None, limit=None, **kwargs):
                 "counts_type": pipeline_payments_count('$payment.type'),
                 "counts_source": pipeline_payments_count('$payment.source'),
                 "counts_date_oper": pipeline_payments_counts_date(
-                    "$payment.date_oper",
-                    lambda x: query_date_to_str(query_date_from_str(x))
+                    "$dateOper",
+                    lambda x: query_date_to_str(x, timezone=TIMEZONE.zone)
                 ),
                 "counts_date_resolution": pipeline_payments_counts_date(
                     "$resolution.date",
@@ -274,19 +339,23 @@ def get_payment_stats(filters=None, page=None, limit=None, **kwargs):
 
 
 @log_exc(logger, PyMongoError, "PAYMENTS_PUSH_MESSAGE_MONGODB_EXCEPTION")
-def push_payment_message(data, message_id, message):
+def push_payment_message(data, message_id, message, uid=None):
     collection = get_mongodb_collection()
-    query = query_payment_find(data)
+    query = query_payment_item(data, uid)
+    now = datetime.utcnow()
     update = {
         "$push": {
             "messages": {
                 "message_id": message_id,
                 "message": message,
-                "createdAt": datetime.utcnow()
+                "createdAt": now
             }
         }
     }
-    return collection.update_one(query, update)
+    previous = collection.find_one_and_update(query, update, projection=REPORT_DAYS_PROJECTION)
+    if previous:
+        bump_report_versions(get_report_days(previous) | {get_report_day(now)})
+    return previous
 
 
 @log_exc(logger, PyMongoError, "PAYMENTS_GET_RESULTS_COUNT_MONGODB_EXCEPTION")
@@ -296,6 +365,56 @@ def find_payment_item(data, **kwargs):
     return collection.find_one(query)
 
 
+@log_exc(logger, PyMongoError, "PAYMENTS_GET_RESULTS_ITEM_MONGODB_EXCEPTION")
+def get_payment_uid(data):
+    collection = get_mongodb_collection()
+    item = collection.find_one(query_payment_find(data), {"_id": 1})
+    if item:
+        return item["_id"]
+
+
+@log_exc(logger, PyMongoError, "PAYMENTS_FIND_RESULTS_ITEMS_MONGODB_EXCEPTION")
+def find_payment_items(data_list, batch_size=FIND_PAYMENT_ITEMS_BATCH_SIZE):
+    """
+    Bulk version of find_payment_item for registry reconciliation.
+    Candidate odb_refs and uids of all the items are resolved with a few $in queries
+    instead of a query per item.
+
+    :param data_list: list of payment data (ex. registry messages)
+    :param batch_size: max number of values in one $in query
+    :return: list of found items or None in the order of data_list
+    """
+    collection = get_mongodb_collection()
+    uids_list = [data_to_uids(data) for data in data_list]
+
+    odb_refs = list({data.get("odb_ref") for data in data_list})
+    by_odb_ref = {}
+    for i in range(0, len(odb_refs), batch_size):
+        query = {"payment.odb_ref": {"$in": odb_refs[i:i + batch_size]}}
+        for item in collection.find(query):
+            # $in with null matches missing fields too, those are found by uid below
+            if "odb_ref" in item["payment"]:
+                by_odb_ref.setdefault(item["payment"]["odb_ref"], item)
+
+    uids = list({uid for uids in uids_list for uid in uids})
+    by_uid = {}
+    for i in range(0, len(uids), batch_size):
+        query = {
+            "_id": {"$in": uids[i:i + batch_size]},
+            "payment.odb_ref": {"$exists": False},
+        }
+        for item in collection.find(query):
+            by_uid[item["_id"]] = item
+
+    result = []
+    for data, uids in zip(data_list, uids_list):
+        item = by_odb_ref.get(data.get("odb_ref"))
+        if item is None:
+            item = next((by_uid[uid] for uid in uids if uid in by_uid), None)
+        result.append(item)
+    return result
+
+
 @log_exc(logger, PyMongoError, "PAYMENTS_GET_RESULTS_ITEM_MONGODB_EXCEPTION")
 def get_payment_item(uid):
     collection = get_mongodb_collection()
@@ -311,12 +430,16 @@ def save_payment_item(data, user):
         "_id": uid,
         "payment": filter_payment_data(data),
         "user": user,
+        "dateOper": get_date_oper(data),
         "createdAt": datetime.utcnow(),
     }
     try:
-        return collection.insert_one(document)
+        result = collection.insert_one(document)
     except DuplicateKeyError:
         pass
+    else:
+        mark_payment_stats_dirty([data])
+        return result
 
 
 @log_exc(logger, PyMongoError, "PAYMENTS_UPDATE_RESULTS_MONGODB_EXCEPTION")
@@ -328,45 +451,391 @@ def update_payment_item(uid, data):
     update = {
         "$set": {
             "payment": filter_payment_data(data),
+            "dateOper": get_date_oper(data),
             "updatedAt": datetime.utcnow(),
         }
     }
-    return collection.update_one(query, update)
+    # the previous date_oper is needed to update stats of both days if it's changed
+    projection = {"payment.date_oper": 1, **REPORT_DAYS_PROJECTION}
+    previous = collection.find_one_and_update(query, update, projection=projection)
+    if previous:
+        mark_payment_stats_dirty([data, previous.get("payment", {})])
+        bump_report_versions(get_report_days(previous))
+    return previous
+
+
+@log_exc(logger, PyMongoError, "PAYMENTS_BACKFILL_DATE_OPER_MONGODB_EXCEPTION")
+def backfill_date_oper(batch_size=BACKFILL_DATE_OPER_BATCH_SIZE):
+    """
+    Sets dateOper of the items saved before it was introduced,
+    the ones with invalid payment.date_oper get None, so they aren't selected again
+    :return: number of updated items
+    """
+    collection = get_mongodb_collection()
+    cursor = collection.find(
+        {"dateOper": {"$exists": False}},
+        {"payment.date_oper": 1},
+    ).limit(batch_size)
+    items = list(cursor)
+    requests = [
+        UpdateOne({"_id": item["_id"]}, {"$set": {"dateOper": get_date_oper(item.get("payment", {}))}})
+        for item in items
+    ]
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+        mark_payment_stats_dirty([item.get("payment", {}) for item in items])
+    if len(requests) < batch_size:
+        # all the items have dateOper now, so the daily stats can count them (see get_payment_stats_daily)
+        get_mongodb_stats_collection().update_one(
+            {"_id": STATS_DATE_OPER_BACKFILLED_ID},
+            {"$set": {"backfilledAt": datetime.utcnow()}},
+            upsert=True,
+        )
+    return len(requests)
 
 
 @log_exc(logger, PyMongoError, "PAYMENTS_SET_PARAMS_MONGODB_EXCEPTION")
-def set_payment_params(data, params):
+def set_payment_params(data, params, uid=None):
     collection = get_mongodb_collection()
-    query = query_payment_find(data)
+    query = query_payment_item(data, uid)
     update = {"$set": {"params": params}}
     return collection.update_one(query, update)
 
 
 @log_exc(logger, PyMongoError, "PAYMENTS_SET_AUTHOR_MONGODB_EXCEPTION")
-def set_payment_complaint_author(data, author):
+def set_payment_complaint_author(data, author, uid=None):
     collection = get_mongodb_collection()
-    query = query_payment_find(data)
+    query = query_payment_item(data, uid)
     update = {"$set": {"author": author}}
     return collection.update_one(query, update)
 
 
 @log_exc(logger, PyMongoError, "PAYMENTS_SET_RESOLUTION_MONGODB_EXCEPTION")
-def set_payment_resolution(data, resolution):
+def set_payment_resolution(data, resolution, uid=None):
     collection = get_mongodb_collection()
-    query = query_payment_find(data)
+    query = query_payment_item(data, uid)
     update = {"$set": {"resolution": resolution}}
-    return collection.update_one(query, update)
+    previous = collection.find_one_and_update(query, update, projection=REPORT_DAYS_PROJECTION)
+    mark_payment_stats_dirty([data])
+    if previous:
+        bump_report_versions(get_report_days(previous) | get_report_days({"resolution": resolution}))
+    return previous
+
+
+def get_stats_day(data):
+    """
+    Local day of payment.date_oper, the key of the daily stats
+    """
+    try:
+        return datetime.strptime(data["date_oper"], PAYMENT_DATE_OPER_FORMAT).strftime(STATS_DAY_FORMAT)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def mark_payment_stats_dirty(data_list):
+    """
+    Marks the daily stats of the payments to be recalculated (see update_payment_stats).
+    Errors are only logged, the stats shouldn't break saving of the payments
+    """
+    days = {get_stats_day(data) for data in data_list} - {None}
+    if not days:
+        return
+    try:
+        get_mongodb_stats_collection().bulk_write([
+            UpdateOne({"_id": day}, {"$set": {"dirty": True}}, upsert=True)
+            for day in sorted(days)
+        ], ordered=False)
+    except PyMongoError as e:
+        logger.exception(e, extra={"MESSAGE_ID": "PAYMENTS_STATS_MONGODB_EXCEPTION"})
+
+
+@log_exc(logger, PyMongoError, "PAYMENTS_STATS_MONGODB_EXCEPTION")
+def init_payment_stats():
+    """
+    Marks all the days with payments to be calculated if it hasn't been done yet.
+    The collection can't be checked for emptiness, saved payments mark their days before the first run
+    :return: number of marked days
+    """
+    stats_collection = get_mongodb_stats_collection()
+    if stats_collection.find_one({"_id": STATS_INITIALIZED_ID}):
+        return 0
+    collection = get_mongodb_collection()
+    pipeline = [
+        {"$match": {"dateOper": {"$type": "date"}}},
+        {"$group": {"_id": query_date_to_str("$dateOper", timezone=TIMEZONE.zone)}},
+    ]
+    days = [item["_id"] for item in collection.aggregate(pipeline)]
+    if days:
+        stats_collection.bulk_write([
+            UpdateOne({"_id": day}, {"$set": {"dirty": True}}, upsert=True)
+            for day in days
+        ], ordered=False)
+    stats_collection.update_one(
+        {"_id": STATS_INITIALIZED_ID},
+        {"$set": {"initializedAt": datetime.utcnow()}},
+        upsert=True,
+    )
+    return len(days)
+
+
+@log_exc(logger, PyMongoError, "PAYMENTS_STATS_MONGODB_EXCEPTION")
+def update_payment_stats(day_from=None, day_to=None, limit=None):
+    """
+    Recalculates the daily stats marked as dirty
+    :param day_from: first day to update, ex. "2020-04-19"
+    :param day_to: last day to update
+    :return: number of updated days
+    """
+    stats_collection = get_mongodb_stats_collection()
+    query = {"dirty": True}
+    if day_from and day_to:
+        query["_id"] = {"$gte": day_from, "$lte": day_to}
+    cursor = stats_collection.find(query, {"_id": 1})
+    if limit:
+        cursor = cursor.limit(limit)
+    days = [item["_id"] for item in cursor]
+    for day in days:
+        # cleared before the calculation, so the changes made during it mark the day again
+        stats_collection.update_one({"_id": day}, {"$set": {"dirty": False}})
+        date = datetime.strptime(day, STATS_DAY_FORMAT)
+        data = get_payment_stats(query_payment_search(payment_date_from=date, payment_date_to=date))
+        stats_collection.update_one({"_id": day}, {"$set": {
+            "counts": data.get("counts", {}),
+            "updatedAt": datetime.utcnow(),
+        }})
+    return len(days)
+
+
+@log_exc(logger, PyMongoError, "PAYMENTS_STATS_MONGODB_EXCEPTION")
+def get_payment_stats_daily(date_from, date_to):
+    """
+    Same result as get_payment_stats for a payment date range without other filters,
+    but it's summed up from the daily stats instead of counting all the payments.
+    Changed days may be counted a few minutes late, until update_payments_stats task recalculates them
+    :return: None if the daily stats aren't ready yet (not initialized, or days not calculated)
+    """
+    collection = get_mongodb_stats_collection()
+    markers = [STATS_INITIALIZED_ID, STATS_DATE_OPER_BACKFILLED_ID]
+    if collection.count_documents({"_id": {"$in": markers}}) < len(markers):
+        return None
+
+    day_from = date_from.strftime(STATS_DAY_FORMAT)
+    day_to = date_to.strftime(STATS_DAY_FORMAT)
+    update_payment_stats(day_from, day_to, limit=STATS_UPDATE_ON_READ_LIMIT)
+
+    counts = {field: {} for field in STATS_COUNTS_FIELDS}
+    for item in collection.find({"_id": {"$gte": day_from, "$lte": day_to}}):
+        if "counts" not in item:
+            return None  # marked, but hasn't been calculated yet
+        for field, field_counts in item.get("counts", {}).items():
+            for key, value in field_counts.items():
+                counts[field][key] = counts[field].get(key, 0) + value
+    for field in ("date_oper", "date_resolution"):
+        counts[field] = dict(sorted(counts[field].items()))
+    return {"counts": counts}
+
+
+def get_report_day(value):
+    """
+    Local day of a message createdAt (utc datetime) or of a resolution date (iso string)
+    """
+    if isinstance(value, str):
+        return value[:10] or None
+    if value is not None:
+        return UTC.localize(value).astimezone(TIMEZONE).strftime(REPORT_DAY_FORMAT)
+
+
+def get_report_days(item):
+    """
+    Days of the reports that may contain the item (see query_payment_report)
+    """
+    values = [message.get("createdAt") for message in item.get("messages", [])]
+    values.append((item.get("resolution") or {}).get("date"))
+    return {get_report_day(value) for value in values} - {None}
+
+
+def bump_report_versions(days):
+    """
+    Changes the data version of the days, so the cached reports of them aren't used anymore.
+    Errors are only logged, the reports shouldn't break processing of the payments
+    """
+    if not days:
+        return
+    try:
+        get_mongodb_reports_versions_collection().bulk_write([
+            UpdateOne({"_id": day}, {"$inc": {"version": 1}}, upsert=True)
+            for day in sorted(days)
+        ], ordered=False)
+    except PyMongoError as e:
+        logger.exception(e, extra={"MESSAGE_ID": "PAYMENTS_REPORTS_MONGODB_EXCEPTION"})
+
+
+@log_exc(logger, PyMongoError, "PAYMENTS_REPORTS_MONGODB_EXCEPTION")
+def get_report_version(date_from, date_to):
+    """
+    Data version of the days in the range, it's changed with any of the days versions
+    """
+    collection = get_mongodb_reports_versions_collection()
+    pipeline = [
+        {
+            "$match": {
+                "_id": {
+                    "$gte": date_from.strftime(REPORT_DAY_FORMAT),
+                    "$lte": date_to.strftime(REPORT_DAY_FORMAT),
+                }
+            }
+        },
+        {"$group": {"_id": None, "version": {"$sum": "$version"}}},
+    ]
+    result = list(collection.aggregate(pipeline))
+    return result[0]["version"] if result else 0
+
+
+def get_report_uid(date_from, date_to, funds, version):
+    return args_to_uid((date_from.strftime(REPORT_DAY_FORMAT), date_to.strftime(REPORT_DAY_FORMAT), funds, version))
+
+
+def get_reports_fs():
+    return GridFSBucket(get_mongodb_reports_collection().database, bucket_name=REPORTS_FILES_BUCKET_NAME)
+
+
+@log_exc(logger, PyMongoError, "PAYMENTS_REPORTS_MONGODB_EXCEPTION")
+def get_report_item(uid):
+    collection = get_mongodb_reports_collection()
+    return collection.find_one({"_id": uid})
+
+
+@log_exc(logger, PyMongoError, "PAYMENTS_REPORTS_MONGODB_EXCEPTION")
+def save_report_item(uid, date_from, date_to, funds, version, timeout):
+    """
+    Saves a pending report, it expires in timeout seconds if the file isn't saved
+    :param version: data version of the days (see get_report_version)
+    :return: True if the report is saved, False if it already exists
+    """
+    collection = get_mongodb_reports_collection()
+    now = datetime.utcnow()
+    try:
+        collection.insert_one({
+            "_id": uid,
+            "date_from": date_from.strftime(REPORT_DAY_FORMAT),
+            "date_to": date_to.strftime(REPORT_DAY_FORMAT),
+            "funds": funds,
+            "version": version,
+            "createdAt": now,
+            "expireAt": now + timedelta(seconds=timeout),
+        })
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+@log_exc(logger, PyMongoError, "PAYMENTS_REPORTS_MONGODB_EXCEPTION")
+def save_report_file(uid, filename, file, timeout=PAYMENTS_REPORT_FILE_TIMEOUT):
+    """
+    Uploads the file of the report and removes the previous versions of the same report.
+    The report expires in timeout seconds, its file is removed by delete_expired_report_files
+    """
+    collection = get_mongodb_reports_collection()
+    report = collection.find_one({"_id": uid})
+    if not report:
+        return None
+    fs = get_reports_fs()
+    file_id = fs.upload_from_stream(filename, file, metadata={"report_id": uid})
+    collection.update_one(
+        {"_id": uid},
+        {"$set": {
+            "file_id": file_id,
+            "filename": filename,
+            "expireAt": datetime.utcnow() + timedelta(seconds=timeout),
+        }}
+    )
+    if "version" not in report:
+        return file_id
+    # a report of a newer version may be saved already, if its task has finished first
+    query = {
+        "date_from": report["date_from"],
+        "date_to": report["date_to"],
+        "funds": report["funds"],
+        "version": {"$lt": report["version"]},
+        "file_id": {"$exists": True},
+    }
+    for previous in collection.find(query, {"file_id": 1}):
+        try:
+            fs.delete(previous["file_id"])
+        except NoFile:
+            pass
+        collection.delete_one({"_id": previous["_id"]})
+    return file_id
+
+
+@log_exc(logger, PyMongoError, "PAYMENTS_REPORTS_MONGODB_EXCEPTION")
+def set_report_failed(uid, error):
+    """
+    Marks a pending report as failed, so the download page shows the error instead of waiting for the file
+    """
+    collection = get_mongodb_reports_collection()
+    return collection.update_one(
+        {"_id": uid, "file_id": {"$exists": False}},
+        {"$set": {"failed": True, "error": error}},
+    )
+
+
+@log_exc(logger, PyMongoError, "PAYMENTS_REPORTS_MONGODB_EXCEPTION")
+def delete_failed_report_item(uid):
+    """
+    Removes a failed report, so it can be built again
+    """
+    collection = get_mongodb_reports_collection()
+    return collection.delete_one({"_id": uid, "failed": True})
+
+
+@log_exc(logger, PyMongoError, "PAYMENTS_REPORTS_MONGODB_EXCEPTION")
+def open_report_file(file_id):
+    return get_reports_fs().open_download_stream(file_id)
+
+
+@log_exc(logger, PyMongoError, "PAYMENTS_REPORTS_MONGODB_EXCEPTION")
+def delete_expired_report_files(timeout=PAYMENTS_REPORT_FILE_TIMEOUT):
+    """
+    Removes the files of the reports that have been expired (mongodb removes only the reports).
+    Reports saved without expireAt get it
+    :return: number of removed files
+    """
+    collection = get_mongodb_reports_collection()
+    collection.update_many(
+        {"file_id": {"$exists": True}, "expireAt": {"$exists": False}},
+        {"$set": {"expireAt": datetime.utcnow() + timedelta(seconds=timeout)}},
+    )
+    fs = get_reports_fs()
+    files = {item._id: (item.metadata or {}).get("report_id") for item in fs.find({})}
+    existing = {
+        item["_id"]
+        for item in collection.find({"_id": {"$in": list(set(files.values()))}}, {"_id": 1})
+    }
+    count = 0
+    for file_id, report_id in files.items():
+        if report_id not in existing:
+            try:
+                fs.delete(file_id)
+            except NoFile:
+                continue
+            count += 1
+    return count
 
 
 @log_exc(logger, PyMongoError, "PAYMENTS_GET_BY_PARAMS_MONGODB_EXCEPTION")
 def get_payment_item_by_params(params, message_ids=None):
     collection = get_mongodb_collection()
+    return collection.find_one(query_payment_by_params(params, message_ids))
+
+
+def query_payment_by_params(params, message_ids=None):
     filters = []
     for param_key, param_value in params.items():
         filters.append({"params.{}".format(param_key): param_value})
     if message_ids:
         filters.append({"messages.message_id": {"$in": message_ids}})
-    return collection.find_one(query_combined_and(filters))
+    return query_combined_and(filters)
 
 
 def query_payment_search(
@@ -398,11 +867,9 @@ def query_payment_search(
             filters.append({"messages.message_id": {"$in": list(status_ids)}})
     if payment_date_from is not None and payment_date_to is not None:
         filters.append({
-            "$expr": {
-                "$and": [
-                    {"$gte": [query_date_from_str("$payment.date_oper"), payment_date_from]},
-                    {"$lt": [query_date_from_str("$payment.date_oper"), payment_date_to + timedelta(days=1)]}
-                ]
+            "dateOper": {
+                "$gte": localize_date(payment_date_from),
+                "$lt": localize_date(payment_date_to + timedelta(days=1)),
             }
         })
     return query_combined_and(filters) if filters else {}
@@ -476,14 +943,17 @@ def query_date_from_str(field, format="%d.%m.%Y %H:%M:%S"):
     }
 
 
-def query_date_to_str(date, format="%Y-%m-%d"):
-    return {
+def query_date_to_str(date, format="%Y-%m-%d", timezone=None):
+    query = {
         "$dateToString": {
             "date": date,
             "format": format,
             "onNull": None
         }
     }
+    if timezone:
+        query["$dateToString"]["timezone"] = timezone
+    return query
 
 
 @log_exc(logger, PyMongoError, "PAYMENTS_STATUS_LIST_MONGODB_EXCEPTION")
@@ -525,3 +995,29 @@ def query_payment_results(date_from, date_to, **search_kwargs):
     report_filters = query_combined_or([data_success_filters, data_failed_filters])
     filters = query_combined_and([search_filters, report_filters])
     return filters
+
+
+def query_payment_report(date_from, date_to, funds):
+    """
+    Filters of the downloaded reports
+    :param date_to: exclusive
+    :return: filters or None if the funds are unknown
+    """
+    filters_success = query_payment_report_success(
+        resolution_exists=True,
+        resolution_funds=funds if funds != FUNDS_ALL else None,
+        resolution_date_from=date_from,
+        resolution_date_to=date_to,
+    )
+    filters_failed = query_payment_report_failed(
+        message_ids_include=PAYMENTS_FAILED_MESSAGE_ID_LIST,
+        message_ids_exclude=PAYMENTS_NOT_FAILED_MESSAGE_ID_LIST,
+        message_ids_date_from=date_from,
+        message_ids_date_to=date_to,
+    )
+    if funds in [FUNDS_STATE, FUNDS_COMPLAINANT]:
+        return filters_success
+    elif funds in [FUNDS_UNKNOWN]:
+        return filters_failed
+    elif funds in [FUNDS_ALL]:
+        return query_combined_or([filters_success, filters_failed])
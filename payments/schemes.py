@@ -1,5 +1,3 @@
-import jmespath
-
 from payments.data import (
     complaint_status_description,
     complaint_reject_description,
@@ -14,6 +12,13 @@ from payments.data import (
     value_amount_representation,
     complainant_status,
 )
+from tasks_utils.schemes import (
+    compile_scheme,
+    get_scheme_value,
+    get_scheme_title,
+    get_scheme_item,
+    get_scheme_data,
+)
 
 PAYMENT_DESCRIPTION_SCHEME_ITEM = {
     "type": "object",
@@ -285,46 +290,6 @@ REPORT_SCHEME = {
 }
 
 
-def get_scheme_value(data, scheme_info):
-    if "scheme" in scheme_info:
-        return get_scheme_data(data, scheme_info["scheme"])
-    if scheme_info["path"] == ".":
-        value = data
-    else:
-        value = jmespath.search(scheme_info["path"], data)
-    if "method" in scheme_info:
-        value = scheme_info["method"](value)
-    value = value or scheme_info.get("default")
-    if value is not None:
-        return value
-
-
-def get_scheme_title(data, scheme_info):
-    if "title" in scheme_info:
-        return scheme_info["title"]
-    return None
-
-
-def get_scheme_item(data, scheme_info):
-    value = get_scheme_value(data, scheme_info)
-    if value is not None:
-        title = get_scheme_title(data, scheme_info)
-        item = dict(value=value)
-        if title:
-            item.update(dict(title=title))
-        return item
-
-
-def get_scheme_data(data, scheme):
-    data_formatted = {}
-    for scheme_field, scheme_info in scheme.items():
-        scheme_type = scheme_info.get("type")
-        if scheme_type == "object":
-            item = get_scheme_item(data, scheme_info)
-            if item is not None:
-                data_formatted.update({scheme_field: item})
-        elif scheme_type == "value":
-            value = get_scheme_value(data, scheme_info)
-            if value is not None:
-                data_formatted.update({scheme_field: value})
-    return data_formatted
+# compiled at import, so rendering of the views doesn't parse the paths
+compile_scheme(ROOT_SCHEME)
+compile_scheme(REPORT_SCHEME)
@@ -5,3 +5,5 @@ non_complaint_procedures = [
 ]
 
 RELEASE_2020_04_19 = "2020-04-19"
+
+PAYMENT_DATE_OPER_FORMAT = "%d.%m.%Y %H:%M:%S"
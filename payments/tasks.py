@@ -1,13 +1,18 @@
 import requests
+import sys
 
+from datetime import datetime, timedelta
+from tempfile import SpooledTemporaryFile
 from uuid import uuid4
 
 from pymongo.errors import PyMongoError
 
 from celery_worker.celery import app, formatter
 from celery.utils.log import get_task_logger
+from celery.signals import celeryd_init
 
-from payments.health import health, save_health_data
+from payments.context import iter_report
+from payments.health import check_health
 from payments.logging import PaymentResultsLoggerAdapter
 from payments.message_ids import (
     PAYMENTS_PATCH_COMPLAINT_PENDING_SUCCESS,
@@ -17,11 +22,25 @@ from payments.message_ids import (
 from payments.results_db import (
     set_payment_resolution,
     get_payment_item_by_params,
+    backfill_date_oper,
+    BACKFILL_DATE_OPER_BATCH_SIZE,
+    init_payment_stats,
+    update_payment_stats,
+    find_payment_results,
+    query_payment_report,
+    save_report_file,
+    set_report_failed,
+    delete_expired_report_files,
+    REPORT_DAY_FORMAT,
 )
 from payments.utils import (
     ALLOWED_COMPLAINT_RESOLUTION_STATUSES,
     request_cdb_tender_data,
     get_resolution,
+    generate_report_file,
+    generate_report_filename,
+    generate_report_title,
+    REPORT_FILE_MAX_MEMORY_SIZE,
 )
 from tasks_utils.requests import (
     get_exponential_request_retry_countdown,
@@ -121,6 +140,7 @@ def process_complaint_params(self, complaint_params, complaint_data):
             process_complaint_resolution.apply_async(
                 kwargs=dict(
                     payment_data=payment.get("payment"),
+                    payment_uid=payment.get("_id"),
                     complaint_data=complaint_data
                 )
             )
@@ -134,17 +154,17 @@ def process_complaint_params(self, complaint_params, complaint_data):
 
 @app.task(bind=True, max_retries=1000)
 @formatter.omit(["complaint_data"])
-def process_complaint_resolution(self, payment_data, complaint_data, *args, **kwargs):
+def process_complaint_resolution(self, payment_data, complaint_data, payment_uid=None, *args, **kwargs):
     resolution = get_resolution(complaint_data)
     if resolution:
         try:
-            set_payment_resolution(payment_data, resolution)
+            set_payment_resolution(payment_data, resolution, uid=payment_uid)
         except PyMongoError as exc:
             countdown = get_exponential_request_retry_countdown(self)
             raise self.retry(countdown=countdown, exc=exc)
         logger.info("Successfully saved complaint {} resolution".format(
             complaint_data["id"]
-        ), payment_data=payment_data, task=self, extra={
+        ), payment_data=payment_data, payment_uid=payment_uid, task=self, extra={
             "MESSAGE_ID": PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS
         })
 
@@ -152,5 +172,102 @@ def process_complaint_resolution(self, payment_data, complaint_data, *args, **kw
 
 @app.task(bind=True, max_retries=10)
 def check_payments_status(self):
-    data = health()
-    save_health_data(data)
+    check_health()
+
+
+@app.task(bind=True, max_retries=10)
+def backfill_payments_date_oper(self):
+    """
+    Sets dateOper of the existing payment items in batches,
+    the task is scheduled again until there are no items without it
+    """
+    try:
+        count = backfill_date_oper()
+    except PyMongoError as exc:
+        countdown = get_exponential_request_retry_countdown(self)
+        raise self.retry(countdown=countdown, exc=exc)
+    if count:
+        logger.info("Payments dateOper is set for {} items".format(count), extra={
+            "MESSAGE_ID": "PAYMENTS_BACKFILL_DATE_OPER"
+        })
+    if count >= BACKFILL_DATE_OPER_BATCH_SIZE:
+        backfill_payments_date_oper.apply_async()
+
+
+@app.task(bind=True, max_retries=10)
+def update_payments_stats(self):
+    """
+    Recalculates the daily stats of the days with changed payments,
+    all the days are calculated the first time
+    """
+    try:
+        init_payment_stats()
+        count = update_payment_stats()
+    except PyMongoError as exc:
+        countdown = get_exponential_request_retry_countdown(self)
+        raise self.retry(countdown=countdown, exc=exc)
+    if count:
+        logger.info("Payments stats are updated for {} days".format(count), extra={
+            "MESSAGE_ID": "PAYMENTS_STATS_UPDATE"
+        })
+
+
+def on_generate_payments_report_failure(self, exc, task_id, args, kwargs, einfo):
+    """
+    The task has failed (or run out of retries), report_download shouldn't wait for the file anymore
+    """
+    uid = kwargs["uid"] if "uid" in kwargs else args[0]
+    try:
+        set_report_failed(uid, "{}: {}".format(type(exc).__name__, exc))
+    except PyMongoError:
+        pass  # the pending report expires in PAYMENTS_REPORT_PENDING_TIMEOUT anyway
+
+
+@app.task(bind=True, max_retries=10, on_failure=on_generate_payments_report_failure)
+def generate_payments_report(self, uid, date_from, date_to, funds):
+    """
+    Builds the xlsx report and saves it for payments_views.report_download
+    :param uid: report uid, it includes the data version of the days (see get_report_uid)
+    :param date_from: first resolution day, ex. "2020-04-19"
+    :param date_to: last resolution day
+    """
+    date_resolution_from = datetime.strptime(date_from, REPORT_DAY_FORMAT)
+    date_resolution_to = datetime.strptime(date_to, REPORT_DAY_FORMAT)
+    filters = query_payment_report(date_resolution_from, date_resolution_to + timedelta(days=1), funds)
+    title = generate_report_title(date_resolution_from, date_resolution_to, funds)
+    filename = "%s.xlsx" % generate_report_filename(date_resolution_from, date_resolution_to, funds)
+    try:
+        with SpooledTemporaryFile(max_size=REPORT_FILE_MAX_MEMORY_SIZE) as file:
+            generate_report_file(file, iter_report(find_payment_results(filters), total=True), title)
+            file.seek(0)
+            file_id = save_report_file(uid, filename, file)
+    except PyMongoError as exc:
+        countdown = get_exponential_request_retry_countdown(self)
+        raise self.retry(countdown=countdown, exc=exc)
+    if file_id:
+        logger.info("Payments report {} is saved".format(filename), extra={
+            "MESSAGE_ID": "PAYMENTS_REPORT_SAVED"
+        })
+
+
+@app.task(bind=True, max_retries=10)
+def cleanup_payments_reports(self):
+    """
+    Removes the files of the expired xlsx reports
+    """
+    try:
+        count = delete_expired_report_files()
+    except PyMongoError as exc:
+        countdown = get_exponential_request_retry_countdown(self)
+        raise self.retry(countdown=countdown, exc=exc)
+    if count:
+        logger.info("Payments reports files are removed: {}".format(count), extra={
+            "MESSAGE_ID": "PAYMENTS_REPORTS_CLEANUP"
+        })
+
+
+if "test" not in sys.argv[0]:  # pragma: no cover
+
+    @celeryd_init.connect
+    def task_sent_handler(*args, **kwargs):
+        backfill_payments_date_oper.delay()
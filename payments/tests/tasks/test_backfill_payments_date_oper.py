@@ -0,0 +1,45 @@
+import unittest
+import pymongo.errors
+
+from unittest.mock import patch, Mock
+from celery.exceptions import Retry
+
+from environment_settings import DEFAULT_RETRY_AFTER
+from payments.tasks import backfill_payments_date_oper
+
+
+class TestHandlerCase(unittest.TestCase):
+
+    @patch("payments.tasks.BACKFILL_DATE_OPER_BATCH_SIZE", 2)
+    def test_handle_batch(self):
+        with patch("payments.tasks.backfill_date_oper") as backfill_date_oper, \
+             patch.object(backfill_payments_date_oper, "apply_async") as apply_async:
+            backfill_date_oper.return_value = 2
+
+            backfill_payments_date_oper()
+
+        backfill_date_oper.assert_called_once_with()
+        apply_async.assert_called_once_with()
+
+    @patch("payments.tasks.BACKFILL_DATE_OPER_BATCH_SIZE", 2)
+    def test_handle_last_batch(self):
+        with patch("payments.tasks.backfill_date_oper") as backfill_date_oper, \
+             patch.object(backfill_payments_date_oper, "apply_async") as apply_async:
+            backfill_date_oper.return_value = 1
+
+            backfill_payments_date_oper()
+
+        apply_async.assert_not_called()
+
+    def test_handle_mongodb_error(self):
+        with patch("payments.tasks.backfill_date_oper") as backfill_date_oper, \
+             patch.object(backfill_payments_date_oper, "retry", Mock(side_effect=Retry)):
+            backfill_date_oper.side_effect = pymongo.errors.PyMongoError()
+
+            with self.assertRaises(Retry):
+                backfill_payments_date_oper()
+
+            backfill_payments_date_oper.retry.assert_called_once_with(
+                countdown=DEFAULT_RETRY_AFTER,
+                exc=backfill_date_oper.side_effect
+            )
@@ -0,0 +1,32 @@
+import unittest
+import pymongo.errors
+
+from unittest.mock import patch, Mock
+from celery.exceptions import Retry
+
+from environment_settings import DEFAULT_RETRY_AFTER
+from payments.tasks import cleanup_payments_reports
+
+
+class TestHandlerCase(unittest.TestCase):
+
+    def test_handle(self):
+        with patch("payments.tasks.delete_expired_report_files") as delete_expired_report_files:
+            delete_expired_report_files.return_value = 2
+
+            cleanup_payments_reports()
+
+        delete_expired_report_files.assert_called_once_with()
+
+    def test_handle_mongodb_error(self):
+        with patch("payments.tasks.delete_expired_report_files") as delete_expired_report_files, \
+             patch.object(cleanup_payments_reports, "retry", Mock(side_effect=Retry)):
+            delete_expired_report_files.side_effect = pymongo.errors.PyMongoError()
+
+            with self.assertRaises(Retry):
+                cleanup_payments_reports()
+
+            cleanup_payments_reports.retry.assert_called_once_with(
+                countdown=DEFAULT_RETRY_AFTER,
+                exc=delete_expired_report_files.side_effect
+            )
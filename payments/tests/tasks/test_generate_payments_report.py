@@ -0,0 +1,60 @@
+import unittest
+import pymongo.errors
+
+from datetime import datetime, timedelta
+from unittest.mock import patch, Mock, ANY
+from celery.exceptions import Retry
+
+from environment_settings import DEFAULT_RETRY_AFTER
+from payments.tasks import generate_payments_report
+
+
+class TestHandlerCase(unittest.TestCase):
+
+    @patch("payments.tasks.find_payment_results")
+    @patch("payments.tasks.save_report_file")
+    def test_handle(self, save_report_file, find_payment_results):
+        find_payment_results.return_value = iter([])
+
+        with patch("payments.tasks.query_payment_report") as query_payment_report:
+            generate_payments_report("test_uid", "2020-03-16", "2020-03-17", "all")
+
+        query_payment_report.assert_called_once_with(
+            datetime(2020, 3, 16), datetime(2020, 3, 17) + timedelta(days=1), "all"
+        )
+        find_payment_results.assert_called_once_with(query_payment_report.return_value)
+        save_report_file.assert_called_once_with("test_uid", "2020-03-16-2020-03-17-all-report.xlsx", ANY)
+
+    @patch("payments.tasks.find_payment_results")
+    def test_handle_mongodb_error(self, find_payment_results):
+        find_payment_results.return_value = iter([])
+
+        with patch("payments.tasks.save_report_file") as save_report_file, \
+             patch.object(generate_payments_report, "retry", Mock(side_effect=Retry)):
+            save_report_file.side_effect = pymongo.errors.PyMongoError()
+
+            with self.assertRaises(Retry):
+                generate_payments_report("test_uid", "2020-03-16", "2020-03-17", "all")
+
+            generate_payments_report.retry.assert_called_once_with(
+                countdown=DEFAULT_RETRY_AFTER,
+                exc=save_report_file.side_effect
+            )
+
+    @patch("payments.tasks.set_report_failed")
+    @patch("payments.tasks.find_payment_results")
+    def test_handle_failure(self, find_payment_results, set_report_failed):
+        find_payment_results.side_effect = ValueError("broken")
+
+        result = generate_payments_report.apply(args=("test_uid", "2020-03-16", "2020-03-17", "all"))
+
+        self.assertTrue(result.failed())
+        set_report_failed.assert_called_once_with("test_uid", "ValueError: broken")
+
+    @patch("payments.tasks.set_report_failed")
+    def test_handle_failure_mongodb_error(self, set_report_failed):
+        set_report_failed.side_effect = pymongo.errors.PyMongoError()
+
+        generate_payments_report.on_failure(ValueError("broken"), "task_id", (), {"uid": "test_uid"}, None)
+
+        set_report_failed.assert_called_once_with("test_uid", "ValueError: broken")
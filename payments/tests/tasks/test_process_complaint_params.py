@@ -62,6 +62,7 @@ class TestHandlerCase(unittest.TestCase):
         process_complaint_resolution.apply_async.assert_called_once_with(
             kwargs=dict(
                 payment_data=payment.get("payment"),
+                payment_uid=None,
                 complaint_data=complaint_data
             )
         )
@@ -24,7 +24,7 @@ class TestHandlerCase(unittest.TestCase):
         with patch("payments.results_db.get_mongodb_collection") as get_collection:
             collection = Mock()
             get_collection.return_value = collection
-            collection.update_one.side_effect = pymongo.errors.PyMongoError()
+            collection.find_one_and_update.side_effect = pymongo.errors.PyMongoError()
 
             with self.assertRaises(Retry):
                 process_complaint_resolution(
@@ -34,7 +34,7 @@ class TestHandlerCase(unittest.TestCase):
 
         process_complaint_resolution.retry.assert_called_once_with(
             countdown=DEFAULT_RETRY_AFTER,
-            exc=collection.update_one.side_effect
+            exc=collection.find_one_and_update.side_effect
         )
 
     def test_handle_resolution_mistaken(self):
@@ -64,13 +64,13 @@ class TestHandlerCase(unittest.TestCase):
                 )
 
                 set_payment_resolution.assert_called_once_with(
-                    payment_data, resolution
+                    payment_data, resolution, uid=None
                 )
 
                 self.assertEqual(
                     push_payment_message.mock_calls,
                     [
-                        call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY),
+                        call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY, uid=None),
                     ]
                 )
 
@@ -100,13 +100,13 @@ class TestHandlerCase(unittest.TestCase):
             )
 
             set_payment_resolution.assert_called_once_with(
-                payment_data, resolution
+                payment_data, resolution, uid=None
             )
 
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY),
+                    call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY, uid=None),
                 ]
             )
 
@@ -135,13 +135,13 @@ class TestHandlerCase(unittest.TestCase):
             )
 
             set_payment_resolution.assert_called_once_with(
-                payment_data, resolution
+                payment_data, resolution, uid=None
             )
 
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY),
+                    call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY, uid=None),
                 ]
             )
 
@@ -170,13 +170,13 @@ class TestHandlerCase(unittest.TestCase):
                 )
 
                 set_payment_resolution.assert_called_once_with(
-                    payment_data, resolution
+                    payment_data, resolution, uid=None
                 )
 
                 self.assertEqual(
                     push_payment_message.mock_calls,
                     [
-                        call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY),
+                        call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY, uid=None),
                     ]
                 )
 
@@ -206,13 +206,13 @@ class TestHandlerCase(unittest.TestCase):
                 )
 
                 set_payment_resolution.assert_called_once_with(
-                    payment_data, resolution
+                    payment_data, resolution, uid=None
                 )
 
                 self.assertEqual(
                     push_payment_message.mock_calls,
                     [
-                        call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY),
+                        call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY, uid=None),
                     ]
                 )
 
@@ -242,13 +242,13 @@ class TestHandlerCase(unittest.TestCase):
             )
 
             set_payment_resolution.assert_called_once_with(
-                payment_data, resolution
+                payment_data, resolution, uid=None
             )
 
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY),
+                    call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY, uid=None),
                 ]
             )
 
@@ -278,13 +278,13 @@ class TestHandlerCase(unittest.TestCase):
             )
 
             set_payment_resolution.assert_called_once_with(
-                payment_data, resolution
+                payment_data, resolution, uid=None
             )
 
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY),
+                    call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY, uid=None),
                 ]
             )
 
@@ -314,13 +314,13 @@ class TestHandlerCase(unittest.TestCase):
             )
 
             set_payment_resolution.assert_called_once_with(
-                payment_data, resolution
+                payment_data, resolution, uid=None
             )
 
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY),
+                    call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY, uid=None),
                 ]
             )
 
@@ -350,13 +350,13 @@ class TestHandlerCase(unittest.TestCase):
             )
 
             set_payment_resolution.assert_called_once_with(
-                payment_data, resolution
+                payment_data, resolution, uid=None
             )
 
             self.assertEqual(
                 push_payment_message.mock_calls,
                 [
-                    call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY),
+                    call(payment_data, PAYMENTS_CRAWLER_RESOLUTION_SAVE_SUCCESS, ANY, uid=None),
                 ]
             )
 
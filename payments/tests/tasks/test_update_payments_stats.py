@@ -0,0 +1,35 @@
+import unittest
+import pymongo.errors
+
+from unittest.mock import patch, Mock
+from celery.exceptions import Retry
+
+from environment_settings import DEFAULT_RETRY_AFTER
+from payments.tasks import update_payments_stats
+
+
+class TestHandlerCase(unittest.TestCase):
+
+    def test_handle(self):
+        with patch("payments.tasks.init_payment_stats") as init_payment_stats, \
+             patch("payments.tasks.update_payment_stats") as update_payment_stats:
+            update_payment_stats.return_value = 2
+
+            update_payments_stats()
+
+        init_payment_stats.assert_called_once_with()
+        update_payment_stats.assert_called_once_with()
+
+    def test_handle_mongodb_error(self):
+        with patch("payments.tasks.init_payment_stats"), \
+             patch("payments.tasks.update_payment_stats") as update_payment_stats, \
+             patch.object(update_payments_stats, "retry", Mock(side_effect=Retry)):
+            update_payment_stats.side_effect = pymongo.errors.PyMongoError()
+
+            with self.assertRaises(Retry):
+                update_payments_stats()
+
+            update_payments_stats.retry.assert_called_once_with(
+                countdown=DEFAULT_RETRY_AFTER,
+                exc=update_payment_stats.side_effect
+            )
@@ -0,0 +1,99 @@
+from threading import Event
+from time import time
+from unittest.mock import patch, Mock
+
+import unittest
+
+from payments.health import (
+    STATUS_AVAILABLE,
+    STATUS_UNAVAILABLE,
+    run_probes,
+    health,
+    check_health,
+)
+
+
+class RunProbesTestCase(unittest.TestCase):
+
+    def test_concurrent(self):
+        started = Event()
+
+        def probe_wait():
+            # finishes only if the other probe is running at the same time
+            return {"status": STATUS_AVAILABLE if started.wait(5) else STATUS_UNAVAILABLE}
+
+        def probe_start():
+            started.set()
+            return {"status": STATUS_AVAILABLE}
+
+        result = run_probes({"first": probe_wait, "second": probe_start}, timeout=10)
+
+        self.assertEqual(result, {
+            "first": {"status": STATUS_AVAILABLE},
+            "second": {"status": STATUS_AVAILABLE},
+        })
+        self.assertEqual(list(result.keys()), ["first", "second"])
+
+    def test_timeout(self):
+        release = Event()
+
+        def probe_slow():
+            release.wait(5)
+            return {"status": STATUS_AVAILABLE}
+
+        start = time()
+        result = run_probes({"fast": lambda: {"status": STATUS_AVAILABLE}, "slow": probe_slow}, timeout=0.1)
+        release.set()
+
+        self.assertLess(time() - start, 5)
+        self.assertEqual(result["fast"], {"status": STATUS_AVAILABLE})
+        self.assertEqual(result["slow"], {
+            "status": STATUS_UNAVAILABLE,
+            "total_seconds": 0.1,
+            "exception": "TimeoutError",
+        })
+
+
+class HealthTestCase(unittest.TestCase):
+
+    @patch("payments.health.rabbitmq_report")
+    @patch("payments.health.mongodb_info")
+    @patch("payments.health.request_liqpay")
+    @patch("payments.health.request_search")
+    @patch("payments.health.request_lb")
+    @patch("payments.health.request_public")
+    def test_health(self, request_public, request_lb, request_search, request_liqpay, mongodb_info, rabbitmq_report):
+        request_public.return_value = Mock(status_code=200)
+        request_lb.return_value = Mock(status_code=200)
+        request_search.side_effect = Exception()
+        request_liqpay.return_value = Mock(status_code=200, text='{"code": "payment_not_found"}')
+        mongodb_info.return_value = {"ok": 1}
+        rabbitmq_report.return_value = {"worker": {"ok": ""}}
+
+        result = health()
+
+        self.assertEqual(result["status"], STATUS_UNAVAILABLE)
+        self.assertEqual(
+            list(result.keys()),
+            ["status", "cdb_public", "cdb_lb", "cdb_search", "liqpay", "mongodb", "rabbitmq"]
+        )
+        self.assertEqual(
+            {key: value["status"] for key, value in result.items() if key != "status"},
+            {
+                "cdb_public": STATUS_AVAILABLE,
+                "cdb_lb": STATUS_AVAILABLE,
+                "cdb_search": STATUS_UNAVAILABLE,
+                "liqpay": STATUS_AVAILABLE,
+                "mongodb": STATUS_AVAILABLE,
+                "rabbitmq": STATUS_AVAILABLE,
+            }
+        )
+        self.assertEqual(result["cdb_search"]["exception"], "Exception")
+
+    @patch("payments.health.save_health_data")
+    @patch("payments.health.health")
+    def test_check_health(self, health_mock, save_health_data):
+        result = check_health()
+
+        self.assertEqual(result, health_mock.return_value)
+        save_health_data.assert_called_once_with(health_mock.return_value)
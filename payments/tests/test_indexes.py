@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock, call
+
+from pymongo import MongoClient
+
+import unittest
+
+from payments.message_ids import (
+    PAYMENTS_INVALID_PATTERN,
+    PAYMENTS_PATCH_COMPLAINT_PENDING_SUCCESS,
+    PAYMENTS_PATCH_COMPLAINT_NOT_PENDING_SUCCESS,
+)
+from payments.results_db import (
+    INDEXES,
+    init_indexes,
+    data_to_uid,
+    UID_KEYS_3,
+    query_payment_find,
+    query_payment_by_params,
+    query_payment_search,
+    query_payment_report_success,
+    query_payment_report_failed,
+    query_payment_results,
+    get_date_oper,
+)
+from tasks_utils.tests.utils import MONGODB_TEST_URL, get_plan_stages, get_winning_plan_stages
+
+
+class InitIndexesTestCase(unittest.TestCase):
+
+    @patch("payments.results_db.get_mongodb_reports_collection")
+    @patch("payments.results_db.get_mongodb_status_collection")
+    @patch("payments.results_db.get_mongodb_collection")
+    def test_init_indexes(self, get_collection, get_status_collection, get_reports_collection):
+        collection = MagicMock()
+        get_collection.return_value = collection
+
+        init_indexes()
+
+        self.assertEqual(
+            collection.create_index.mock_calls,
+            [call(**kwargs) for kwargs in INDEXES]
+        )
+        get_reports_collection.return_value.create_index.assert_called_once_with(
+            keys="expireAt", expireAfterSeconds=0
+        )
+
+
+class PlanStagesTestCase(unittest.TestCase):
+
+    def test_get_plan_stages(self):
+        plan = {
+            "stage": "SUBPLAN",
+            "inputStage": {
+                "stage": "OR",
+                "inputStages": [
+                    {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "payment_odb_ref"}},
+                    {"stage": "COLLSCAN"},
+                ]
+            }
+        }
+
+        self.assertEqual(get_plan_stages(plan), ["SUBPLAN", "OR", "FETCH", "IXSCAN", "COLLSCAN"])
+
+
+@unittest.skipUnless(MONGODB_TEST_URL, "MONGODB_TEST_URL is not set")
+class QueryPlansTestCase(unittest.TestCase):
+    """
+    Checks that the query builders are served by INDEXES.
+    Runs against a real mongodb: MONGODB_TEST_URL=mongodb://localhost:27017 pytest payments
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.client = MongoClient(MONGODB_TEST_URL, serverSelectionTimeoutMS=5000)
+        cls.collection = cls.client.test_prozorro_tasks.payments_results
+        cls.collection.drop()
+        for kwargs in INDEXES:
+            cls.collection.create_index(**kwargs)
+
+        now = datetime.utcnow()
+        documents = []
+        for i in range(200):
+            payment = {
+                "description": "UA-2020-03-17-{:06d}-a.a2-12AD3F12".format(i),
+                "amount": str(i),
+                "currency": "UAH",
+                "date_oper": "17.03.2020 10:00:00",
+                "type": "credit",
+                "source": "credit",
+            }
+            if i % 2:
+                payment["odb_ref"] = str(i)
+            document = {
+                "_id": data_to_uid(payment, keys=UID_KEYS_3),
+                "payment": payment,
+                "dateOper": get_date_oper(payment),
+                "createdAt": now - timedelta(hours=i),
+                "params": {
+                    "complaint_id": "complaint_{}".format(i),
+                    "tender_id": "tender_{}".format(i),
+                    "item_id": None,
+                    "item_type": None,
+                },
+                "messages": [{
+                    "message_id": PAYMENTS_PATCH_COMPLAINT_PENDING_SUCCESS if i % 3 else PAYMENTS_INVALID_PATTERN,
+                    "createdAt": now - timedelta(hours=i),
+                }],
+            }
+            if i % 5 == 0:
+                document["resolution"] = {
+                    "type": "satisfied",
+                    "date": (now - timedelta(hours=i)).isoformat(),
+                    "funds": "complainant",
+                }
+            documents.append(document)
+        cls.collection.insert_many(documents)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.collection.drop()
+        cls.client.close()
+
+    def assertIndexed(self, query):
+        stages = get_winning_plan_stages(self.collection.find(query))
+        self.assertNotIn("COLLSCAN", stages, "Query {} isn't indexed: {}".format(query, stages))
+
+    def test_find(self):
+        self.assertIndexed(query_payment_find({"description": "test", "odb_ref": "1"}))
+        self.assertIndexed(query_payment_find({"description": "test"}))
+
+    def test_by_params(self):
+        self.assertIndexed(query_payment_by_params(
+            {"complaint_id": "complaint_1", "tender_id": "tender_1", "item_id": None, "item_type": None},
+            [PAYMENTS_PATCH_COMPLAINT_PENDING_SUCCESS, PAYMENTS_PATCH_COMPLAINT_NOT_PENDING_SUCCESS]
+        ))
+
+    def test_search(self):
+        self.assertIndexed(query_payment_search(search="UA-2020-03-17-000001-a.a2"))
+        self.assertIndexed(query_payment_search(processing_status="success"))
+        self.assertIndexed(query_payment_search(
+            payment_date_from=datetime(2020, 3, 16),
+            payment_date_to=datetime(2020, 3, 17),
+        ))
+
+    def test_report_success(self):
+        date_to = datetime.utcnow()
+        date_from = date_to - timedelta(days=2)
+        self.assertIndexed(query_payment_report_success(
+            resolution_date_from=date_from,
+            resolution_date_to=date_to,
+        ))
+        self.assertIndexed(query_payment_report_success(
+            resolution_date_from=date_from,
+            resolution_date_to=date_to,
+            resolution_funds="complainant",
+        ))
+
+    def test_report_failed(self):
+        date_to = datetime.now()
+        self.assertIndexed(query_payment_report_failed(
+            message_ids_include=[PAYMENTS_INVALID_PATTERN],
+            message_ids_date_from=date_to - timedelta(days=2),
+            message_ids_date_to=date_to,
+        ))
+
+    def test_results(self):
+        date_to = datetime.now()
+        self.assertIndexed(query_payment_results(date_to - timedelta(days=2), date_to))
@@ -1,6 +1,9 @@
-from unittest.mock import patch, MagicMock, ANY
+from datetime import datetime
+from unittest.mock import patch, MagicMock, ANY, call
 
-from pymongo.errors import DuplicateKeyError
+from pymongo import UpdateOne, DESCENDING
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from pytz import UTC
 
 import unittest
 
@@ -12,6 +15,32 @@ from payments.results_db import (
     set_payment_params,
     set_payment_resolution,
     get_payment_item_by_params,
+    find_payment_items,
+    get_payment_uid,
+    get_date_oper,
+    backfill_date_oper,
+    count_payment_results,
+    find_payment_results,
+    update_payment_item,
+    get_stats_day,
+    mark_payment_stats_dirty,
+    init_payment_stats,
+    update_payment_stats,
+    get_payment_stats_daily,
+    query_payment_search,
+    query_payment_report,
+    query_payment_report_success,
+    get_report_day,
+    get_report_days,
+    get_report_version,
+    get_report_uid,
+    save_report_item,
+    save_report_file,
+    delete_expired_report_files,
+    set_report_failed,
+    delete_failed_report_item,
+    UID_KEYS_1,
+    UID_KEYS_3,
 )
 
 
@@ -29,14 +58,18 @@ class ResultsDBTestCase(unittest.TestCase):
         self.assertEqual(result, collection.find_one.return_value)
         collection.find_one.assert_called_once_with({"_id": uid})
 
+    @patch("payments.results_db.get_mongodb_reports_versions_collection")
     @patch("payments.results_db.datetime")
     @patch("payments.results_db.get_mongodb_collection")
-    def test_push_payment_message(self, get_collection, datetime):
+    def test_push_payment_message(self, get_collection, datetime_mock, get_versions_collection):
         collection = MagicMock()
         get_collection.return_value = collection
+        collection.find_one_and_update.return_value = {
+            "_id": "test_uid", "messages": [{"createdAt": datetime(2020, 3, 16, 22, 30)}]
+        }
 
-        fake_datetime = "test_datetime"
-        datetime.utcnow.return_value = fake_datetime
+        fake_datetime = datetime(2020, 3, 18, 10)
+        datetime_mock.utcnow.return_value = fake_datetime
 
         data = {
             "description": "test_description",
@@ -55,8 +88,8 @@ class ResultsDBTestCase(unittest.TestCase):
 
         result = push_payment_message(data, message_id, message)
 
-        self.assertEqual(result, collection.update_one.return_value)
-        collection.update_one.assert_called_once_with(
+        self.assertEqual(result, collection.find_one_and_update.return_value)
+        collection.find_one_and_update.assert_called_once_with(
             ANY,
             {
                 '$push': {
@@ -66,7 +99,13 @@ class ResultsDBTestCase(unittest.TestCase):
                         "createdAt": fake_datetime
                     }
                 }
-            })
+            },
+            projection={"messages.createdAt": 1, "resolution.date": 1},
+        )
+        get_versions_collection.return_value.bulk_write.assert_called_once_with([
+            UpdateOne({"_id": "2020-03-17"}, {"$inc": {"version": 1}}, upsert=True),
+            UpdateOne({"_id": "2020-03-18"}, {"$inc": {"version": 1}}, upsert=True),
+        ], ordered=False)
 
     @patch("payments.results_db.datetime")
     @patch("payments.results_db.get_mongodb_collection")
@@ -98,6 +137,7 @@ class ResultsDBTestCase(unittest.TestCase):
             "_id": data_to_uid(data),
             "payment": data,
             "user": user,
+            "dateOper": None,
             "createdAt": fake_datetime
         })
 
@@ -140,10 +180,12 @@ class ResultsDBTestCase(unittest.TestCase):
             ANY, {'$set': {'params': params}}
         )
 
+    @patch("payments.results_db.get_mongodb_reports_versions_collection")
     @patch("payments.results_db.get_mongodb_collection")
-    def test_set_payment_resolution(self, get_collection):
+    def test_set_payment_resolution(self, get_collection, get_versions_collection):
         collection = MagicMock()
         get_collection.return_value = collection
+        collection.find_one_and_update.return_value = {"_id": "test_uid"}
 
         data = {
             "description": "test_description",
@@ -157,14 +199,17 @@ class ResultsDBTestCase(unittest.TestCase):
             "mfo": "test_mfo",
             "name": "test_name"
         }
-        params = {'test_param': 'test_value'}
+        params = {'test_param': 'test_value', 'date': '2020-03-17T12:00:00+02:00'}
 
         result = set_payment_resolution(data, params)
 
-        self.assertEqual(result, collection.update_one.return_value)
-        collection.update_one.assert_called_once_with(
-            ANY, {'$set': {'resolution': params}}
+        self.assertEqual(result, collection.find_one_and_update.return_value)
+        collection.find_one_and_update.assert_called_once_with(
+            ANY, {'$set': {'resolution': params}}, projection={"messages.createdAt": 1, "resolution.date": 1}
         )
+        get_versions_collection.return_value.bulk_write.assert_called_once_with([
+            UpdateOne({"_id": "2020-03-17"}, {"$inc": {"version": 1}}, upsert=True),
+        ], ordered=False)
 
     @patch("payments.results_db.get_mongodb_collection")
     def test_get_payment_item_by_params(self, get_collection):
@@ -179,3 +224,481 @@ class ResultsDBTestCase(unittest.TestCase):
         collection.find_one.assert_called_once_with(
             {'$and': [{'params.test_param': 'test_value'}]}
         )
+
+    @patch("payments.results_db.get_mongodb_collection")
+    def test_find_payment_items(self, get_collection):
+        collection = MagicMock()
+        get_collection.return_value = collection
+
+        data_list = [
+            {"description": "first", "amount": "1", "odb_ref": "ref_1"},
+            {"description": "second", "amount": "2", "odb_ref": "ref_2"},
+            {"description": "third", "amount": "3", "odb_ref": "ref_3"},
+        ]
+        first_item = {"_id": "uid_1", "payment": {"odb_ref": "ref_1"}}
+        second_item = {"_id": data_to_uid(data_list[1], keys=UID_KEYS_1), "payment": {}}
+        collection.find.side_effect = [
+            [first_item],
+            [second_item],
+        ]
+
+        result = find_payment_items(data_list, batch_size=10)
+
+        self.assertEqual(result, [first_item, second_item, None])
+        self.assertEqual(collection.find.call_count, 2)
+        odb_ref_query = collection.find.call_args_list[0][0][0]
+        self.assertEqual(set(odb_ref_query["payment.odb_ref"]["$in"]), {"ref_1", "ref_2", "ref_3"})
+        uid_query = collection.find.call_args_list[1][0][0]
+        self.assertEqual(uid_query["payment.odb_ref"], {"$exists": False})
+        self.assertEqual(len(uid_query["_id"]["$in"]), 6)  # no "source", so UID_KEYS_2 uids are the same as UID_KEYS_1
+        self.assertIn(data_to_uid(data_list[2], keys=UID_KEYS_3), uid_query["_id"]["$in"])
+
+    @patch("payments.results_db.get_mongodb_collection")
+    def test_find_payment_items_batches(self, get_collection):
+        collection = MagicMock()
+        get_collection.return_value = collection
+        collection.find.return_value = []
+
+        data_list = [{"description": str(i), "odb_ref": str(i)} for i in range(5)]
+
+        result = find_payment_items(data_list, batch_size=2)
+
+        self.assertEqual(result, [None] * 5)
+        # 5 odb_refs in 3 batches and 10 distinct uids in 5 batches
+        self.assertEqual(collection.find.call_count, 8)
+
+    @patch("payments.results_db.get_mongodb_collection")
+    def test_set_payment_params_uid(self, get_collection):
+        collection = MagicMock()
+        get_collection.return_value = collection
+
+        result = set_payment_params({"description": "test_description"}, {"test": "params"}, uid="test_uid")
+
+        self.assertEqual(result, collection.update_one.return_value)
+        collection.update_one.assert_called_once_with(
+            {"_id": "test_uid"},
+            {"$set": {"params": {"test": "params"}}}
+        )
+
+    @patch("payments.results_db.get_mongodb_collection")
+    def test_get_payment_uid(self, get_collection):
+        collection = MagicMock()
+        get_collection.return_value = collection
+        collection.find_one.return_value = {"_id": "test_uid"}
+
+        result = get_payment_uid({"description": "test_description", "odb_ref": "test_ref"})
+
+        self.assertEqual(result, "test_uid")
+        collection.find_one.assert_called_once_with(ANY, {"_id": 1})
+
+    def test_get_date_oper(self):
+        self.assertEqual(
+            get_date_oper({"date_oper": "17.03.2020 10:15:00"}),
+            datetime(2020, 3, 17, 8, 15, tzinfo=UTC)
+        )
+        self.assertIsNone(get_date_oper({"date_oper": "2020-03-17"}))
+        self.assertIsNone(get_date_oper({}))
+
+    @patch("payments.results_db.get_mongodb_stats_collection")
+    @patch("payments.results_db.get_mongodb_collection")
+    def test_backfill_date_oper(self, get_collection, get_stats_collection):
+        collection = MagicMock()
+        get_collection.return_value = collection
+        collection.find.return_value.limit.return_value = [
+            {"_id": "uid_1", "payment": {"date_oper": "17.03.2020 10:15:00"}},
+            {"_id": "uid_2", "payment": {"date_oper": "invalid"}},
+        ]
+
+        result = backfill_date_oper(batch_size=2)
+
+        self.assertEqual(result, 2)
+        get_stats_collection.return_value.update_one.assert_not_called()
+        collection.find.assert_called_once_with({"dateOper": {"$exists": False}}, {"payment.date_oper": 1})
+        collection.find.return_value.limit.assert_called_once_with(2)
+        collection.bulk_write.assert_called_once_with([
+            UpdateOne({"_id": "uid_1"}, {"$set": {"dateOper": datetime(2020, 3, 17, 8, 15, tzinfo=UTC)}}),
+            UpdateOne({"_id": "uid_2"}, {"$set": {"dateOper": None}}),
+        ], ordered=False)
+        get_stats_collection.return_value.bulk_write.assert_called_once_with([
+            UpdateOne({"_id": "2020-03-17"}, {"$set": {"dirty": True}}, upsert=True),
+        ], ordered=False)
+
+    @patch("payments.results_db.get_mongodb_stats_collection")
+    @patch("payments.results_db.get_mongodb_collection")
+    def test_backfill_date_oper_done(self, get_collection, get_stats_collection):
+        collection = MagicMock()
+        get_collection.return_value = collection
+        collection.find.return_value.limit.return_value = []
+
+        result = backfill_date_oper()
+
+        self.assertEqual(result, 0)
+        collection.bulk_write.assert_not_called()
+        get_stats_collection.return_value.update_one.assert_called_once_with(
+            {"_id": "date_oper_backfilled"}, {"$set": {"backfilledAt": ANY}}, upsert=True,
+        )
+
+    @patch("payments.results_db.get_mongodb_collection")
+    def test_count_payment_results(self, get_collection):
+        collection = MagicMock()
+        get_collection.return_value = collection
+
+        self.assertEqual(count_payment_results({"test": "filter"}), collection.count_documents.return_value)
+        collection.count_documents.assert_called_once_with({"test": "filter"})
+
+        self.assertEqual(count_payment_results({}), collection.estimated_document_count.return_value)
+
+    @patch("payments.results_db.get_mongodb_collection")
+    def test_find_payment_results(self, get_collection):
+        collection = MagicMock()
+        get_collection.return_value = collection
+
+        result = find_payment_results({"test": "filter"}, batch_size=10)
+
+        self.assertEqual(result, collection.find.return_value.sort.return_value.batch_size.return_value)
+        collection.find.assert_called_once_with({"test": "filter"})
+        collection.find.return_value.sort.assert_called_once_with([("createdAt", DESCENDING), ("_id", DESCENDING)])
+        collection.find.return_value.sort.return_value.batch_size.assert_called_once_with(10)
+
+
+class PaymentStatsTestCase(unittest.TestCase):
+
+    def test_get_stats_day(self):
+        self.assertEqual(get_stats_day({"date_oper": "17.03.2020 23:15:00"}), "2020-03-17")
+        self.assertIsNone(get_stats_day({"date_oper": "invalid"}))
+        self.assertIsNone(get_stats_day({}))
+
+    @patch("payments.results_db.get_mongodb_stats_collection")
+    def test_mark_payment_stats_dirty(self, get_stats_collection):
+        mark_payment_stats_dirty([
+            {"date_oper": "18.03.2020 10:00:00"},
+            {"date_oper": "17.03.2020 10:00:00"},
+            {"date_oper": "17.03.2020 12:00:00"},
+            {},
+        ])
+
+        get_stats_collection.return_value.bulk_write.assert_called_once_with([
+            UpdateOne({"_id": "2020-03-17"}, {"$set": {"dirty": True}}, upsert=True),
+            UpdateOne({"_id": "2020-03-18"}, {"$set": {"dirty": True}}, upsert=True),
+        ], ordered=False)
+
+    @patch("payments.results_db.get_mongodb_stats_collection")
+    def test_mark_payment_stats_dirty_error(self, get_stats_collection):
+        get_stats_collection.return_value.bulk_write.side_effect = PyMongoError()
+
+        mark_payment_stats_dirty([{"date_oper": "17.03.2020 10:00:00"}])
+
+    @patch("payments.results_db.get_mongodb_stats_collection")
+    def test_mark_payment_stats_dirty_no_days(self, get_stats_collection):
+        mark_payment_stats_dirty([{"date_oper": "invalid"}])
+
+        get_stats_collection.assert_not_called()
+
+    @patch("payments.results_db.get_mongodb_stats_collection")
+    @patch("payments.results_db.get_mongodb_collection")
+    def test_update_payment_item(self, get_collection, get_stats_collection):
+        collection = get_collection.return_value
+        collection.find_one_and_update.return_value = {
+            "_id": "test_uid", "payment": {"date_oper": "16.03.2020 10:00:00"}
+        }
+
+        update_payment_item("test_uid", {"date_oper": "17.03.2020 10:00:00"})
+
+        collection.find_one_and_update.assert_called_once_with(
+            {"_id": "test_uid"}, ANY,
+            projection={"payment.date_oper": 1, "messages.createdAt": 1, "resolution.date": 1}
+        )
+        get_stats_collection.return_value.bulk_write.assert_called_once_with([
+            UpdateOne({"_id": "2020-03-16"}, {"$set": {"dirty": True}}, upsert=True),
+            UpdateOne({"_id": "2020-03-17"}, {"$set": {"dirty": True}}, upsert=True),
+        ], ordered=False)
+
+    @patch("payments.results_db.get_mongodb_stats_collection")
+    @patch("payments.results_db.get_mongodb_collection")
+    def test_init_payment_stats(self, get_collection, get_stats_collection):
+        stats_collection = get_stats_collection.return_value
+        stats_collection.find_one.return_value = None
+        get_collection.return_value.aggregate.return_value = [{"_id": "2020-03-17"}, {"_id": "2020-03-18"}]
+
+        result = init_payment_stats()
+
+        self.assertEqual(result, 2)
+        stats_collection.bulk_write.assert_called_once_with([
+            UpdateOne({"_id": "2020-03-17"}, {"$set": {"dirty": True}}, upsert=True),
+            UpdateOne({"_id": "2020-03-18"}, {"$set": {"dirty": True}}, upsert=True),
+        ], ordered=False)
+        stats_collection.find_one.assert_called_once_with({"_id": "initialized"})
+        stats_collection.update_one.assert_called_once_with(
+            {"_id": "initialized"}, {"$set": {"initializedAt": ANY}}, upsert=True,
+        )
+
+    @patch("payments.results_db.get_mongodb_stats_collection")
+    @patch("payments.results_db.get_mongodb_collection")
+    def test_init_payment_stats_exists(self, get_collection, get_stats_collection):
+        get_stats_collection.return_value.find_one.return_value = {"_id": "initialized"}
+
+        result = init_payment_stats()
+
+        self.assertEqual(result, 0)
+        get_collection.return_value.aggregate.assert_not_called()
+        get_stats_collection.return_value.update_one.assert_not_called()
+
+    @patch("payments.results_db.datetime")
+    @patch("payments.results_db.get_payment_stats")
+    @patch("payments.results_db.get_mongodb_stats_collection")
+    def test_update_payment_stats(self, get_stats_collection, get_payment_stats, datetime_mock):
+        datetime_mock.strptime = datetime.strptime
+        datetime_mock.utcnow.return_value = "test_datetime"
+        stats_collection = get_stats_collection.return_value
+        stats_collection.find.return_value = [{"_id": "2020-03-17"}]
+        counts = {"type": {"credit": 2}, "source": {"account": 2}, "date_oper": {"2020-03-17": 2}}
+        get_payment_stats.return_value = {"counts": counts}
+
+        result = update_payment_stats("2020-03-16", "2020-03-17")
+
+        self.assertEqual(result, 1)
+        stats_collection.find.assert_called_once_with(
+            {"dirty": True, "_id": {"$gte": "2020-03-16", "$lte": "2020-03-17"}}, {"_id": 1}
+        )
+        date = datetime(2020, 3, 17)
+        get_payment_stats.assert_called_once_with(
+            query_payment_search(payment_date_from=date, payment_date_to=date)
+        )
+        self.assertEqual(stats_collection.update_one.call_args_list, [
+            call({"_id": "2020-03-17"}, {"$set": {"dirty": False}}),
+            call({"_id": "2020-03-17"}, {"$set": {"counts": counts, "updatedAt": "test_datetime"}}),
+        ])
+
+    @patch("payments.results_db.update_payment_stats")
+    @patch("payments.results_db.get_mongodb_stats_collection")
+    def test_get_payment_stats_daily(self, get_stats_collection, update_payment_stats):
+        get_stats_collection.return_value.count_documents.return_value = 2
+        get_stats_collection.return_value.find.return_value = [
+            {
+                "_id": "2020-03-18",
+                "counts": {
+                    "type": {"credit": 1},
+                    "source": {"account": 1},
+                    "date_oper": {"2020-03-18": 1},
+                },
+            },
+            {
+                "_id": "2020-03-17",
+                "counts": {
+                    "type": {"credit": 1, "debit": 2},
+                    "source": {"account": 1, "card": 2},
+                    "date_oper": {"2020-03-17": 3},
+                    "date_resolution": {"2020-03-20": 1},
+                },
+            },
+            {"_id": "2020-03-16", "dirty": True, "counts": {}},
+        ]
+
+        result = get_payment_stats_daily(datetime(2020, 3, 16), datetime(2020, 3, 18))
+
+        get_stats_collection.return_value.count_documents.assert_called_once_with(
+            {"_id": {"$in": ["initialized", "date_oper_backfilled"]}}
+        )
+        update_payment_stats.assert_called_once_with("2020-03-16", "2020-03-18", limit=3)
+        get_stats_collection.return_value.find.assert_called_once_with(
+            {"_id": {"$gte": "2020-03-16", "$lte": "2020-03-18"}}
+        )
+        self.assertEqual(result, {"counts": {
+            "type": {"credit": 2, "debit": 2},
+            "source": {"account": 2, "card": 2},
+            "date_oper": {"2020-03-17": 3, "2020-03-18": 1},
+            "date_resolution": {"2020-03-20": 1},
+        }})
+        self.assertEqual(list(result["counts"]["date_oper"]), ["2020-03-17", "2020-03-18"])
+
+    @patch("payments.results_db.update_payment_stats")
+    @patch("payments.results_db.get_mongodb_stats_collection")
+    def test_get_payment_stats_daily_not_initialized(self, get_stats_collection, update_payment_stats):
+        get_stats_collection.return_value.count_documents.return_value = 1
+
+        result = get_payment_stats_daily(datetime(2020, 3, 16), datetime(2020, 3, 18))
+
+        self.assertIsNone(result)
+        update_payment_stats.assert_not_called()
+
+    @patch("payments.results_db.update_payment_stats")
+    @patch("payments.results_db.get_mongodb_stats_collection")
+    def test_get_payment_stats_daily_not_calculated(self, get_stats_collection, update_payment_stats):
+        get_stats_collection.return_value.count_documents.return_value = 2
+        get_stats_collection.return_value.find.return_value = [
+            {"_id": "2020-03-17", "counts": {"type": {"credit": 1}}},
+            {"_id": "2020-03-16", "dirty": True},
+        ]
+
+        result = get_payment_stats_daily(datetime(2020, 3, 16), datetime(2020, 3, 18))
+
+        self.assertIsNone(result)
+
+
+class PaymentReportsTestCase(unittest.TestCase):
+
+    def test_get_report_day(self):
+        self.assertEqual(get_report_day(datetime(2020, 3, 16, 22, 30)), "2020-03-17")
+        self.assertEqual(get_report_day("2020-03-17T12:00:00+02:00"), "2020-03-17")
+        self.assertIsNone(get_report_day(None))
+        self.assertIsNone(get_report_day(""))
+
+    def test_get_report_days(self):
+        item = {
+            "messages": [{"createdAt": datetime(2020, 3, 16, 10)}, {"createdAt": datetime(2020, 3, 16, 12)}],
+            "resolution": {"date": "2020-03-18T12:00:00+02:00"},
+        }
+
+        self.assertEqual(get_report_days(item), {"2020-03-16", "2020-03-18"})
+        self.assertEqual(get_report_days({"resolution": None}), set())
+
+    def test_query_payment_report(self):
+        date_from, date_to = datetime(2020, 3, 16), datetime(2020, 3, 17)
+
+        self.assertEqual(
+            query_payment_report(date_from, date_to, "state"),
+            query_payment_report_success(
+                resolution_exists=True,
+                resolution_funds="state",
+                resolution_date_from=date_from,
+                resolution_date_to=date_to,
+            )
+        )
+        self.assertEqual(len(query_payment_report(date_from, date_to, "all")["$or"]), 2)
+        self.assertIsNone(query_payment_report(date_from, date_to, "invalid"))
+
+    @patch("payments.results_db.get_mongodb_reports_versions_collection")
+    def test_get_report_version(self, get_versions_collection):
+        get_versions_collection.return_value.aggregate.return_value = iter([{"_id": None, "version": 5}])
+
+        result = get_report_version(datetime(2020, 3, 16), datetime(2020, 3, 17))
+
+        self.assertEqual(result, 5)
+        pipeline = get_versions_collection.return_value.aggregate.call_args[0][0]
+        self.assertEqual(pipeline[0], {"$match": {"_id": {"$gte": "2020-03-16", "$lte": "2020-03-17"}}})
+
+    @patch("payments.results_db.get_mongodb_reports_versions_collection")
+    def test_get_report_version_empty(self, get_versions_collection):
+        get_versions_collection.return_value.aggregate.return_value = iter([])
+
+        self.assertEqual(get_report_version(datetime(2020, 3, 16), datetime(2020, 3, 17)), 0)
+
+    def test_get_report_uid(self):
+        date_from, date_to = datetime(2020, 3, 16), datetime(2020, 3, 17)
+
+        self.assertEqual(get_report_uid(date_from, date_to, "all", 1), get_report_uid(date_from, date_to, "all", 1))
+        self.assertNotEqual(get_report_uid(date_from, date_to, "all", 1), get_report_uid(date_from, date_to, "all", 2))
+        self.assertNotEqual(get_report_uid(date_from, date_to, "all", 1), get_report_uid(date_from, date_to, "state", 1))
+
+    @patch("payments.results_db.datetime")
+    @patch("payments.results_db.get_mongodb_reports_collection")
+    def test_save_report_item(self, get_reports_collection, datetime_mock):
+        datetime_mock.utcnow.return_value = datetime(2020, 3, 18, 10)
+        collection = get_reports_collection.return_value
+
+        result = save_report_item("test_uid", datetime(2020, 3, 16), datetime(2020, 3, 17), "all", 3, 60)
+
+        self.assertTrue(result)
+        collection.insert_one.assert_called_once_with({
+            "_id": "test_uid",
+            "date_from": "2020-03-16",
+            "date_to": "2020-03-17",
+            "funds": "all",
+            "version": 3,
+            "createdAt": datetime(2020, 3, 18, 10),
+            "expireAt": datetime(2020, 3, 18, 10, 1),
+        })
+
+        collection.insert_one.side_effect = DuplicateKeyError("error")
+        self.assertFalse(save_report_item("test_uid", datetime(2020, 3, 16), datetime(2020, 3, 17), "all", 3, 60))
+
+    @patch("payments.results_db.datetime")
+    @patch("payments.results_db.get_reports_fs")
+    @patch("payments.results_db.get_mongodb_reports_collection")
+    def test_save_report_file(self, get_reports_collection, get_reports_fs, datetime_mock):
+        datetime_mock.utcnow.return_value = datetime(2020, 3, 18, 10)
+        collection = get_reports_collection.return_value
+        collection.find_one.return_value = {
+            "_id": "test_uid", "date_from": "2020-03-16", "date_to": "2020-03-17", "funds": "all", "version": 3
+        }
+        collection.find.return_value = [{"_id": "previous_uid", "file_id": "previous_file_id"}]
+        fs = get_reports_fs.return_value
+        file = MagicMock()
+
+        result = save_report_file("test_uid", "report.xlsx", file, timeout=60)
+
+        self.assertEqual(result, fs.upload_from_stream.return_value)
+        fs.upload_from_stream.assert_called_once_with("report.xlsx", file, metadata={"report_id": "test_uid"})
+        collection.update_one.assert_called_once_with(
+            {"_id": "test_uid"},
+            {"$set": {"file_id": result, "filename": "report.xlsx", "expireAt": datetime(2020, 3, 18, 10, 1)}}
+        )
+        # only the older versions are removed
+        collection.find.assert_called_once_with({
+            "date_from": "2020-03-16",
+            "date_to": "2020-03-17",
+            "funds": "all",
+            "version": {"$lt": 3},
+            "file_id": {"$exists": True},
+        }, {"file_id": 1})
+        fs.delete.assert_called_once_with("previous_file_id")
+        collection.delete_one.assert_called_once_with({"_id": "previous_uid"})
+
+    @patch("payments.results_db.get_reports_fs")
+    @patch("payments.results_db.get_mongodb_reports_collection")
+    def test_save_report_file_no_version(self, get_reports_collection, get_reports_fs):
+        collection = get_reports_collection.return_value
+        collection.find_one.return_value = {
+            "_id": "test_uid", "date_from": "2020-03-16", "date_to": "2020-03-17", "funds": "all"
+        }
+
+        result = save_report_file("test_uid", "report.xlsx", MagicMock())
+
+        self.assertEqual(result, get_reports_fs.return_value.upload_from_stream.return_value)
+        collection.find.assert_not_called()
+        get_reports_fs.return_value.delete.assert_not_called()
+
+    @patch("payments.results_db.get_mongodb_reports_collection")
+    def test_set_report_failed(self, get_reports_collection):
+        set_report_failed("test_uid", "ValueError: broken")
+
+        get_reports_collection.return_value.update_one.assert_called_once_with(
+            {"_id": "test_uid", "file_id": {"$exists": False}},
+            {"$set": {"failed": True, "error": "ValueError: broken"}},
+        )
+
+    @patch("payments.results_db.get_mongodb_reports_collection")
+    def test_delete_failed_report_item(self, get_reports_collection):
+        delete_failed_report_item("test_uid")
+
+        get_reports_collection.return_value.delete_one.assert_called_once_with({"_id": "test_uid", "failed": True})
+
+    @patch("payments.results_db.get_reports_fs")
+    @patch("payments.results_db.get_mongodb_reports_collection")
+    def test_delete_expired_report_files(self, get_reports_collection, get_reports_fs):
+        collection = get_reports_collection.return_value
+        collection.find.return_value = [{"_id": "report_uid"}]
+        fs = get_reports_fs.return_value
+        fs.find.return_value = [
+            MagicMock(_id="file_id", metadata={"report_id": "report_uid"}),
+            MagicMock(_id="expired_file_id", metadata={"report_id": "expired_uid"}),
+        ]
+
+        result = delete_expired_report_files(timeout=60)
+
+        self.assertEqual(result, 1)
+        collection.update_many.assert_called_once_with(
+            {"file_id": {"$exists": True}, "expireAt": {"$exists": False}},
+            {"$set": {"expireAt": ANY}},
+        )
+        fs.delete.assert_called_once_with("expired_file_id")
+
+    @patch("payments.results_db.get_reports_fs")
+    @patch("payments.results_db.get_mongodb_reports_collection")
+    def test_save_report_file_expired(self, get_reports_collection, get_reports_fs):
+        get_reports_collection.return_value.find_one.return_value = None
+
+        result = save_report_file("test_uid", "report.xlsx", MagicMock())
+
+        self.assertIsNone(result)
+        get_reports_fs.assert_not_called()
@@ -0,0 +1,99 @@
+import unittest
+from datetime import datetime, timedelta
+
+import jmespath
+
+from payments.message_ids import PAYMENTS_PATCH_COMPLAINT_PENDING_SUCCESS, PAYMENTS_INVALID_PATTERN
+from payments.schemes import ROOT_SCHEME, REPORT_SCHEME, get_scheme_data
+from tasks_utils.schemes import get_scheme_value
+
+
+def search_scheme_value(data, scheme_info):
+    # the implementation before tasks_utils.schemes, jmespath.search for every field
+    if "scheme" in scheme_info:
+        return search_scheme_data(data, scheme_info["scheme"])
+    if scheme_info["path"] == ".":
+        value = data
+    else:
+        value = jmespath.search(scheme_info["path"], data)
+    if "method" in scheme_info:
+        value = scheme_info["method"](value)
+    value = value or scheme_info.get("default")
+    if value is not None:
+        return value
+
+
+def search_scheme_data(data, scheme):
+    data_formatted = {}
+    for scheme_field, scheme_info in scheme.items():
+        scheme_type = scheme_info.get("type")
+        if scheme_type == "object":
+            value = search_scheme_value(data, scheme_info)
+            if value is not None:
+                item = dict(value=value)
+                if scheme_info.get("title"):
+                    item.update(dict(title=scheme_info["title"]))
+                data_formatted.update({scheme_field: item})
+        elif scheme_type == "value":
+            value = search_scheme_value(data, scheme_info)
+            if value is not None:
+                data_formatted.update({scheme_field: value})
+    return data_formatted
+
+
+def generate_rows(rows_count):
+    now = datetime(2020, 4, 20, 10)
+    return [
+        {
+            "_id": "{:032x}".format(i),
+            "payment": {
+                "description": "UA-2020-03-17-{:06d}-a.a2-12AD3F12".format(i),
+                "amount": "{}.00".format(1000 + i),
+                "currency": "UAH",
+                "date_oper": "17.03.2020 10:00:00",
+                "type": "credit",
+                "source": "account",
+                "account": "UA000000000000000000000000000",
+                "okpo": "12345678",
+                "mfo": "123456",
+                "name": "ТОВ \"Скаржник {}\"".format(i),
+            },
+            "user": "bot",
+            "createdAt": now - timedelta(minutes=i),
+            "params": {"complaint_id": "{:032x}".format(i), "tender_id": "{:032x}".format(i)},
+            "messages": [{
+                "message_id": PAYMENTS_PATCH_COMPLAINT_PENDING_SUCCESS if i % 3 else PAYMENTS_INVALID_PATTERN,
+                "createdAt": now - timedelta(minutes=i),
+            }],
+            "author": {
+                "identifier": {"scheme": "UA-EDR", "id": "12345678", "legalName": "Скаржник"},
+                "contactPoint": {"telephone": "+380440000000"},
+            },
+            "resolution": {
+                "type": "satisfied",
+                "date": "2020-04-19T10:00:00+03:00",
+                "funds": "complainant",
+            },
+        }
+        for i in range(rows_count)
+    ]
+
+
+class SchemesTestCase(unittest.TestCase):
+
+    def test_root_scheme(self):
+        # author and resolution are set, so the complaint isn't requested
+        rows = generate_rows(10) + [
+            {"author": {"identifier": {}}, "resolution": {"date": None}},
+            {"payment": None, "messages": [], "author": {"contactPoint": {}}, "resolution": {"funds": "state"}},
+        ]
+
+        for row in rows:
+            self.assertEqual(get_scheme_data(row, ROOT_SCHEME), search_scheme_data(row, ROOT_SCHEME))
+
+    def test_report_scheme(self):
+        for row in generate_rows(10):
+            self.assertEqual(
+                [get_scheme_value(row, scheme) or "" for scheme in REPORT_SCHEME.values()],
+                [search_scheme_value(row, scheme) or "" for scheme in REPORT_SCHEME.values()],
+            )
@@ -1,4 +1,6 @@
+import io
 import unittest
+import zipfile
 from datetime import datetime, timedelta
 from json import JSONDecodeError
 from unittest.mock import patch, MagicMock
@@ -25,6 +27,9 @@ from payments.utils import (
     store_payments_registry_fake,
     put_payments_registry_fake_data,
     get_payments_registry_fake_data,
+    generate_report_file,
+    generate_report_csv,
+    get_report_column_width,
 )
 
 VALID_ZONED_COMPLAINT_STR = "UA-2020-03-17-000090-a.c2-12ABCDEF"
@@ -842,3 +847,52 @@ class GetPaymentsRegistryFakeDataTestCase(unittest.TestCase):
             {'registry': data}
         )
         self.assertEqual(result, None)
+
+
+class GenerateReportTestCase(unittest.TestCase):
+
+    def get_data(self):
+        yield ["Header 1", "Header 2"]
+        yield ["value 1", "long value " * 5]
+        yield ["value 2", "value 3"]
+        yield ["Total", "10.00"]
+
+    def test_generate_report_file(self):
+        file = io.BytesIO()
+
+        generate_report_file(file, self.get_data(), "Title")
+
+        with zipfile.ZipFile(file) as archive:
+            sheet = archive.read("xl/worksheets/sheet1.xml").decode()
+        self.assertIn('<autoFilter ref="A2:C4"/>', sheet)
+        self.assertIn('<col min="3" max="3" width="25.7109375"', sheet)
+        for value in ("Title", "Header 1", "value 2", "value 3", "Total", "10.00"):
+            self.assertIn(">{}<".format(value), sheet)
+        self.assertLess(sheet.index("value 3"), sheet.index("Total"))
+
+    def test_generate_report_file_empty(self):
+        file = io.BytesIO()
+
+        generate_report_file(file, iter([["Header 1", "Header 2"], ["Total", "0.00"]]), "Title")
+
+        with zipfile.ZipFile(file) as archive:
+            sheet = archive.read("xl/worksheets/sheet1.xml").decode()
+        self.assertIn('<autoFilter ref="A2:C2"/>', sheet)
+        self.assertIn(">0.00<", sheet)
+
+    def test_get_report_column_width(self):
+        self.assertEqual(get_report_column_width(0, 0), 3)
+        self.assertEqual(get_report_column_width(0, 4), 5)
+        self.assertEqual(get_report_column_width(1, 100), 25)
+        self.assertEqual(get_report_column_width(3, 10), 11)
+
+    def test_generate_report_csv(self):
+        result = generate_report_csv(self.get_data())
+
+        self.assertEqual(next(result), "\ufeff")
+        self.assertEqual(next(result), "Header 1,Header 2\r\n")
+        self.assertEqual("".join(result), (
+            "value 1,{}\r\n"
+            "value 2,value 3\r\n"
+            "Total,10.00\r\n"
+        ).format("long value " * 5))
@@ -1,3 +1,5 @@
+import csv
+import io
 import json
 import re
 import shelve
@@ -33,6 +35,7 @@ from payments.data import (
     STATUS_COMPLAINT_DECLINED,
 )
 from tasks_utils.settings import DEFAULT_HEADERS
+from tasks_utils.cookies import server_id_cookies
 
 logger = get_task_logger(__name__)
 
@@ -143,6 +146,11 @@ REPORT_COLUMN_LARGE_MAX_LEN = 25
 
 REPORT_COLUMN_EXTRA_LEN = 1
 
+REPORT_FILE_MAX_MEMORY_SIZE = 1024 * 1024
+
+# lets excel detect utf-8 encoding of the csv report
+REPORT_CSV_BOM = "\ufeff"
+
 
 def find_replace(string, dictionary):
     for item in dictionary.keys():
@@ -325,8 +333,9 @@ def request_cdb_complaint_patch(tender_id, item_type, item_id, complaint_id, dat
 
 def request_cdb_cookies():
     client_request_id = uuid4().hex
-    head_response = request_cdb_head_spore(client_request_id=client_request_id, host=API_HOST)
-    return head_response.cookies.get_dict()
+    return server_id_cookies.get_cookies(
+        lambda: request_cdb_head_spore(client_request_id=client_request_id, host=API_HOST).cookies.get_dict()
+    )
 
 
 def get_resolution(complaint_data):
@@ -409,46 +418,70 @@ def get_payments_registry_fake_data(default=None):
         pass
 
 
+def get_report_column_width(index, max_len):
+    if index in REPORT_COLUMN_SMALL_INDICES:
+        min_default_len = REPORT_COLUMN_SMALL_MIN_LEN
+        max_default_len = REPORT_COLUMN_SMALL_MAX_LEN
+    elif index in REPORT_COLUMN_LARGE_INDICES:
+        min_default_len = REPORT_COLUMN_LARGE_MIN_LEN
+        max_default_len = REPORT_COLUMN_LARGE_MAX_LEN
+    else:
+        min_default_len = REPORT_COLUMN_DEFAULT_MIN_LEN
+        max_default_len = REPORT_COLUMN_DEFAULT_MAX_LEN
+    return min(max(max_len + REPORT_COLUMN_EXTRA_LEN if max_len else 0, min_default_len), max_default_len)
+
+
 def generate_report_file(filename, data, title):
-    total = data.pop(len(data) - 1)
-    for index, row in enumerate(data):
-        data[index] = [str(index) if index else " "] + row
-    headers = data.pop(0)
-    workbook = Workbook(filename)
+    """
+    Writes report rows (see iter_report) to xlsx: headers first, total last.
+    The workbook is in constant_memory mode, every row is flushed to a temp file
+    when the next one is written, so data can be a generator over a mongodb cursor
+    """
+    data = iter(data)
+    headers = [" "] + next(data)
+    workbook = Workbook(filename, {"constant_memory": True})
     worksheet = workbook.add_worksheet()
-    title_properties = {"text_wrap": True}
-    title_cell_format = workbook.add_format(title_properties)
+    title_cell_format = workbook.add_format({"text_wrap": True})
     title_cell_format.set_align("center")
-    worksheet.merge_range(0, 0, 0, len(headers) - 1, title, title_cell_format)
-    worksheet.add_table(1, 0, len(data) + 1, len(headers) - 1, {
-        "first_column": True,
-        "header_row": True,
-        "columns": [{"header": header} for header in headers],
-        "data": data
-    })
-    table_properties = {"text_wrap": True}
-    table_cell_format = workbook.add_format(table_properties)
+    header_cell_format = workbook.add_format({"text_wrap": True, "bold": True, "bottom": 1})
+    header_cell_format.set_align("top")
+    table_cell_format = workbook.add_format({"text_wrap": True})
     table_cell_format.set_align("top")
-    for index, header in enumerate(headers):
-        if index in REPORT_COLUMN_SMALL_INDICES:
-            min_default_len = REPORT_COLUMN_SMALL_MIN_LEN
-            max_default_len = REPORT_COLUMN_SMALL_MAX_LEN
-        elif index in REPORT_COLUMN_LARGE_INDICES:
-            min_default_len = REPORT_COLUMN_LARGE_MIN_LEN
-            max_default_len = REPORT_COLUMN_LARGE_MAX_LEN
-        else:
-            min_default_len = REPORT_COLUMN_DEFAULT_MIN_LEN
-            max_default_len = REPORT_COLUMN_DEFAULT_MAX_LEN
-        max_len = max(
-            max(map(lambda x: len(x[index]), data)) + REPORT_COLUMN_EXTRA_LEN if data else 0,
-            min_default_len
-        )
-        width = min(max_len, max_default_len)
-        worksheet.set_column(index, index, width, table_cell_format)
-    worksheet.write_row(len(data) + 2, 1, total)
+    worksheet.merge_range(0, 0, 0, len(headers) - 1, title, title_cell_format)
+    worksheet.write_row(1, 0, headers, header_cell_format)
+    lengths = [0] * len(headers)
+    index = 0
+    total = None
+    for row in data:
+        # the last row is the total, so every row is written when the next one is read
+        if total is not None:
+            index += 1
+            row_data = [str(index)] + total
+            worksheet.write_row(index + 1, 0, row_data, table_cell_format)
+            lengths = [max(length, len(value)) for length, value in zip(lengths, row_data)]
+        total = row
+    for column in range(len(headers)):
+        worksheet.set_column(column, column, get_report_column_width(column, lengths[column]), table_cell_format)
+    worksheet.autofilter(1, 0, index + 1, len(headers) - 1)
+    worksheet.write_row(index + 2, 1, total or [])
     workbook.close()
 
 
+def generate_report_csv(data):
+    """
+    Yields report rows (see iter_report) as csv lines,
+    so the response is sent while the payments are read
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    yield REPORT_CSV_BOM
+    for row in data:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+
 def generate_report_filename(date_from, date_to, funds):
     if date_from == date_to:
         return "{}-{}-report".format(
@@ -1,34 +1,50 @@
-import io
 from datetime import datetime, timedelta
 
-from flask import Blueprint, render_template, redirect, url_for, abort, make_response, request
+from flask import Blueprint, render_template, redirect, url_for, abort, request, send_file, Response
 
 from app.auth import login_groups_required
-from environment_settings import PAYMENT_COMPLAINT_PROCESSING_ENABLED, SYNC_PAYMENTS_RESOLUTIONS
-from payments.health import health
+from app.utils import url_for_search
+from environment_settings import (
+    PAYMENT_COMPLAINT_PROCESSING_ENABLED,
+    SYNC_PAYMENTS_RESOLUTIONS,
+    PAYMENTS_REPORT_PENDING_TIMEOUT,
+    PAYMENTS_REPORT_REFRESH_INTERVAL,
+)
 from payments.message_ids import (
     PAYMENTS_INVALID_PATTERN,
     PAYMENTS_SEARCH_INVALID_COMPLAINT,
     PAYMENTS_SEARCH_INVALID_CODE,
 )
 from liqpay_int.tasks import process_payment_data
-from payments.tasks import process_tender
+from payments.tasks import process_tender, generate_payments_report
 from payments.results_db import (
     get_payment_item,
     query_combined_or,
     query_payment_report_success,
     query_payment_report_failed,
     save_payment_item,
-    find_payment_item,
+    find_payment_items,
     update_payment_item,
     get_payment_results,
+    find_payment_results,
+    query_payment_report,
+    get_report_version,
+    get_report_uid,
+    get_report_item,
+    save_report_item,
+    delete_failed_report_item,
+    open_report_file,
+    REPORT_DAY_FORMAT,
     query_payment_results,
     get_payment_stats,
+    get_payment_stats_daily,
 )
 from payments.context import (
     get_payment_search_params,
     get_payment_pagination,
     get_report,
+    iter_report,
+    get_string_param,
     get_payments,
     get_payment,
     get_report_params,
@@ -47,16 +63,12 @@ from payments.data import (
     payment_message_status,
     date_representation,
     payment_primary_message,
-    FUNDS_STATE,
-    FUNDS_COMPLAINANT,
-    FUNDS_UNKNOWN,
-    FUNDS_ALL,
 )
 from payments.settings import RELEASE_2020_04_19
 from payments.utils import (
     get_payments_registry,
     store_payments_registry_fake,
-    generate_report_file,
+    generate_report_csv,
     generate_report_filename,
     generate_report_title,
     get_payments_registry_fake,
@@ -88,8 +100,9 @@ def payment_list():
     report_kwargs = get_report_params()
     search_kwargs = get_payment_search_params()
 
-    page = search_kwargs.get("page")
     limit = search_kwargs.get("limit")
+    after = search_kwargs.get("after")
+    before = search_kwargs.get("before")
 
     resolution_date_from = report_kwargs.get("date_resolution_from")
     resolution_date_to = report_kwargs.get("date_resolution_to")
@@ -98,22 +111,20 @@ def payment_list():
 
     filters = query_payment_results(date_from, date_to, **search_kwargs)
 
-    data = get_payment_results(filters, page=page, limit=limit)
+    data = get_payment_results(filters, limit=limit, after=after, before=before)
 
     results = data["results"]
     meta = data["meta"]
-    total = meta["total"]
+
+    from payments.cached import get_payment_results_total
+    total = get_payment_results_total(filters)
 
     rows = get_payments(results)
 
     return render_template(
         "payments/payment_list.html",
         rows=rows,
-        pagination=get_payment_pagination(
-            total=total,
-            page=page,
-            limit=limit
-        ),
+        pagination=get_payment_pagination(total=total, next=meta["next"], prev=meta["prev"]),
         total=total,
         processing_status_choices=DESC_PROCESSING_CHOICES_DICT,
         **search_kwargs,
@@ -121,6 +132,16 @@ def payment_list():
     )
 
 
+def is_daily_stats_search(search_kwargs, report_kwargs):
+    """
+    The daily stats are counted by payment date only, other filters need the full aggregation
+    """
+    filter_keys = ("search", "payment_type", "payment_source", "processing_status")
+    if any(search_kwargs.get(key) for key in filter_keys):
+        return False
+    return not (report_kwargs.get("date_resolution_from") and report_kwargs.get("date_resolution_to"))
+
+
 @bp.route("/stats", methods=["GET"])
 @login_groups_required(["admins", "accountants"])
 def payment_stats():
@@ -137,9 +158,12 @@ def payment_stats():
         date_from = resolution_date_from
         date_to = resolution_date_to + timedelta(days=1) if resolution_date_to else None
 
-        filters = query_payment_results(date_from, date_to, **search_kwargs)
-
-        data = get_payment_stats(filters)
+        data = None
+        if is_daily_stats_search(search_kwargs, report_kwargs):
+            data = get_payment_stats_daily(payment_date_from, payment_date_to)
+        if data is None:
+            filters = query_payment_results(date_from, date_to, **search_kwargs)
+            data = get_payment_stats(filters)
 
         counts = data["counts"]
 
@@ -190,6 +214,7 @@ def payment_request():
         else:
             registry = get_payments_registry(registry_date_from, registry_date_to)
         if registry:
+            messages = []
             for message in registry.get("messages", []):
                 payment_status = message.pop("status", None)
                 if status is not None:
@@ -198,7 +223,10 @@ def payment_request():
                             continue
                     elif payment_status != status:
                         continue
-                item = find_payment_item(message) or {}
+                messages.append((payment_status, message))
+            items = find_payment_items([message for _, message in messages])
+            for (payment_status, message), item in zip(messages, items):
+                item = item or {}
                 if saved is not None and saved != bool(item):
                     continue
                 rows.append({
@@ -289,7 +317,8 @@ def payment_retry(uid):
     payment = data.get("payment", {})
     if payment.get("type") == "credit":
         process_payment_data.apply_async(kwargs=dict(
-            payment_data=payment
+            payment_data=payment,
+            payment_uid=uid,
         ))
     return redirect(url_for("payments_views.payment_detail", uid=uid))
 
@@ -361,48 +390,55 @@ def report_download():
     date_from = date_resolution_from
     date_to = date_resolution_to + timedelta(days=1)
 
-    if funds in [FUNDS_STATE, FUNDS_COMPLAINANT]:
-        filters = query_payment_report_success(
-            resolution_exists=True,
-            resolution_funds=funds,
-            resolution_date_from=date_from,
-            resolution_date_to=date_to,
-        )
-    elif funds in [FUNDS_UNKNOWN]:
-        filters = query_payment_report_failed(
-            message_ids_include=PAYMENTS_FAILED_MESSAGE_ID_LIST,
-            message_ids_exclude=PAYMENTS_NOT_FAILED_MESSAGE_ID_LIST,
-            message_ids_date_from=date_from,
-            message_ids_date_to=date_to,
+    filters = query_payment_report(date_from, date_to, funds)
+    if filters is None:
+        abort(404)
+        return
+
+    if get_string_param("format") == "csv":
+        filename = generate_report_filename(date_resolution_from, date_resolution_to, funds)
+        data = iter_report(find_payment_results(filters), total=True)
+        response = Response(generate_report_csv(data), mimetype="text/csv")
+        response.headers["Content-Disposition"] = "attachment; filename=%s.csv" % filename
+        return response
+
+    # xlsx reports are built by generate_payments_report task and kept until the payments of the days change
+    # or PAYMENTS_REPORT_FILE_TIMEOUT expires
+    version = get_report_version(date_resolution_from, date_resolution_to)
+    uid = get_report_uid(date_resolution_from, date_resolution_to, funds, version)
+    report = get_report_item(uid)
+    if report and report.get("failed"):
+        if get_string_param("retry"):
+            delete_failed_report_item(uid)
+            return redirect(url_for_search("payments_views.report_download", exclude=["retry"]))
+        return render_template(
+            "payments/payment_report_failed.html",
+            title=generate_report_title(date_resolution_from, date_resolution_to, funds),
+            error=report.get("error"),
         )
-    elif funds in [FUNDS_ALL]:
-        rows = list()
-        filters_success = query_payment_report_success(
-            resolution_exists=True,
-            resolution_date_from=date_from,
-            resolution_date_to=date_to,
+    if report and report.get("file_id"):
+        return send_file(
+            open_report_file(report["file_id"]),
+            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            as_attachment=True,
+            download_name=report["filename"],
         )
-        filters_failed = query_payment_report_failed(
-            message_ids_include=PAYMENTS_FAILED_MESSAGE_ID_LIST,
-            message_ids_exclude=PAYMENTS_NOT_FAILED_MESSAGE_ID_LIST,
-            message_ids_date_from=date_from,
-            message_ids_date_to=date_to,
+
+    if not report and save_report_item(
+        uid, date_resolution_from, date_resolution_to, funds, version, PAYMENTS_REPORT_PENDING_TIMEOUT
+    ):
+        generate_payments_report.delay(
+            uid,
+            date_resolution_from.strftime(REPORT_DAY_FORMAT),
+            date_resolution_to.strftime(REPORT_DAY_FORMAT),
+            funds,
         )
-        filters = query_combined_or([filters_success, filters_failed])
-    else:
-        abort(404)
-        return
 
-    rows = get_payment_results(filters)["results"]
-    data = get_report(rows, total=True)
-    bytes_io = io.BytesIO()
-    title = generate_report_title(date_resolution_from, date_resolution_to, funds)
-    generate_report_file(bytes_io, data, title)
-    filename = generate_report_filename(date_resolution_from, date_resolution_to, funds)
-    response = make_response(bytes_io.getvalue())
-    response.headers["Content-Disposition"] = "attachment; filename=%s.xlsx" % filename
-    response.headers["Content-type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    return response
+    return render_template(
+        "payments/payment_report_pending.html",
+        title=generate_report_title(date_resolution_from, date_resolution_to, funds),
+        refresh_interval=PAYMENTS_REPORT_REFRESH_INTERVAL,
+    )
 
 
 @bp.route("/status", methods=["GET"])
@@ -411,7 +447,8 @@ def status():
     days = get_int_param("days", default=0)
     if not days:
         return redirect(url_for("payments_views.status", days=1))
-    data = health()
+    from payments.cached import get_health
+    data = get_health()
     return render_template(
         "payments/payment_status.html",
         rows=data
@@ -0,0 +1,82 @@
+from celery.utils.log import get_task_logger
+from collections import Counter
+from environment_settings import SERVER_ID_COOKIE_MAX_AGE
+from threading import Lock
+from time import monotonic
+
+logger = get_task_logger(__name__)
+
+SERVER_ID_COOKIE_NAME = "SERVER_ID"
+
+
+class ServerIdCookieManager:
+    """
+    Keeps a known-good SERVER_ID cookie for the process,
+    so CDB write requests don't need a HEAD request before every POST/PUT/PATCH.
+
+    The cookie is fetched once and reused by all the tasks of the process until
+    it is older than max_age seconds or CDB responds with 412 Precondition Failed
+    (the replica from the cookie doesn't have the object we're trying to change yet).
+
+    Example:
+        cookies = server_id_cookies.get_cookies(lambda: requests.head(url).cookies)
+        response = requests.post(url, json=data, cookies=cookies)
+        if response.status_code == 412:
+            server_id_cookies.refresh(response.cookies)
+    """
+
+    def __init__(self, max_age=SERVER_ID_COOKIE_MAX_AGE):
+        self.max_age = max_age
+        self.stats = Counter()
+        self._lock = Lock()
+        self._server_id = None
+        self._updated_at = None
+
+    def is_expired(self):
+        return self._updated_at is None or monotonic() - self._updated_at > self.max_age
+
+    def get_cookies(self, fetch_cookies):
+        """
+        :param fetch_cookies: callable that makes a request to CDB and returns its cookies,
+                              called only if there is no valid cookie yet.
+                              Its exceptions are not handled, so the caller can retry the task
+        :return: dict of cookies to pass to a CDB request
+        """
+        with self._lock:
+            if self._server_id and not self.is_expired():
+                self.stats["hits"] += 1
+                return {SERVER_ID_COOKIE_NAME: self._server_id}
+
+        cookies = fetch_cookies()
+        server_id = cookies.get(SERVER_ID_COOKIE_NAME) if cookies else None
+        with self._lock:
+            self.stats["fetches"] += 1
+            self._set(server_id)
+        return {SERVER_ID_COOKIE_NAME: server_id} if server_id else {}
+
+    def refresh(self, cookies=None):
+        """
+        Called on 412 Precondition Failed.
+        CDB usually sets a new SERVER_ID with this response, if it doesn't
+        the cookie is dropped and will be fetched again by the next get_cookies call
+        """
+        server_id = cookies.get(SERVER_ID_COOKIE_NAME) if cookies else None
+        with self._lock:
+            self.stats["refreshes"] += 1
+            self._set(server_id)
+        logger.info(
+            f"SERVER_ID cookie refreshed: {server_id}",
+            extra={"MESSAGE_ID": "SERVER_ID_COOKIE_REFRESHED", "COOKIE_STATS": dict(self.stats)}
+        )
+
+    def reset(self):
+        with self._lock:
+            self._set(None)
+            self.stats.clear()
+
+    def _set(self, server_id):
+        self._server_id = server_id
+        self._updated_at = monotonic() if server_id else None
+
+
+server_id_cookies = ServerIdCookieManager()
@@ -8,6 +8,10 @@ from environment_settings import (
     EXPONENTIAL_RETRY_BASE, EXPONENTIAL_RETRY_MAX,
 )
 from celery.utils.log import get_task_logger
+from celery.app.task import Task
+from celery.signals import task_prerun, task_postrun
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 from urllib.parse import unquote
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
@@ -62,7 +66,57 @@ def get_task_retry_logger_method(
     return getattr(logger_obj, fallback_method)
 
 
+class RequestMemo:
+    """
+    Responses of GET requests made during one task execution.
+    It's bound to the task request, so it's shared with run_concurrently threads
+    and is dropped with the request when the task ends (a retry gets an empty one).
+    """
+    def __init__(self):
+        self.hits = 0
+        self._data = {}
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+
+def get_request_memo(task):
+    if isinstance(task, Task):
+        return getattr(task.request, "memo", None)
+
+
+@task_prerun.connect
+def init_request_memo(task=None, **kwargs):
+    task.request.memo = RequestMemo()
+
+
+@task_postrun.connect
+def clear_request_memo(task=None, task_id=None, **kwargs):
+    memo = getattr(task.request, "memo", None)
+    if memo is not None:
+        if memo.hits:
+            logger.debug(
+                f"{memo.hits} repeated requests avoided by {task.name} {task_id}",
+                extra={"MESSAGE_ID": "REQUEST_MEMO_HITS", "HITS": memo.hits}
+            )
+        task.request.memo = None
+
+
 def get_public_api_data(task, uid, document_type="tender"):
+    memo = get_request_memo(task)
+    if memo is not None:
+        content = memo.get((document_type, uid))
+        if content is not None:
+            return json.loads(content)["data"]  # a new object every time, as callers change the data
+
     try:
         response = requests.get(
             f"{PUBLIC_API_HOST}/api/{API_VERSION}/{document_type}s/{uid}",
@@ -92,10 +146,18 @@ def get_public_api_data(task, uid, document_type="tender"):
                 )
                 raise task.retry(countdown=get_exponential_request_retry_countdown(task, response))
             else:
+                if memo is not None:
+                    memo.set((document_type, uid), response.content)
                 return resp_json["data"]
 
 
 def download_file(task, url):
+    memo = get_request_memo(task)
+    if memo is not None:
+        result = memo.get(url)
+        if result is not None:
+            return result
+
     try:
         response = requests.get(
             url,
@@ -116,7 +178,10 @@ def download_file(task, url):
                 })
             raise task.retry(countdown=get_exponential_request_retry_countdown(task, response))
         else:
-            return get_filename_from_response(response), response.content
+            result = get_filename_from_response(response), response.content
+            if memo is not None:
+                memo.set(url, result)
+            return result
 
 
 def ds_upload(task, file_name, file_content):
@@ -196,3 +261,44 @@ def mount_retries_for_request(session, total_retries=10, backoff_factor=10,
     adapter = HTTPAdapter(max_retries=retry_strategy)
     session.mount("https://", adapter)
     session.mount("http://", adapter)
+
+
+def run_concurrently(task, functions, max_workers=None):
+    """
+    Runs independent blocking calls (usually api requests) in a thread pool.
+    The task request is copied to the threads, so task.retry called inside them works the same way
+    as it does in the task itself. The first exception (Retry included) is re-raised,
+    calls that haven't started yet are cancelled.
+
+    Example:
+        tender, plan = run_concurrently(self, [
+            lambda: get_public_api_data(self, tender_id, "tender"),
+            lambda: get_public_api_data(self, plan_id, "plan"),
+        ])
+
+    :param task: celery task
+    :param functions: callables without arguments
+    :param max_workers: pool size, one thread per call by default
+    :return: list of results in the order of the functions
+    """
+    functions = list(functions)
+    if len(functions) < 2:
+        return [func() for func in functions]
+
+    request = dict(vars(task.request)) if isinstance(task, Task) else None
+
+    def call(func):
+        if request is None:
+            return func()
+        task.push_request(request)
+        try:
+            return func()
+        finally:
+            task.pop_request()
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers or len(functions), len(functions)))
+    try:
+        futures = [executor.submit(call, func) for func in functions]
+        return [future.result() for future in futures]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -5,6 +5,8 @@ from celery_worker.locks import args_to_uid, get_mongodb_collection as base_get_
 from celery.signals import celeryd_init
 from functools import partial
 from pymongo.errors import PyMongoError, OperationFailure
+from environment_settings import DS_UPLOAD_DEDUP_TIMEOUT
+import hashlib
 import sys
 
 logger = get_task_logger(__name__)
@@ -14,6 +16,8 @@ get_mongodb_collection = partial(
     collection_name="tasks_results_collection"
 )
 
+DS_UPLOADS_COLLECTION = "ds_uploads"
+
 
 @app.task(bind=True)
 def init_db_index(self):  # pragma: no cover
@@ -32,11 +36,24 @@ def init_db_index(self):  # pragma: no cover
     return "success"
 
 
+@app.task(bind=True, max_retries=20)
+def init_ds_uploads_index(self):
+    try:
+        base_get_mongodb_collection(DS_UPLOADS_COLLECTION).create_index(
+            "createdAt",
+            expireAfterSeconds=DS_UPLOAD_DEDUP_TIMEOUT
+        )
+    except PyMongoError as e:
+        logger.exception(e, extra={"MESSAGE_ID": "MONGODB_INDEX_CREATION_ERROR"})
+        raise self.retry()
+
+
 if "test" not in sys.argv[0]:  # pragma: no cover
 
     @celeryd_init.connect
     def task_sent_handler(*args, **kwargs):
         init_db_index.delay()
+        init_ds_uploads_index.delay()
 
 
 def get_task_result(self, args):
@@ -69,3 +86,44 @@ def save_task_result(self, result, args):
     else:
         return uid
 
+
+
+def get_content_hash(*parts):
+    """
+    Hash of a file to upload, parts are the file name, content, etc.
+    """
+    content_hash = hashlib.sha256()
+    for part in parts:
+        content_hash.update(part.encode() if isinstance(part, str) else part)
+        content_hash.update(b"\0")
+    return content_hash.hexdigest()
+
+
+def get_ds_upload(content_hash):
+    """
+    Returns DS document data (url, hash, etc.) of an identical file uploaded recently.
+    Fails silently: the file is uploaded again if mongodb isn't available
+    """
+    collection = base_get_mongodb_collection(DS_UPLOADS_COLLECTION)
+    try:
+        doc = collection.find_one({'_id': content_hash})
+    except PyMongoError as exc:
+        logger.exception(exc, extra={"MESSAGE_ID": "GET_DS_UPLOAD_MONGODB_EXCEPTION"})
+        return None
+    if doc is None:
+        logger.info(f"File {content_hash} hasn't been uploaded recently", extra={"MESSAGE_ID": "DS_UPLOAD_DEDUP_MISS"})
+        return None
+    logger.info(f"File {content_hash} has been already uploaded", extra={"MESSAGE_ID": "DS_UPLOAD_DEDUP_HIT"})
+    return doc["data"]
+
+
+def save_ds_upload(content_hash, data):
+    collection = base_get_mongodb_collection(DS_UPLOADS_COLLECTION)
+    try:
+        collection.update_one(
+            {'_id': content_hash},
+            {"$setOnInsert": {'data': data, 'createdAt': datetime.utcnow()}},
+            upsert=True,
+        )
+    except PyMongoError as exc:
+        logger.exception(exc, extra={"MESSAGE_ID": "SAVE_DS_UPLOAD_MONGODB_EXCEPTION"})
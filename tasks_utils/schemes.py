@@ -0,0 +1,129 @@
+"""
+Renderer of the view schemes (see payments.schemes).
+
+A scheme is a dict of fields, every field has "type" ("object" or "value"),
+a jmespath "path" ("." is the data itself) or a nested "scheme",
+and optional "method", "default" and "title".
+
+The schemes are compiled once into a list of getters: simple dotted paths
+are read with dict.get, the other ones are compiled with jmespath.compile,
+so rendering a row doesn't parse any expressions.
+"""
+import re
+
+import jmespath
+
+SIMPLE_PATH_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+_compiled = {}
+
+
+def compiled(compile_func):
+    """
+    Caches compiled schemes by id, schemes are expected to be module constants
+    that aren't changed after they're compiled
+    """
+    def wrapper(scheme):
+        key = (compile_func.__name__, id(scheme))
+        if key not in _compiled:
+            # the scheme is kept with the result, so its id isn't reused by another object
+            _compiled[key] = (scheme, compile_func(scheme))
+        return _compiled[key][1]
+    return wrapper
+
+
+def compile_path(path):
+    """
+    :return: function that returns the same as jmespath.search(path, data)
+    """
+    if path == ".":
+        return lambda data: data
+
+    if not SIMPLE_PATH_RE.match(path):
+        return jmespath.compile(path).search
+
+    keys = path.split(".")
+
+    def get_path(data):
+        for key in keys:
+            try:
+                data = data.get(key)
+            except AttributeError:
+                return None
+        return data
+
+    return get_path
+
+
+@compiled
+def compile_scheme_value(scheme_info):
+    """
+    :return: function that returns the value of the scheme field for data
+    """
+    if "scheme" in scheme_info:
+        return compile_scheme(scheme_info["scheme"])
+
+    get_path = compile_path(scheme_info["path"])
+    method = scheme_info.get("method")
+    default = scheme_info.get("default")
+
+    def get_value(data):
+        value = get_path(data)
+        if method is not None:
+            value = method(value)
+        return value or default
+
+    return get_value
+
+
+@compiled
+def compile_scheme(scheme):
+    """
+    :return: function that returns the formatted data, the fields without values are skipped
+    """
+    fields = [
+        (scheme_field, scheme_info["type"] == "object", compile_scheme_value(scheme_info), scheme_info.get("title"))
+        for scheme_field, scheme_info in scheme.items()
+        if scheme_info.get("type") in ("object", "value")
+    ]
+
+    def get_data(data):
+        data_formatted = {}
+        for scheme_field, is_object, get_value, title in fields:
+            value = get_value(data)
+            if value is None:
+                continue
+            if is_object:
+                item = dict(value=value)
+                if title:
+                    item.update(dict(title=title))
+                data_formatted[scheme_field] = item
+            else:
+                data_formatted[scheme_field] = value
+        return data_formatted
+
+    return get_data
+
+
+def get_scheme_value(data, scheme_info):
+    return compile_scheme_value(scheme_info)(data)
+
+
+def get_scheme_title(data, scheme_info):
+    if "title" in scheme_info:
+        return scheme_info["title"]
+    return None
+
+
+def get_scheme_item(data, scheme_info):
+    value = get_scheme_value(data, scheme_info)
+    if value is not None:
+        title = get_scheme_title(data, scheme_info)
+        item = dict(value=value)
+        if title:
+            item.update(dict(title=title))
+        return item
+
+
+def get_scheme_data(data, scheme):
+    return compile_scheme(scheme)(data)
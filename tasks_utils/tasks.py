@@ -5,9 +5,13 @@ from environment_settings import (
     DS_HOST, DS_USER, DS_PASSWORD, CONNECT_TIMEOUT, READ_TIMEOUT, DEFAULT_RETRY_AFTER,
 )
 from tasks_utils.settings import RETRY_REQUESTS_EXCEPTIONS, DEFAULT_HEADERS
+from tasks_utils.cookies import server_id_cookies
 from tasks_utils.results_db import (
     get_task_result,
     save_task_result,
+    get_content_hash,
+    get_ds_upload,
+    save_ds_upload,
 )
 import requests
 import base64
@@ -32,39 +36,45 @@ def upload_to_doc_service(self, name, content, doc_type, tender_id,
         content = base64.b64decode(content)
 
     if result is None:
-        try:
-            response = requests.post(
-                '{host}/upload'.format(host=DS_HOST),
-                auth=(DS_USER, DS_PASSWORD),
-                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
-                files={'file': (name, content)},
-                headers=DEFAULT_HEADERS
-            )
-        except RETRY_REQUESTS_EXCEPTIONS as exc:
-            logger.exception(exc, extra={"MESSAGE_ID": "POST_DOC_API_ERROR"})
-            raise self.retry(exc=exc)
-        else:
-            if response.status_code != 200:
-                logger.error(
-                    "Incorrect upload status for doc {}".format(name),
-                    extra={
-                        "MESSAGE_ID": "POST_DOC_API_ERROR",
-                        "STATUS_CODE": response.status_code,
-                    })
-                raise self.retry(countdown=response.headers.get('Retry-After', DEFAULT_RETRY_AFTER))
-
-            response_json = response.json()
-            result = response_json["data"]
-            result["documentType"] = doc_type
-
-            # save response to mongodb, so that the file won't be uploaded again
-            # fail silently: if mongodb isn't available, the task will neither fail nor retry
-            # in worst case there might be a duplicate attached to the tender
-            uid = save_task_result(self, result, task_args)
-            logger.info("Saved document with uid {} for {} {} {}".format(
-                uid, tender_id, item_name, item_id),
-                extra={"MESSAGE_ID": "SAVE_UPLOAD_DOC_RESULTS_SUCCESS"}
-            )
+        # identical files (e.g. of the same supplier in different tenders) are uploaded once
+        content_hash = get_content_hash(name, content)
+        result = get_ds_upload(content_hash)
+        if result is None:
+            try:
+                response = requests.post(
+                    '{host}/upload'.format(host=DS_HOST),
+                    auth=(DS_USER, DS_PASSWORD),
+                    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                    files={'file': (name, content)},
+                    headers=DEFAULT_HEADERS
+                )
+            except RETRY_REQUESTS_EXCEPTIONS as exc:
+                logger.exception(exc, extra={"MESSAGE_ID": "POST_DOC_API_ERROR"})
+                raise self.retry(exc=exc)
+            else:
+                if response.status_code != 200:
+                    logger.error(
+                        "Incorrect upload status for doc {}".format(name),
+                        extra={
+                            "MESSAGE_ID": "POST_DOC_API_ERROR",
+                            "STATUS_CODE": response.status_code,
+                        })
+                    raise self.retry(countdown=response.headers.get('Retry-After', DEFAULT_RETRY_AFTER))
+
+                response_json = response.json()
+                result = response_json["data"]
+                save_ds_upload(content_hash, dict(result))
+
+        result["documentType"] = doc_type
+
+        # save response to mongodb, so that the file won't be uploaded again
+        # fail silently: if mongodb isn't available, the task will neither fail nor retry
+        # in worst case there might be a duplicate attached to the tender
+        uid = save_task_result(self, result, task_args)
+        logger.info("Saved document with uid {} for {} {} {}".format(
+            uid, tender_id, item_name, item_id),
+            extra={"MESSAGE_ID": "SAVE_UPLOAD_DOC_RESULTS_SUCCESS"}
+        )
 
     attach_doc_to_tender.delay(
         data=result,
@@ -92,15 +102,17 @@ def attach_doc_to_tender(self, data, tender_id, item_name, item_id, update_exist
             item_id=item_id,
             headers=DEFAULT_HEADERS,
         )
-        # get SERVER_ID cookie
+        # get SERVER_ID cookie, HEAD request is made only if the process doesn't know a valid one
         try:
-            head_response = requests.head(
-                url,
-                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
-                headers={
-                    'Authorization': 'Bearer {}'.format(API_TOKEN),
-                    **DEFAULT_HEADERS,
-                }
+            cookies = server_id_cookies.get_cookies(
+                lambda: requests.head(
+                    url,
+                    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                    headers={
+                        'Authorization': 'Bearer {}'.format(API_TOKEN),
+                        **DEFAULT_HEADERS,
+                    }
+                ).cookies
             )
         except RETRY_REQUESTS_EXCEPTIONS as exc:
             logger.exception(exc, extra={"MESSAGE_ID": "ATTACH_DOC_HEAD_ERROR"})
@@ -116,12 +128,15 @@ def attach_doc_to_tender(self, data, tender_id, item_name, item_id, update_exist
                         'Authorization': 'Bearer {}'.format(API_TOKEN),
                         **DEFAULT_HEADERS,
                     },
-                    cookies=head_response.cookies,
+                    cookies=cookies,
                 )
             except RETRY_REQUESTS_EXCEPTIONS as exc:
                 logger.exception(exc, extra={"MESSAGE_ID": "ATTACH_DOC_POST_ERROR"})
                 raise self.retry(exc=exc)
             else:
+                if response.status_code == 412:
+                    server_id_cookies.refresh(response.cookies)
+
                 # handle response code
                 if response.status_code == 422:
                     logger.error("Incorrect document data while attaching doc {} to tender {}: {}".format(
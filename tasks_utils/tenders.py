@@ -0,0 +1,119 @@
+from collections import defaultdict
+from functools import cached_property
+
+
+class TenderObjectNotFound(LookupError):
+    """
+    A related object that must be in the tender is missing
+    """
+
+    def __init__(self, name, object_id, tender_id):
+        super().__init__(f"{name} {object_id} is not found in tender {tender_id}")
+        self.name = name
+        self.object_id = object_id
+        self.tender_id = tender_id
+
+
+class TenderIndex:
+    """
+    Id maps and relations of a tender dict, built once per tender
+    instead of scanning awards, bids, lots, etc. for every related object.
+
+    The maps are built lazily on the first access and point to the same dicts as the tender,
+    so changes of the objects are visible through the index, but lists replaced
+    in the tender after the map was built are not.
+    For duplicated ids the first object is used, as the list scans did.
+    Getters return None for missing objects, or raise TenderObjectNotFound if they're required.
+
+    Example:
+        index = TenderIndex(tender)
+        for award in tender["awards"]:
+            bid = index.get_bid(award.get("bid_id"))
+            lot = index.get_lot(award.get("lotID"))
+    """
+
+    def __init__(self, tender):
+        self.tender = tender
+
+    @staticmethod
+    def _map(objects, key="id"):
+        result = {}
+        for obj in objects:
+            result.setdefault(obj.get(key), obj)
+        return result
+
+    @staticmethod
+    def _group(objects, key):
+        result = defaultdict(list)
+        for obj in objects:
+            result[obj.get(key)].append(obj)
+        return result
+
+    @cached_property
+    def bids(self):
+        return self._map(self.tender.get("bids", ""))
+
+    @cached_property
+    def awards(self):
+        return self._map(self.tender.get("awards", ""))
+
+    @cached_property
+    def lots(self):
+        return self._map(self.tender.get("lots", ""))
+
+    @cached_property
+    def contracts(self):
+        return self._map(self.tender.get("contracts", ""))
+
+    @cached_property
+    def lot_positions(self):
+        positions = {}
+        for position, lot in enumerate(self.tender.get("lots", "")):
+            positions.setdefault(lot.get("id"), position)
+        return positions
+
+    @cached_property
+    def awards_by_bid(self):
+        return self._group(self.tender.get("awards", ""), "bid_id")
+
+    @cached_property
+    def qualifications_by_bid(self):
+        return self._group(self.tender.get("qualifications", ""), "bidID")
+
+    @cached_property
+    def active_cancellations_by_lot(self):
+        return self._group(
+            (c for c in self.tender.get("cancellations", "") if c["status"] == "active"),
+            "relatedLot",
+        )
+
+    def _get(self, objects, name, object_id, required):
+        result = objects.get(object_id)
+        if result is None and required:
+            raise TenderObjectNotFound(name, object_id, self.tender.get("id"))
+        return result
+
+    def get_bid(self, bid_id, required=False):
+        return self._get(self.bids, "Bid", bid_id, required)
+
+    def get_award(self, award_id, required=False):
+        return self._get(self.awards, "Award", award_id, required)
+
+    def get_lot(self, lot_id, required=False):
+        return self._get(self.lots, "Lot", lot_id, required)
+
+    def get_contract(self, contract_id, required=False):
+        return self._get(self.contracts, "Contract", contract_id, required)
+
+    def get_lot_position(self, lot_id, required=False):
+        return self._get(self.lot_positions, "Lot", lot_id, required)
+
+    def get_bid_awards(self, bid_id):
+        return self.awards_by_bid.get(bid_id, [])
+
+    def get_bid_qualifications(self, bid_id):
+        return self.qualifications_by_bid.get(bid_id, [])
+
+    def get_active_cancellations(self, lot_id=None):
+        """Active cancellations related to the lot, or to the whole tender if lot_id is None"""
+        return self.active_cancellations_by_lot.get(lot_id, [])
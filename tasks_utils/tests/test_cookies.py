@@ -0,0 +1,79 @@
+from unittest.mock import Mock, patch
+from tasks_utils.cookies import ServerIdCookieManager
+import unittest
+
+
+class ServerIdCookieManagerTestCase(unittest.TestCase):
+
+    def test_fetch_once(self):
+        manager = ServerIdCookieManager(max_age=60)
+        fetch = Mock(return_value={"SERVER_ID": "a" * 32, "another_cookie": "abc"})
+
+        for _ in range(3):
+            cookies = manager.get_cookies(fetch)
+            self.assertEqual(cookies, {"SERVER_ID": "a" * 32})
+
+        fetch.assert_called_once_with()
+        self.assertEqual(manager.stats, {"fetches": 1, "hits": 2})
+
+    def test_expired(self):
+        manager = ServerIdCookieManager(max_age=60)
+        fetch = Mock(side_effect=[{"SERVER_ID": "a" * 32}, {"SERVER_ID": "b" * 32}])
+
+        with patch("tasks_utils.cookies.monotonic", Mock(return_value=1000)):
+            self.assertEqual(manager.get_cookies(fetch), {"SERVER_ID": "a" * 32})
+
+        with patch("tasks_utils.cookies.monotonic", Mock(return_value=1061)):
+            self.assertEqual(manager.get_cookies(fetch), {"SERVER_ID": "b" * 32})
+
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_no_cookie(self):
+        manager = ServerIdCookieManager(max_age=60)
+        fetch = Mock(return_value={})
+
+        self.assertEqual(manager.get_cookies(fetch), {})
+        self.assertEqual(manager.get_cookies(fetch), {})
+
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_fetch_exception(self):
+        manager = ServerIdCookieManager(max_age=60)
+        fetch = Mock(side_effect=ConnectionError)
+
+        with self.assertRaises(ConnectionError):
+            manager.get_cookies(fetch)
+
+        self.assertEqual(manager.stats, {})
+
+    def test_refresh_with_new_cookie(self):
+        manager = ServerIdCookieManager(max_age=60)
+        fetch = Mock(return_value={"SERVER_ID": "a" * 32})
+        manager.get_cookies(fetch)
+
+        manager.refresh({"SERVER_ID": "b" * 32})
+
+        self.assertEqual(manager.get_cookies(fetch), {"SERVER_ID": "b" * 32})
+        fetch.assert_called_once_with()
+        self.assertEqual(manager.stats, {"fetches": 1, "refreshes": 1, "hits": 1})
+
+    def test_refresh_without_cookie(self):
+        manager = ServerIdCookieManager(max_age=60)
+        fetch = Mock(side_effect=[{"SERVER_ID": "a" * 32}, {"SERVER_ID": "b" * 32}])
+        manager.get_cookies(fetch)
+
+        manager.refresh()
+
+        self.assertEqual(manager.get_cookies(fetch), {"SERVER_ID": "b" * 32})
+        self.assertEqual(manager.stats, {"fetches": 2, "refreshes": 1})
+
+    def test_reset(self):
+        manager = ServerIdCookieManager(max_age=60)
+        manager.get_cookies(Mock(return_value={"SERVER_ID": "a" * 32}))
+
+        manager.reset()
+
+        self.assertEqual(manager.stats, {})
+        fetch = Mock(return_value={"SERVER_ID": "b" * 32})
+        self.assertEqual(manager.get_cookies(fetch), {"SERVER_ID": "b" * 32})
+        fetch.assert_called_once_with()
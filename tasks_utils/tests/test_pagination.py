@@ -0,0 +1,93 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from pymongo import ASCENDING, DESCENDING
+
+import unittest
+
+from tasks_utils.pagination import encode_cursor, decode_cursor, query_keyset, get_keyset_page
+
+
+def get_item(i):
+    return {"_id": "uid_{}".format(i), "createdAt": datetime(2020, 1, 1, 0, 0, i)}
+
+
+class CursorTestCase(unittest.TestCase):
+
+    def test_encode_decode(self):
+        item = get_item(1)
+
+        cursor = encode_cursor(item)
+
+        self.assertEqual(decode_cursor(cursor), (item["createdAt"], item["_id"]))
+
+    def test_decode_invalid(self):
+        self.assertIsNone(decode_cursor("invalid"))
+        self.assertIsNone(decode_cursor("aW52YWxpZA=="))
+
+    def test_query_keyset(self):
+        value = datetime(2020, 1, 1)
+
+        self.assertEqual(
+            query_keyset((value, "uid")),
+            {"$or": [{"createdAt": {"$lt": value}}, {"createdAt": value, "_id": {"$lt": "uid"}}]}
+        )
+        self.assertEqual(
+            query_keyset((value, "uid"), reverse=True),
+            {"$or": [{"createdAt": {"$gt": value}}, {"createdAt": value, "_id": {"$gt": "uid"}}]}
+        )
+
+
+class KeysetPageTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = MagicMock()
+        self.find = self.collection.find.return_value.sort.return_value.limit
+
+    def test_first_page(self):
+        self.find.return_value = [get_item(5), get_item(4), get_item(3)]
+
+        items, next_cursor, prev_cursor = get_keyset_page(self.collection, {"test": "filter"}, limit=2)
+
+        self.assertEqual(items, [get_item(5), get_item(4)])
+        self.assertEqual(decode_cursor(next_cursor), (get_item(4)["createdAt"], "uid_4"))
+        self.assertIsNone(prev_cursor)
+        self.collection.find.assert_called_once_with({"test": "filter"})
+        self.collection.find.return_value.sort.assert_called_once_with([("createdAt", DESCENDING), ("_id", DESCENDING)])
+        self.find.assert_called_once_with(3)
+
+    def test_next_page(self):
+        self.find.return_value = [get_item(3)]
+        after = encode_cursor(get_item(4))
+
+        items, next_cursor, prev_cursor = get_keyset_page(self.collection, {"test": "filter"}, limit=2, after=after)
+
+        self.assertEqual(items, [get_item(3)])
+        self.assertIsNone(next_cursor)
+        self.assertEqual(decode_cursor(prev_cursor), (get_item(3)["createdAt"], "uid_3"))
+        self.collection.find.assert_called_once_with(
+            {"$and": [{"test": "filter"}, query_keyset((get_item(4)["createdAt"], "uid_4"))]}
+        )
+
+    def test_prev_page(self):
+        self.find.return_value = [get_item(4), get_item(5)]
+        before = encode_cursor(get_item(3))
+
+        items, next_cursor, prev_cursor = get_keyset_page(self.collection, limit=2, before=before)
+
+        self.assertEqual(items, [get_item(5), get_item(4)])
+        self.assertEqual(decode_cursor(next_cursor), (get_item(4)["createdAt"], "uid_4"))
+        self.assertIsNone(prev_cursor)
+        self.collection.find.assert_called_once_with(
+            {"$and": [{}, query_keyset((get_item(3)["createdAt"], "uid_3"), reverse=True)]}
+        )
+        self.collection.find.return_value.sort.assert_called_once_with([("createdAt", ASCENDING), ("_id", ASCENDING)])
+
+    def test_no_limit(self):
+        self.collection.find.return_value.sort.return_value = [get_item(2), get_item(1)]
+
+        items, next_cursor, prev_cursor = get_keyset_page(self.collection)
+
+        self.assertEqual(items, [get_item(2), get_item(1)])
+        self.assertIsNone(next_cursor)
+        self.assertIsNone(prev_cursor)
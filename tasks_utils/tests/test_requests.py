@@ -1,5 +1,12 @@
-from tasks_utils.requests import get_filename_from_response
-from unittest.mock import Mock
+from tasks_utils.requests import (
+    get_filename_from_response, run_concurrently, get_public_api_data, download_file,
+    get_request_memo, RequestMemo,
+)
+from celery_worker.celery import app
+from celery.exceptions import Retry
+from unittest.mock import Mock, patch
+import json
+import threading
 import unittest
 
 
@@ -22,3 +29,109 @@ class ResultsDBTestCase(unittest.TestCase):
         })
         filename = get_filename_from_response(response)
         self.assertEqual(filename, "Чернігівка.pdf")
+
+
+@app.task(bind=True, max_retries=5)
+def concurrent_echo_task(self, *args):
+    return run_concurrently(self, [
+        lambda: (self.request.id, self.request.retries),
+        lambda: threading.current_thread().name,
+    ])
+
+
+class RunConcurrentlyTestCase(unittest.TestCase):
+
+    def test_results_order(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def wait(value):
+            barrier.wait()  # all the calls are in progress at the same time
+            return value
+
+        result = run_concurrently(None, [
+            lambda: wait(1),
+            lambda: wait(2),
+            lambda: wait(3),
+        ])
+        self.assertEqual(result, [1, 2, 3])
+
+    def test_single_call(self):
+        result = run_concurrently(None, [threading.current_thread])
+        self.assertEqual(result, [threading.current_thread()])
+        self.assertEqual(run_concurrently(None, []), [])
+
+    def test_exception(self):
+        task = Mock()
+        with self.assertRaises(Retry):
+            run_concurrently(task, [
+                lambda: 1,
+                Mock(side_effect=Retry),
+            ])
+
+    def test_task_request(self):
+        result = concurrent_echo_task.apply(task_id="abc", retries=3).get()
+        self.assertEqual(result[0], ("abc", 3))
+        self.assertNotEqual(result[1], threading.current_thread().name)
+
+
+@app.task(bind=True)
+def memo_fetch_task(self, uid, url):
+    first = get_public_api_data(self, uid, "tender")
+    first["changed"] = True  # callers change the data
+    concurrent = run_concurrently(self, [
+        lambda: get_public_api_data(self, uid, "tender"),
+        lambda: download_file(self, url),
+    ])
+    return first, concurrent, download_file(self, url), self.request.memo.hits
+
+
+class RequestMemoTestCase(unittest.TestCase):
+
+    def response(self, data):
+        return Mock(
+            status_code=200,
+            content=json.dumps({"data": data}).encode(),
+            json=Mock(return_value={"data": data}),
+            headers={"content-disposition": "attachment; filename=audit.yaml"},
+        )
+
+    @patch("tasks_utils.requests.requests")
+    def test_task_memo(self, requests_mock):
+        requests_mock.get.side_effect = [self.response({"id": "1"}), self.response({"id": "file"})]
+
+        first, concurrent, file, hits = memo_fetch_task.apply(args=("1", "http://ds/1")).get()
+
+        self.assertEqual(first, {"id": "1", "changed": True})
+        self.assertEqual(concurrent[0], {"id": "1"})
+        self.assertEqual(concurrent[1], file)
+        self.assertEqual(file[0], "audit.yaml")
+        self.assertEqual(hits, 2)
+        self.assertEqual(requests_mock.get.call_count, 2)
+
+        # the memo is dropped with the request
+        requests_mock.get.side_effect = [self.response({"id": "1"}), self.response({"id": "file"})]
+
+        memo_fetch_task.apply(args=("1", "http://ds/1")).get()
+
+        self.assertEqual(requests_mock.get.call_count, 4)
+
+    @patch("tasks_utils.requests.requests")
+    def test_no_task_memo(self, requests_mock):
+        requests_mock.get.return_value = self.response({"id": "1"})
+        task = Mock()
+
+        get_public_api_data(task, "1")
+        get_public_api_data(task, "1")
+        download_file(task, "http://ds/1")
+        download_file(task, "http://ds/1")
+
+        self.assertEqual(requests_mock.get.call_count, 4)
+        self.assertIsNone(get_request_memo(task))
+
+    def test_memo(self):
+        memo = RequestMemo()
+
+        self.assertIsNone(memo.get("key"))
+        memo.set("key", b"value")
+        self.assertEqual(memo.get("key"), b"value")
+        self.assertEqual(memo.hits, 1)
@@ -1,8 +1,10 @@
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY
 from datetime import datetime
 from pymongo.errors import NetworkTimeout
 from celery_worker.locks import args_to_uid
-from tasks_utils.results_db import get_task_result, save_task_result
+from tasks_utils.results_db import (
+    get_task_result, save_task_result, get_content_hash, get_ds_upload, save_ds_upload, DS_UPLOADS_COLLECTION,
+)
 import unittest
 
 
@@ -91,3 +93,47 @@ class ResultsDBTestCase(unittest.TestCase):
             }
         )
         self.assertIs(result, None)
+
+
+class DSUploadsTestCase(unittest.TestCase):
+
+    def test_get_content_hash(self):
+        self.assertEqual(get_content_hash("name", b"content"), get_content_hash("name", "content"))
+        self.assertNotEqual(get_content_hash("name", b"content"), get_content_hash("name.", b"content"))
+        self.assertNotEqual(get_content_hash("na", "mecontent"), get_content_hash("name", "content"))
+
+    @patch("tasks_utils.results_db.base_get_mongodb_collection")
+    def test_get_ds_upload(self, get_collection):
+        get_collection.return_value.find_one.return_value = {"_id": "abc", "data": {"url": "http://ds/1"}}
+
+        self.assertEqual(get_ds_upload("abc"), {"url": "http://ds/1"})
+        get_collection.assert_called_once_with(DS_UPLOADS_COLLECTION)
+        get_collection.return_value.find_one.assert_called_once_with({"_id": "abc"})
+
+    @patch("tasks_utils.results_db.base_get_mongodb_collection")
+    def test_get_ds_upload_missed(self, get_collection):
+        get_collection.return_value.find_one.return_value = None
+
+        self.assertIsNone(get_ds_upload("abc"))
+
+    @patch("tasks_utils.results_db.base_get_mongodb_collection")
+    def test_get_ds_upload_exc(self, get_collection):
+        get_collection.return_value.find_one.side_effect = NetworkTimeout
+
+        self.assertIsNone(get_ds_upload("abc"))
+
+    @patch("tasks_utils.results_db.base_get_mongodb_collection")
+    def test_save_ds_upload(self, get_collection):
+        save_ds_upload("abc", {"url": "http://ds/1"})
+
+        get_collection.return_value.update_one.assert_called_once_with(
+            {"_id": "abc"},
+            {"$setOnInsert": {"data": {"url": "http://ds/1"}, "createdAt": ANY}},
+            upsert=True,
+        )
+
+    @patch("tasks_utils.results_db.base_get_mongodb_collection")
+    def test_save_ds_upload_exc(self, get_collection):
+        get_collection.return_value.update_one.side_effect = NetworkTimeout
+
+        save_ds_upload("abc", {"url": "http://ds/1"})  # fails silently
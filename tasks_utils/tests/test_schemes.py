@@ -0,0 +1,72 @@
+import unittest
+
+import jmespath
+
+from tasks_utils.schemes import compile_path, compile_scheme, compile_scheme_value, get_scheme_data, get_scheme_item
+
+SCHEME = {
+    "id": {"type": "object", "title": "ID", "path": "_id", "default": ""},
+    "amount": {"type": "object", "title": "Amount", "path": "payment.amount", "method": lambda x: x and x + "0"},
+    "first": {"type": "value", "path": "messages[0].message_id"},
+    "messages": {"type": "value", "path": "messages"},
+    "keys": {"type": "object", "path": ".", "method": lambda x: sorted(x.keys())},
+    "payment": {
+        "type": "object",
+        "title": "Payment",
+        "scheme": {
+            "currency": {"type": "object", "path": "payment.currency", "default": "UAH"},
+        },
+    },
+    "skipped": {"type": "unknown", "path": "payment"},
+}
+
+
+class CompilePathTestCase(unittest.TestCase):
+
+    def test_same_as_search(self):
+        paths = ["_id", "payment", "payment.amount", "payment.amount.value", "messages[0].message_id", "."]
+        items = [
+            {},
+            {"_id": "uid", "payment": {"amount": "1.0"}, "messages": [{"message_id": "TEST"}]},
+            {"payment": None},
+            {"payment": "string"},
+            {"payment": ["list"]},
+            {"payment": {"amount": {"value": 0}}},
+            {"payment": {"amount": ""}},
+            {"messages": []},
+            None,
+        ]
+        for path in paths:
+            for item in items:
+                expected = item if path == "." else jmespath.search(path, item)
+                self.assertEqual(compile_path(path)(item), expected, (path, item))
+
+
+class CompileSchemeTestCase(unittest.TestCase):
+
+    def test_get_scheme_data(self):
+        data = {"_id": "uid", "payment": {"amount": "1.0"}, "messages": [{"message_id": "TEST"}]}
+
+        self.assertEqual(get_scheme_data(data, SCHEME), {
+            "id": {"title": "ID", "value": "uid"},
+            "amount": {"title": "Amount", "value": "1.00"},
+            "first": "TEST",
+            "messages": [{"message_id": "TEST"}],
+            "keys": {"value": ["_id", "messages", "payment"]},
+            "payment": {"title": "Payment", "value": {"currency": {"value": "UAH"}}},
+        })
+
+    def test_get_scheme_data_empty(self):
+        self.assertEqual(get_scheme_data({}, SCHEME), {
+            "id": {"title": "ID", "value": ""},
+            "payment": {"title": "Payment", "value": {"currency": {"value": "UAH"}}},
+        })
+
+    def test_get_scheme_item(self):
+        self.assertEqual(get_scheme_item({"_id": "uid"}, SCHEME["id"]), {"title": "ID", "value": "uid"})
+        self.assertIsNone(get_scheme_item({}, SCHEME["first"]))
+
+    def test_compiled_once(self):
+        self.assertIs(compile_scheme(SCHEME), compile_scheme(SCHEME))
+        self.assertIs(compile_scheme_value(SCHEME["id"]), compile_scheme_value(SCHEME["id"]))
+        self.assertIsNot(compile_scheme(SCHEME), compile_scheme(dict(SCHEME)))
@@ -3,14 +3,19 @@ from environment_settings import (
     READ_TIMEOUT,
 )
 from tasks_utils.tasks import attach_doc_to_tender, upload_to_doc_service
+from tasks_utils.results_db import get_content_hash
 from celery.exceptions import Retry
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, Mock
 import requests
 import unittest
+from tasks_utils.cookies import server_id_cookies
 
 
 class AttachToTenderTestCase(unittest.TestCase):
 
+    def setUp(self):
+        server_id_cookies.reset()
+
     @patch("tasks_utils.tasks.get_task_result")
     @patch("tasks_utils.tasks.attach_doc_to_tender.retry")
     def test_exception_head(self, retry_mock, get_task_result_mock):
@@ -331,6 +336,8 @@ class AttachToTenderTestCase(unittest.TestCase):
         save_task_result_mock.assert_not_called()
 
 
+@patch("tasks_utils.tasks.get_ds_upload", Mock(return_value=None))
+@patch("tasks_utils.tasks.save_ds_upload", Mock())
 class DSUploadTestCase(unittest.TestCase):
 
     @patch("tasks_utils.tasks.attach_doc_to_tender")
@@ -448,3 +455,36 @@ class DSUploadTestCase(unittest.TestCase):
             file_data,
             (name, data, doc_type, tender_id, item_name, item_id)
         )
+
+    @patch("tasks_utils.tasks.attach_doc_to_tender")
+    @patch("tasks_utils.tasks.save_task_result")
+    @patch("tasks_utils.tasks.get_task_result")
+    def test_uploaded_content(self, get_task_result_mock, save_task_result_mock, attach_doc_to_tender_mock):
+        get_task_result_mock.return_value = None
+        name = "26591010101017J1603101100000000111220172659.KVT"
+        file_data = {
+            "url": "https://localhost/get/123?KeyID=123&Signature=QQQ",
+            "title": name,
+            "hash": "md5:9af9e74cfa0e6f4438008ef7268a3716",
+            "format": "application/octet-stream"
+        }
+
+        with patch("tasks_utils.tasks.requests") as requests_mock, \
+             patch("tasks_utils.tasks.get_ds_upload") as get_ds_upload_mock, \
+             patch("tasks_utils.tasks.save_ds_upload") as save_ds_upload_mock:
+            get_ds_upload_mock.return_value = dict(file_data)
+            upload_to_doc_service(
+                name=name, content="aGk=", doc_type="useless_bytes",
+                tender_id="a" * 32, item_name="award", item_id="f" * 32
+            )
+
+        requests_mock.post.assert_not_called()
+        save_ds_upload_mock.assert_not_called()
+        get_ds_upload_mock.assert_called_once_with(get_content_hash(name, b"hi"))
+        attach_doc_to_tender_mock.delay.assert_called_once_with(
+            item_name="award",
+            item_id='f' * 32,
+            data=dict(file_data, documentType="useless_bytes"),
+            tender_id='a' * 32
+        )
+        save_task_result_mock.assert_called_once()
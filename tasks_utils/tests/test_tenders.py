@@ -0,0 +1,99 @@
+from tasks_utils.tenders import TenderIndex, TenderObjectNotFound
+import unittest
+
+
+class TenderIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tender = {
+            "id": "f" * 32,
+            "lots": [
+                {"id": "lot1", "status": "active"},
+                {"id": "lot2", "status": "cancelled"},
+            ],
+            "bids": [
+                {"id": "bid1"},
+                {"id": "bid2"},
+            ],
+            "awards": [
+                {"id": "award1", "bid_id": "bid1", "lotID": "lot1", "status": "cancelled"},
+                {"id": "award2", "bid_id": "bid1", "lotID": "lot1", "status": "active"},
+                {"id": "award3", "bid_id": "bid2", "lotID": "lot2", "status": "pending"},
+            ],
+            "qualifications": [
+                {"id": "q1", "bidID": "bid1", "status": "cancelled"},
+                {"id": "q2", "bidID": "bid1", "status": "active"},
+            ],
+            "contracts": [
+                {"id": "contract1", "awardID": "award2"},
+            ],
+            "cancellations": [
+                {"id": "c1", "status": "pending", "relatedLot": "lot2"},
+                {"id": "c2", "status": "active", "relatedLot": "lot2"},
+                {"id": "c3", "status": "active"},
+            ],
+        }
+
+    def test_get_by_id(self):
+        index = TenderIndex(self.tender)
+
+        self.assertIs(index.get_bid("bid2"), self.tender["bids"][1])
+        self.assertIs(index.get_award("award3"), self.tender["awards"][2])
+        self.assertIs(index.get_lot("lot1"), self.tender["lots"][0])
+        self.assertIs(index.get_contract("contract1"), self.tender["contracts"][0])
+
+        self.assertIsNone(index.get_bid("bid3"))
+        self.assertIsNone(index.get_lot(None))
+
+    def test_required(self):
+        index = TenderIndex(self.tender)
+
+        self.assertIs(index.get_award("award1", required=True), self.tender["awards"][0])
+        self.assertEqual(index.get_lot_position("lot2", required=True), 1)
+
+        with self.assertRaises(TenderObjectNotFound) as e:
+            index.get_contract("contract2", required=True)
+        self.assertEqual(str(e.exception), f"Contract contract2 is not found in tender {'f' * 32}")
+
+        with self.assertRaises(TenderObjectNotFound):
+            index.get_lot_position("lot3", required=True)
+
+    def test_lot_position(self):
+        index = TenderIndex(self.tender)
+
+        self.assertEqual(index.get_lot_position("lot1"), 0)
+        self.assertEqual(index.get_lot_position("lot2"), 1)
+        self.assertIsNone(index.get_lot_position("lot3"))
+
+    def test_relations(self):
+        index = TenderIndex(self.tender)
+
+        self.assertEqual([a["id"] for a in index.get_bid_awards("bid1")], ["award1", "award2"])
+        self.assertEqual([q["id"] for q in index.get_bid_qualifications("bid1")], ["q1", "q2"])
+        self.assertEqual(index.get_bid_qualifications("bid2"), [])
+        self.assertEqual([c["id"] for c in index.get_active_cancellations("lot2")], ["c2"])
+        self.assertEqual([c["id"] for c in index.get_active_cancellations()], ["c3"])
+        self.assertEqual(index.get_active_cancellations("lot1"), [])
+
+    def test_duplicated_id(self):
+        self.tender["bids"].append({"id": "bid1", "duplicate": True})
+        index = TenderIndex(self.tender)
+
+        self.assertIs(index.get_bid("bid1"), self.tender["bids"][0])
+
+    def test_empty_tender(self):
+        index = TenderIndex({"id": "f" * 32})
+
+        self.assertIsNone(index.get_bid("bid1"))
+        self.assertIsNone(index.get_lot_position("lot1"))
+        self.assertEqual(index.get_bid_awards("bid1"), [])
+        self.assertEqual(index.get_active_cancellations(), [])
+
+    def test_built_once(self):
+        index = TenderIndex(self.tender)
+        bids = index.bids
+
+        self.tender["bids"] = []
+
+        self.assertIs(index.bids, bids)
+        self.assertIsNotNone(index.get_bid("bid1"))
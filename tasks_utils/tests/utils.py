@@ -1,7 +1,31 @@
 import asyncio
+import os
+
+
+MONGODB_TEST_URL = os.environ.get("MONGODB_TEST_URL")
 
 
 def async_test(f):
     def wrapper(*args, **kwargs):
         asyncio.run(f(*args, **kwargs))
     return wrapper
+
+
+def get_plan_stages(plan):
+    """
+    Returns all the stage names of an explain() plan, ex. ["FETCH", "IXSCAN"]
+    """
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(get_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(get_plan_stages(value))
+    return stages
+
+
+def get_winning_plan_stages(cursor):
+    return get_plan_stages(cursor.explain()["queryPlanner"]["winningPlan"])
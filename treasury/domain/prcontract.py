@@ -1,18 +1,27 @@
 import yaml
 from fractions import Fraction
-from tasks_utils.requests import get_public_api_data, download_file
+from tasks_utils.requests import get_public_api_data, download_file, run_concurrently
+from tasks_utils.tenders import TenderIndex
+from tasks_utils.datetime import parse_dt_string
 from celery.utils.log import get_task_logger
+from environment_settings import TREASURY_FETCH_CONCURRENCY
 from treasury.settings import RELEASE_2020_04_19
+from treasury.storage import get_cached_plan, save_cached_plan, get_cached_initial_bids, save_cached_initial_bids
 
 
 logger = get_task_logger(__name__)
 
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)  # libyaml if it's available
 
-def get_contract_date(task, contract):
+AUCTION_INITIAL_BIDS_PATH = ("timeline", "auction_start", "initial_bids")
+
+
+def get_contract_date(task, contract, tender=None):
     if "dateSigned" in contract:
         return contract["dateSigned"]
     else:
-        tender = get_public_api_data(task, contract["tender_id"], "tender")
+        if tender is None:
+            tender = get_public_api_data(task, contract["tender_id"], "tender")
         tender_contract = [
             c for c in tender["contracts"]
             if c["id"] == contract["id"]
@@ -55,33 +64,129 @@ def prepare_contract_context(contract):
     contract["documents"] = filtered_documents
 
 
+class _YamlAliasFound(Exception):
+    pass
+
+
+def _skip_yaml_node(loader):
+    depth = 0
+    while True:
+        event = loader.get_event()
+        if isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+            depth += 1
+        elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+            depth -= 1
+        if depth == 0:
+            return
+
+
+def _compose_yaml_node(loader):
+    event = loader.get_event()
+    if isinstance(event, yaml.AliasEvent):
+        # the anchor can be defined in the skipped part of the document
+        raise _YamlAliasFound(event.anchor)
+
+    if isinstance(event, yaml.ScalarEvent):
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+        return yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style)
+
+    if isinstance(event, yaml.SequenceStartEvent):
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = loader.resolve(yaml.SequenceNode, None, event.implicit)
+        node = yaml.SequenceNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        while not loader.check_event(yaml.SequenceEndEvent):
+            node.value.append(_compose_yaml_node(loader))
+    else:
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = loader.resolve(yaml.MappingNode, None, event.implicit)
+        node = yaml.MappingNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        while not loader.check_event(yaml.MappingEndEvent):
+            node.value.append((_compose_yaml_node(loader), _compose_yaml_node(loader)))
+    node.end_mark = loader.get_event().end_mark
+    return node
+
+
+def load_yaml_section(content, path):
+    """
+    Loads only the node at the path of mapping keys from the yaml document.
+    The document is parsed up to the end of the node, the rest of it isn't even read,
+    so it's much cheaper than loading an auction audit to get its first section.
+    Raises KeyError if there is no such node, like the dict lookups would do
+
+    Example:
+        load_yaml_section(content, ("timeline", "auction_start", "initial_bids"))
+    """
+    loader = YamlLoader(content)
+    try:
+        loader.get_event()  # StreamStartEvent
+        if loader.check_event(yaml.DocumentStartEvent):
+            loader.get_event()
+        for key in path:
+            if not loader.check_event(yaml.MappingStartEvent):
+                raise KeyError(key)
+            loader.get_event()
+            while not loader.check_event(yaml.MappingEndEvent):
+                event = loader.peek_event()
+                if isinstance(event, yaml.ScalarEvent) and event.value == key:
+                    loader.get_event()
+                    break
+                _skip_yaml_node(loader)  # key
+                _skip_yaml_node(loader)  # value
+            else:
+                raise KeyError(key)
+        return loader.construct_document(_compose_yaml_node(loader))
+    except _YamlAliasFound:
+        data = yaml.load(content, Loader=YamlLoader)
+        for key in path:
+            data = data[key]
+        return data
+    finally:
+        loader.dispose()
+
+
+def get_initial_bids(task, tender, related_lot):
+    """
+    Initial bids from the auction audit document of the tender (lot).
+    Extracted bids are saved for the version (dateModified) of the document,
+    so the audit is downloaded and parsed once for all the contracts of the tender
+    """
+    lot_suffix = f"_{related_lot}" if related_lot else ""
+    audit_id = f"{tender['id']}{lot_suffix}"
+    audit_doc_title = f"audit_{audit_id}.yaml"
+    for doc in tender.get("documents", ""):
+        if doc["title"] == audit_doc_title:
+            date_modified = doc.get("dateModified")
+            if date_modified:
+                initial_bids = get_cached_initial_bids(audit_id, date_modified)
+                if initial_bids is not None:
+                    return initial_bids
+
+            _, content = download_file(task, doc["url"])
+            initial_bids = {
+                str(b["bidder"]): normalize_bid_amount(b["amount"])
+                for b in load_yaml_section(content, AUCTION_INITIAL_BIDS_PATH)
+            }
+            if date_modified:
+                save_cached_initial_bids(audit_id, date_modified, initial_bids)
+            return initial_bids
+    return {}
+
+
 def prepare_context(task, contract, tender, plan, buyer):
     prepare_contract_context(contract)
+    index = TenderIndex(tender)
     # additional global context variables
-    tender_contract = [
-        c for c in tender["contracts"]
-        if c["id"] == contract["id"]
-    ][0]
-    tender_award = [
-        a for a in tender["awards"]
-        if a["id"] == contract["awardID"]
-    ][0]
-    tender_bid = [
-        b for b in tender.get("bids", "")
-        if b["id"] == tender_award.get("bid_id")
-    ]
-    tender_bid = tender_bid[0] if tender_bid else {}
+    tender_contract = index.get_contract(contract["id"], required=True)
+    tender_award = index.get_award(contract["awardID"], required=True)
+    tender_bid = index.get_bid(tender_award.get("bid_id")) or {}
 
     related_lot = tender_award.get("lotID")
-    lot = [
-        l for l in tender.get("lots", "")
-        if l["id"] == related_lot
-    ]
-    lot = lot[0] if lot else None
-    cancellation = [
-        c for c in tender.get("cancellations", "")
-        if c["status"] == "active" and c.get("relatedLot") == related_lot
-    ]
+    lot = index.get_lot(related_lot)
+    cancellation = index.get_active_cancellations(related_lot)
     cancellation = cancellation[0] if cancellation else {}
     tender["bids"] = [b for b in tender.get("bids", "") if b.get("status") not in ("deleted", "invalid",)]
 
@@ -105,18 +210,8 @@ def prepare_context(task, contract, tender, plan, buyer):
 
     initial_bids = {}
     if tender_bid:
-        lot_suffix = f"_{related_lot}" if related_lot else ""
-        audit_doc_title = f"audit_{tender['id']}{lot_suffix}.yaml"
-        for doc in tender.get("documents", ""):
-            if doc["title"] == audit_doc_title:
-                _, content = download_file(task, doc["url"])
-                auction_info = yaml.safe_load(content)
-                initial_bids = {
-                    str(b["bidder"]): normalize_bid_amount(b["amount"])
-                    for b in auction_info["timeline"]["auction_start"]["initial_bids"]
-                }
-                break
-    tender = get_award_qualified_eligible_for_each_bid(tender)
+        initial_bids = get_initial_bids(task, tender, related_lot)
+    tender = get_award_qualified_eligible_for_each_bid(tender, index)
 
     for item in tender["items"]:
         item["item_delivery_address"] = get_custom_address_string(item.get("deliveryAddress"))
@@ -215,23 +310,22 @@ def get_custom_address_string(address):
     return ", ".join(str(el) for el in res)
 
 
-def get_award_qualified_eligible_for_each_bid(tender):
+def get_award_qualified_eligible_for_each_bid(tender, index=None):
+    index = index or TenderIndex(tender)
     for bid in tender['bids']:
-        bid['award_qualified_eligible'] = get_award_qualified_eligible(tender, bid)
+        bid['award_qualified_eligible'] = get_award_qualified_eligible(tender, bid, index)
     return tender
 
 
-def get_award_qualified_eligible(tender, bid):
+def get_award_qualified_eligible(tender, bid, index=None):
+    index = index or TenderIndex(tender)
 
     tender_procurement_method_type = tender["procurementMethodType"]
     if tender_procurement_method_type in (
             "aboveThresholdUA", "aboveThresholdUA.defense",
             "competitiveDialogueUA.stage2", "simple.defense"
     ):
-        _award = [
-            a for a in tender["awards"]
-            if a["bid_id"] == bid["id"]
-        ]
+        _award = index.get_bid_awards(bid["id"])
         if not _award:
             return None
         _award = _award[0]
@@ -239,10 +333,7 @@ def get_award_qualified_eligible(tender, bid):
         return handle_award_qualified_eligible_statuses(_award)
 
     elif tender_procurement_method_type in ("aboveThresholdEU", "competitiveDialogueEU.stage2"):
-        _qualification = [
-            q for q in tender["qualifications"]
-            if q["bidID"] == bid["id"]
-        ]
+        _qualification = index.get_bid_qualifications(bid["id"])
 
         if not _qualification:
             return None
@@ -332,10 +423,29 @@ def get_buyer(contract_id, tender):
     return {}
 
 
+def get_plan(task, plan_id, modified_since=None):
+    """
+    A cached plan is used if it was fetched after modified_since (the tender dateModified)
+    or if it's in a final status, otherwise the plan is downloaded again
+    """
+    fetched_since = parse_dt_string(modified_since) if modified_since else None
+    plan = get_cached_plan(plan_id, fetched_since=fetched_since)
+    if plan is None:
+        plan = get_public_api_data(task, plan_id, "plan")
+        save_cached_plan(plan)
+    return plan
+
+
 def get_plan_by_buyer(task, tender, buyer):
-    plans = tender["plans"]
+    plans = run_concurrently(
+        task,
+        [
+            lambda plan_id=plan["id"]: get_plan(task, plan_id, modified_since=tender.get("dateModified"))
+            for plan in tender["plans"]
+        ],
+        max_workers=TREASURY_FETCH_CONCURRENCY,
+    )
     for plan in plans:
-        plan = get_public_api_data(task, plan["id"], "plan")
         plan_buyers = plan.get('buyers')
         for plan_buyer in plan_buyers:
             plan_buyer_identifier_id = plan_buyer["identifier"]["id"]
@@ -1,6 +1,7 @@
 import requests
 from tasks_utils.settings import RETRY_REQUESTS_EXCEPTIONS, DEFAULT_HEADERS
 from tasks_utils.requests import mount_retries_for_request, get_exponential_request_retry_countdown
+from tasks_utils.cookies import server_id_cookies
 from treasury.exceptions import DocumentServiceForbiddenError, DocumentServiceError, ApiServiceError
 from environment_settings import (
     API_VERSION, DS_HOST, DS_USER, DS_PASSWORD, CONNECT_TIMEOUT, READ_TIMEOUT,
@@ -71,12 +72,13 @@ def get_contracts_server_id_cookies():
     mount_retries_for_request(session, status_forcelist=(404, 408, 409, 412, 429, 500, 502, 503, 504))
 
     try:
-        get_response = session.head(
-            f"{API_HOST}/api/{API_VERSION}/contracts",
-            headers=DEFAULT_HEADERS,
+        cookies = server_id_cookies.get_cookies(
+            lambda: session.head(
+                f"{API_HOST}/api/{API_VERSION}/contracts",
+                headers=DEFAULT_HEADERS,
+            ).cookies
         )
-        server_id = get_response.cookies.get("SERVER_ID", None)
-        return {"SERVER_ID": server_id}
+        return {"SERVER_ID": cookies.get("SERVER_ID", None)}
 
     except RETRY_REQUESTS_EXCEPTIONS as exc:
         logger.exception(exc, extra={"MESSAGE_ID": "TREASURY_GET_CONTRACTS_REQUESTS_EXCEPTIONS"})
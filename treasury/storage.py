@@ -1,14 +1,20 @@
 from celery_worker.locks import get_mongodb_collection
 from environment_settings import (
     TREASURY_CONTEXT_COLLECTION, TREASURY_DB_NAME, TREASURY_ORG_COLLECTION, TREASURY_XML_TEMPLATES_COLLECTION,
+    TREASURY_PLANS_COLLECTION, TREASURY_PLAN_CACHE_TIMEOUT,
+    TREASURY_AUDITS_COLLECTION, TREASURY_AUDIT_CACHE_TIMEOUT,
 )
 from pymongo.errors import PyMongoError
 from pymongo import UpdateOne, DeleteMany
+from bson import Binary, encode as bson_encode, decode as bson_decode
 from celery.signals import celeryd_init
 from celery.utils.log import get_task_logger
 from celery_worker.celery import app
+from treasury.templates import project_context
 from typing import List, Dict
 from http import HTTPStatus
+from datetime import datetime
+import zlib
 import sys
 
 
@@ -17,6 +23,13 @@ logger = get_task_logger(__name__)
 
 ORG_UNIQUE_FIELD = "edrpou_code"
 
+# 1 - plain documents (no schema_version field)
+# 2 - contexts projected to the fields used by the templates, contexts and xml are zlib compressed
+CONTEXT_SCHEMA_VERSION = 2
+XML_TEMPLATE_ENCODING = "windows-1251"
+# plans in these statuses can't be changed in api, so their cached versions are always fresh
+PLAN_FINAL_STATUSES = ("complete", "cancelled")
+
 
 def get_collection(collection_name=TREASURY_CONTEXT_COLLECTION):
     return get_mongodb_collection(
@@ -34,10 +47,48 @@ def init_organisations_index(self):
         raise self.retry()
 
 
+@app.task(bind=True, max_retries=20)
+def init_plans_index(self):
+    try:
+        collection = get_collection(TREASURY_PLANS_COLLECTION)
+        collection.create_index([("plan_id", 1), ("dateModified", -1)])
+        collection.create_index(
+            "createdAt",
+            expireAfterSeconds=TREASURY_PLAN_CACHE_TIMEOUT  # delete index if you've changed this
+        )
+    except PyMongoError as e:
+        logger.exception(e,  extra={"MESSAGE_ID": "MONGODB_INDEX_CREATION_ERROR"})
+        raise self.retry()
+
+
+@app.task(bind=True, max_retries=20)
+def init_audits_index(self):
+    try:
+        get_collection(TREASURY_AUDITS_COLLECTION).create_index(
+            "createdAt",
+            expireAfterSeconds=TREASURY_AUDIT_CACHE_TIMEOUT  # delete index if you've changed this
+        )
+    except PyMongoError as e:
+        logger.exception(e,  extra={"MESSAGE_ID": "MONGODB_INDEX_CREATION_ERROR"})
+        raise self.retry()
+
+
 if "test" not in sys.argv[0]:  # pragma: no cover
     @celeryd_init.connect
     def task_sent_handler(*args, **kwargs):
         init_organisations_index.delay()
+        init_plans_index.delay()
+        init_audits_index.delay()
+
+
+def encode_contract_context(data):
+    return Binary(zlib.compress(bson_encode(project_context(data))))
+
+
+def decode_contract_context(doc):
+    if doc.get("schema_version") == CONTEXT_SCHEMA_VERSION:
+        return bson_decode(zlib.decompress(doc["context"]))
+    return doc.get("context")
 
 
 def get_contract_context(task, contract_id):
@@ -49,14 +100,17 @@ def get_contract_context(task, contract_id):
     else:
         if doc:
             logger.debug(f"Get contract context from {TREASURY_DB_NAME}:{TREASURY_CONTEXT_COLLECTION}", extra={"CONTRACT_ID": contract_id})
-            return doc.get("context")
+            return decode_contract_context(doc)
 
 
 def save_contract_context(task, contract_id, data):
     try:
         get_collection().update_one(
             {"_id": contract_id},
-            {"$set": {"context": data}},
+            {"$set": {
+                "context": encode_contract_context(data),
+                "schema_version": CONTEXT_SCHEMA_VERSION,
+            }},
             upsert=True
         )
     except PyMongoError as e:
@@ -66,13 +120,78 @@ def save_contract_context(task, contract_id, data):
         logger.debug(f"Contract context was update in {TREASURY_DB_NAME}:{TREASURY_CONTEXT_COLLECTION}", extra={"CONTRACT_ID": contract_id})
 
 
+def get_contract_state(contract_id):
+    """
+    The state of the contract when it was checked the last time: dateModified
+    fail silently: if mongodb isn't available, the contract will be checked using api data
+    """
+    try:
+        doc = get_collection().find_one({"_id": contract_id}, {"state": 1})
+    except PyMongoError as e:
+        logger.exception(e, extra={"MESSAGE_ID": "MONGODB_ACCESS_ERROR"})
+    else:
+        return doc and doc.get("state")
+
+
+def save_contract_state(contract):
+    try:
+        get_collection().update_one(
+            {"_id": contract["id"]},
+            {"$set": {"state": {
+                "dateModified": contract.get("dateModified"),
+            }}},
+        )
+    except PyMongoError as e:
+        logger.exception(e, extra={"MESSAGE_ID": "MONGODB_ACCESS_ERROR"})
+
+
+@app.task(bind=True, max_retries=20)
+def migrate_contract_contexts(self, batch_size=100):
+    """
+    Converts contexts saved before the current schema version.
+    Converted documents are skipped, so it's safe to run it again:
+        celery -A celery_worker call treasury.storage.migrate_contract_contexts
+    Documents that aren't converted are still readable by get_contract_context
+    """
+    collection = get_collection()
+    query = {"schema_version": {"$ne": CONTEXT_SCHEMA_VERSION}}
+    migrated = 0
+    try:
+        while True:
+            docs = list(collection.find(query, limit=batch_size))
+            if not docs:
+                break
+            collection.bulk_write([
+                UpdateOne(
+                    {"_id": doc["_id"], **query},
+                    {"$set": {
+                        "context": encode_contract_context(decode_contract_context(doc) or {}),
+                        "schema_version": CONTEXT_SCHEMA_VERSION,
+                    }}
+                )
+                for doc in docs
+            ])
+            migrated += len(docs)
+    except PyMongoError as e:
+        logger.exception(e, extra={"MESSAGE_ID": "MONGODB_ACCESS_ERROR"})
+        raise self.retry()
+    logger.info(
+        f"Migrated {migrated} contract contexts to schema version {CONTEXT_SCHEMA_VERSION}",
+        extra={"MESSAGE_ID": "TREASURY_CONTEXT_MIGRATED"}
+    )
+    return migrated
+
+
 def save_xml_template(task, contract_id, data, xml_was_changed=False):
-    if isinstance(data, bytes):
-        data = data.decode('windows-1251')
+    if isinstance(data, str):
+        data = data.encode(XML_TEMPLATE_ENCODING)
     try:
         get_collection(collection_name=TREASURY_XML_TEMPLATES_COLLECTION).update_one(
             {"contract_id": contract_id, "xml_changed": xml_was_changed},
-            {"$set": {"xml_data": data}},
+            {"$set": {
+                "xml_data": Binary(zlib.compress(data)),
+                "schema_version": CONTEXT_SCHEMA_VERSION,
+            }},
             upsert=True
         )
     except PyMongoError as e:
@@ -82,6 +201,75 @@ def save_xml_template(task, contract_id, data, xml_was_changed=False):
         logger.debug(f"Contract xml was update in {TREASURY_DB_NAME}:{TREASURY_XML_TEMPLATES_COLLECTION}", extra={"CONTRACT_ID": contract_id})
 
 
+def get_cached_plan(plan_id, fetched_since=None):
+    """
+    Returns the latest (by dateModified) saved version of the plan
+    fail silently: if mongodb isn't available, the plan will be downloaded from api
+    :param fetched_since: datetime, versions fetched before it are skipped unless the plan is in a final status
+    """
+    query = {"plan_id": plan_id}
+    if fetched_since:
+        query["$or"] = [
+            {"plan.status": {"$in": PLAN_FINAL_STATUSES}},
+            {"createdAt": {"$gte": fetched_since}},
+        ]
+    try:
+        doc = get_collection(collection_name=TREASURY_PLANS_COLLECTION).find_one(
+            query,
+            sort=[("dateModified", -1)],
+        )
+    except PyMongoError as e:
+        logger.exception(e, extra={"MESSAGE_ID": "MONGODB_ACCESS_ERROR"})
+    else:
+        return doc and doc["plan"]
+
+
+def save_cached_plan(plan):
+    plan_id, date_modified = plan["id"], plan.get("dateModified")
+    try:
+        get_collection(collection_name=TREASURY_PLANS_COLLECTION).update_one(
+            {"_id": f"{plan_id}_{date_modified}"},
+            {"$set": {
+                "plan_id": plan_id,
+                "dateModified": date_modified,
+                "plan": plan,
+                "createdAt": datetime.utcnow(),
+            }},
+            upsert=True
+        )
+    except PyMongoError as e:
+        logger.exception(e, extra={"MESSAGE_ID": "MONGODB_ACCESS_ERROR"})
+
+
+def get_cached_initial_bids(audit_id, date_modified):
+    """
+    Returns initial bids extracted from the given version of the auction audit document
+    fail silently: if mongodb isn't available, the audit will be downloaded from api
+    """
+    try:
+        doc = get_collection(collection_name=TREASURY_AUDITS_COLLECTION).find_one(
+            {"_id": f"{audit_id}_{date_modified}"}
+        )
+    except PyMongoError as e:
+        logger.exception(e, extra={"MESSAGE_ID": "MONGODB_ACCESS_ERROR"})
+    else:
+        return doc and doc["initial_bids"]
+
+
+def save_cached_initial_bids(audit_id, date_modified, initial_bids):
+    try:
+        get_collection(collection_name=TREASURY_AUDITS_COLLECTION).update_one(
+            {"_id": f"{audit_id}_{date_modified}"},
+            {"$set": {
+                "initial_bids": initial_bids,
+                "createdAt": datetime.utcnow(),
+            }},
+            upsert=True
+        )
+    except PyMongoError as e:
+        logger.exception(e, extra={"MESSAGE_ID": "MONGODB_ACCESS_ERROR"})
+
+
 def update_organisations(task, records):
     collection = get_collection(collection_name=TREASURY_ORG_COLLECTION)
     operations = []
@@ -1,7 +1,8 @@
 from celery_worker.celery import app, formatter
 from celery_worker.locks import concurrency_lock, unique_lock
 from treasury.storage import (
-    get_contract_context, save_contract_context, update_organisations, get_organisation, save_xml_template
+    get_contract_context, save_contract_context, update_organisations, get_organisation, save_xml_template,
+    get_contract_state, save_contract_state,
 )
 from treasury.documents import prepare_documents
 from treasury.templates import (
@@ -15,8 +16,10 @@ from environment_settings import (
 from celery.utils.log import get_task_logger
 from tasks_utils.requests import (
     get_public_api_data, sign_data, get_exponential_request_retry_countdown, get_task_retry_logger_method,
+    run_concurrently,
 )
-from tasks_utils.datetime import get_now
+from tasks_utils.datetime import get_now, parse_dt_string
+from tasks_utils.cookies import server_id_cookies
 from datetime import timedelta
 from uuid import uuid4
 from treasury.exceptions import TransactionsQuantityServerErrorHTTPException
@@ -36,13 +39,14 @@ from treasury.settings import (
 )
 from collections import namedtuple
 from decimal import Decimal
+from http import HTTPStatus
 
 logger = get_task_logger(__name__)
 
 
 @app.task(bind=True, max_retries=None)
-@concurrency_lock
-def check_contract(self, contract_id, ignore_date_signed=False):
+@concurrency_lock(omit=["date_modified"])
+def check_contract(self, contract_id, ignore_date_signed=False, date_modified=None):
     """
     this task will be triggered by contract change
     checks if the contract details and changes haven't been sent
@@ -54,8 +58,20 @@ def check_contract(self, contract_id, ignore_date_signed=False):
     :param self:
     :param contract_id:
     :param ignore_date_signed:
+    :param date_modified: dateModified of the contract from the feed,
+                          if the contract hasn't been modified since the last check, api isn't requested
     :return:
     """
+    if date_modified:
+        state = get_contract_state(contract_id)
+        if state and state["dateModified"] and (
+            parse_dt_string(state["dateModified"]) >= parse_dt_string(date_modified)
+        ):
+            return logger.info(
+                f"Skip contract {contract_id}: not modified since {state['dateModified']}",
+                extra={"MESSAGE_ID": "TREASURY_NO_NEED_UPDATE"}
+            )
+
     contract = get_public_api_data(self, contract_id, "contract")
     tender = get_public_api_data(self, contract["tender_id"], "tender")
     buyer = {}
@@ -65,7 +81,7 @@ def check_contract(self, contract_id, ignore_date_signed=False):
                             extra={"MESSAGE_ID": "TREASURY_SKIP_CONTRACT"})
 
     if not ignore_date_signed:
-        _date_signed = get_contract_date(self, contract)
+        _date_signed = get_contract_date(self, contract, tender)
         if _date_signed < TREASURY_INT_START_DATE:
             return logger.debug(f"Skipping contract {contract['id']} signed at {_date_signed}",
                                 extra={"MESSAGE_ID": "TREASURY_SKIP_CONTRACT"})
@@ -95,6 +111,7 @@ def check_contract(self, contract_id, ignore_date_signed=False):
         sent_change_ids = {c["id"] for c in context["contract"].get("changes", "")}
         new_change_ids = change_ids - sent_change_ids
         if not new_change_ids:
+            save_contract_state(contract)
             return logger.info(
                 f"Skip contract {contract['id']}: all its changes have been sent",
                 extra={"MESSAGE_ID": "TREASURY_NO_NEED_UPDATE"}
@@ -105,18 +122,23 @@ def check_contract(self, contract_id, ignore_date_signed=False):
 
         # update contract data and changes
         save_contract_context(self, contract["id"], {"contract": contract})
+        save_contract_state(contract)
 
         # schedule tasks
         for change_id in sorted(new_change_ids):
             send_change_xml.delay(contract["id"], change_id)
     else:
-        first_stage_tender = get_first_stage_tender(self, tender)
-
         plan = {}
         if buyer:
-            plan = get_plan_by_buyer(self, tender, buyer)
-        elif "plans" in first_stage_tender:
-            plan = get_public_api_data(self, first_stage_tender["plans"][0]["id"], "plan")
+            # the first stage tender is independent of the buyer plan, so they are requested together
+            first_stage_tender, plan = run_concurrently(self, [
+                lambda: get_first_stage_tender(self, tender),
+                lambda: get_plan_by_buyer(self, tender, buyer),
+            ])
+        else:
+            first_stage_tender = get_first_stage_tender(self, tender)
+            if "plans" in first_stage_tender:
+                plan = get_public_api_data(self, first_stage_tender["plans"][0]["id"], "plan")
 
         if not plan:
             return logger.warning(
@@ -126,6 +148,7 @@ def check_contract(self, contract_id, ignore_date_signed=False):
 
         context = prepare_context(self, contract, tender, plan, buyer)
         save_contract_context(self, contract["id"], context)
+        save_contract_state(contract)
         send_contract_xml.delay(contract["id"])
 
 
@@ -253,6 +276,11 @@ def process_transaction(self, transactions_data, source, message_id):
         put_transaction_status = put_transaction(trans, server_id_cookie)
         # cookies needed for correct attaching doc to the same replica(SERVER_ID) where transaction is
 
+        if put_transaction_status == HTTPStatus.PRECONDITION_FAILED:
+            # the replica is behind, the following transactions should go to another one
+            server_id_cookies.refresh()
+            server_id_cookie = get_contracts_server_id_cookies()
+
         if put_transaction_status == PUT_TRANSACTION_SUCCESSFUL_STATUS:
             attach_doc_to_transaction_status = attach_doc_to_transaction(
                 saved_document['data'], trans['id_contract'], trans['ref'], server_id_cookie
@@ -1,4 +1,6 @@
+from contextlib import contextmanager
 from datetime import datetime
+from io import BytesIO
 from lxml import etree, builder
 
 
@@ -38,6 +40,116 @@ def get_date_value(obj, *keys, default=None):
     return get_value(obj, *keys, formatter=format_date, default=default)
 
 
+# context fields that are used by the renderers, only they are saved to the db
+# True - the whole value, dict - the fields of the object (or of every object of the list)
+CONTRACT_CONTEXT_FIELDS = {
+    "contract": {
+        "id": True,
+        "contractNumber": True,
+        "period": True,
+        "value": True,
+        "dateSigned": True,
+        "documents": True,
+        "changes": {
+            "id": True,
+            "contractNumber": True,
+            "rationale": True,
+            "rationaleTypes": True,
+            "dateSigned": True,
+            "documents": True,
+        },
+        "items": {
+            "id": True,
+            "description": True,
+            "classification": True,
+            "additionalClassifications": True,
+            "quantity": True,
+            "unit": True,
+            "item_delivery_address": True,
+            "deliveryDate": True,
+        },
+    },
+    "plan": {
+        "id": True,
+        "procuring_entity_name": True,
+        "procuring_identifier_id": True,
+        "classification": True,
+        "additionalClassifications": True,
+        "budget": {
+            "description": True,
+            "amount": True,
+            "currency": True,
+            "amountNet": True,
+            "breakdown": {
+                "id": True,
+                "title": True,
+                "description": True,
+                "value": True,
+            },
+        },
+        "tender": {
+            "tenderPeriod": True,
+            "procurementMethodType": True,
+        },
+    },
+    "tender": {
+        "tenderID": True,
+        "date": True,
+        "mainProcurementCategory": True,
+        "milestones": {
+            "id": True,
+            "title": True,
+            "description": True,
+            "code": True,
+            "duration": True,
+            "percentage": True,
+        },
+        "bids": {
+            "id": True,
+            "bid_suppliers_identifier_name": True,
+            "value": True,
+            "award_qualified_eligible": True,
+        },
+    },
+    "tender_contract": {
+        "id": True,
+        "suppliers": True,
+        "dateSigned": True,
+        "value": True,
+    },
+    "tender_bid": {
+        "id": True,
+    },
+    "lot": {
+        "date": True,
+        "title": True,
+    },
+    "initial_bids": True,
+    "secondary_data": True,
+}
+
+
+def project_context(data, fields=CONTRACT_CONTEXT_FIELDS):
+    """
+    Returns a copy of the data with only the fields from the spec
+    ex:
+        project_context({"id": 1, "items": [{"id": 2, "name": "a"}]}, {"items": {"id": True}})
+        returns
+        {"items": [{"id": 2}]}
+    """
+    if fields is True:
+        return data
+    if isinstance(data, list):
+        return [project_context(e, fields) for e in data]
+    if isinstance(data, dict):
+        return {
+            key: project_context(data[key], key_fields)
+            for key, key_fields in fields.items()
+            if key in data
+        }
+    return data
+
+
 class TreasuryElementMaker(builder.ElementMaker):
     """
     Elements without children return None
@@ -56,187 +168,203 @@ class TreasuryElementMaker(builder.ElementMaker):
             return super().__call__(tag, *children, **attrib)
 
 
-def render_change_xml(context):
+class TreasuryXmlWriter:
+    """
+    Writes elements to lxml.etree.xmlfile one by one, instead of building the whole tree,
+    with the same rules as TreasuryElementMaker has: elements without children aren't written.
+    That's why the start tag of a container is written only with its first child
+    ex:
+        with writer.element("ul"):
+            writer.value("li", {"1": 1}.get("1"))
+            writer.value("li", {"1": 1}.get("2"))
+        writes
+        <ul><li>1</li></ul>
+    """
+    def __init__(self, xf):
+        self._xf = xf
+        self._stack = []  # [tag, attrib, xmlfile element context]
+        self._opened = 0
+
+    def _open_parents(self):
+        while self._opened < len(self._stack):
+            parent = self._stack[self._opened]
+            parent[2] = self._xf.element(parent[0], parent[1])
+            parent[2].__enter__()
+            self._opened += 1
+
+    @contextmanager
+    def element(self, tag, **attrib):
+        record = [tag, attrib, None]
+        self._stack.append(record)
+        yield
+        self._stack.pop()
+        if record[2] is not None:
+            record[2].__exit__(None, None, None)
+            self._opened -= 1
+
+    def value(self, tag, value):
+        if value is not None:
+            self._open_parents()
+            with self._xf.element(tag):
+                self._xf.write(value)
+
+
+def _stream_xml(write, context, method_name):
+    output = BytesIO()
+    output.write(DOC_TYPE)
+    with etree.xmlfile(output, encoding="windows-1251") as xf:
+        writer = TreasuryXmlWriter(xf)
+        with writer.element("root", method_name=method_name):
+            write(writer, context)
+    return output.getvalue()
+
+
+def _write_change_xml(writer, context):
     contract = context["contract"]
     change = context["change"]
-    maker = TreasuryElementMaker()
-    xml = maker.root(
-        maker.contractId(contract["id"]),
-        maker.contractsDateSigned(get_date_value(contract, "dateSigned")),
-        maker.contractsValueAmount(get_value(contract, "value", "amount")),
-        maker.contractsValueCurrency(get_value(contract, "value", "currency")),
-        maker.contractsValueAmountNet(get_value(contract, "value", "amountNet")),
-        maker.changeId(change["id"]),
-        maker.changeContractNumber(get_value(change, "contractNumber")),
-        maker.changeRationale(get_value(change, "rationale")),
-        maker.changeRationaleTypes(get_value(change, "rationaleTypes")),
-        maker.DateSigned(get_date_value(change, "dateSigned")),
-        maker.changeDocuments(get_value(change, "documents")),
-        method_name="PrChange",
-    )
-    return _render_tree(xml)
-
-
-def _build_plan_xml(maker, context):
+    writer.value("contractId", contract["id"])
+    writer.value("contractsDateSigned", get_date_value(contract, "dateSigned"))
+    writer.value("contractsValueAmount", get_value(contract, "value", "amount"))
+    writer.value("contractsValueCurrency", get_value(contract, "value", "currency"))
+    writer.value("contractsValueAmountNet", get_value(contract, "value", "amountNet"))
+    writer.value("changeId", change["id"])
+    writer.value("changeContractNumber", get_value(change, "contractNumber"))
+    writer.value("changeRationale", get_value(change, "rationale"))
+    writer.value("changeRationaleTypes", get_value(change, "rationaleTypes"))
+    writer.value("DateSigned", get_date_value(change, "dateSigned"))
+    writer.value("changeDocuments", get_value(change, "documents"))
+
+
+def _write_plan_xml(writer, context):
     plan = context.get("plan")
     if plan:
-        result = maker.plan(
-            maker.planId(plan["id"]),
-            maker.procuringEntityName(get_value(plan, "procuring_entity_name")),
-            maker.procuringEntityIdentifierId(get_value(plan, "procuring_identifier_id")),
-            maker.classificationId(get_value(plan, "classification", "id")),
-            maker.classificationDescription(get_value(plan, "classification", "description")),
-            maker.additionalClassifications(
-                * (
-                    maker.additionalClassification(
-                        maker.additionalClassificationsScheme(get_value(classification, "scheme")),
-                        maker.additionalClassificationsId(get_value(classification, "id")),
-                        maker.additionalClassificationsDescription(get_value(classification, "description")),
-                    ) for classification in plan.get("additionalClassifications", "")
-                )
-            ),
-            maker.budgetDescription(get_value(plan, "budget", "description")),
-            maker.budgetAmount(get_value(plan, "budget", "amount")),
-            maker.budgetCurrency(get_value(plan, "budget", "currency")),
-            maker.budgetAmountNet(get_value(plan, "budget", "amountNet")),
-            maker.tenderPeriodStartDate(get_date_value(plan, "tender", "tenderPeriod", "startDate")),
-            maker.tenderProcurementMethodType(get_value(plan, "tender", "procurementMethodType")),
-            maker.breakdowns(
-                * (
-                        maker.breakdown(
-                        maker.breakdownId(get_value(breakdown, "id")),
-                        maker.breakdownTitle(get_value(breakdown, "title")),
-                        maker.breakdownDescription(get_value(breakdown, "description")),
-                        maker.breakdownAmount(get_value(breakdown, "value", "amount")),
-                    ) for breakdown in plan.get("budget", {}).get("breakdown", "")
-                )
-            ),
-        )
-        return result
-
-
-def _build_items_tender_xml(maker, context):
-    items = context["contract"]["items"]
-
-    return ((maker.item(
-            maker.itemsId(item["id"]),
-            maker.itemsDescription(get_value(item, "description")),
-            maker.itemsClassificationScheme(get_value(item, "classification", "scheme")),
-            maker.itemsClassificationId(get_value(item, "classification", "id")),
-            maker.itemsClassificationDescription(get_value(item, "classification", "description")),
-            maker.itemsAdditionalClassifications(
-                *(maker.itemsAdditionalClassification(
-                    maker.itemsAdditionalClassificationsScheme(get_value(classification, "scheme")),
-                    maker.itemsAdditionalClassificationsId(get_value(classification, "id")),
-                    maker.itemsAdditionalClassificationsDescription(get_value(classification, "description")),
-                ) for classification in item.get("additionalClassifications", ""))
-            ),
-            maker.itemsQuantity(get_value(item, "quantity")),
-            maker.itemsUnitName(get_value(item, "unit", "name")),
-            maker.itemsDeliveryAddress(get_value(item, "item_delivery_address")),
-            maker.itemsDeliveryDateEndDate(get_date_value(item, "deliveryDate", "endDate")),
-        ) for item in items)
-    )
-
-
-def _build_tender_xml(maker, context):
+        with writer.element("plan"):
+            writer.value("planId", plan["id"])
+            writer.value("procuringEntityName", get_value(plan, "procuring_entity_name"))
+            writer.value("procuringEntityIdentifierId", get_value(plan, "procuring_identifier_id"))
+            writer.value("classificationId", get_value(plan, "classification", "id"))
+            writer.value("classificationDescription", get_value(plan, "classification", "description"))
+            with writer.element("additionalClassifications"):
+                for classification in plan.get("additionalClassifications", ""):
+                    with writer.element("additionalClassification"):
+                        writer.value("additionalClassificationsScheme", get_value(classification, "scheme"))
+                        writer.value("additionalClassificationsId", get_value(classification, "id"))
+                        writer.value("additionalClassificationsDescription",
+                                     get_value(classification, "description"))
+            writer.value("budgetDescription", get_value(plan, "budget", "description"))
+            writer.value("budgetAmount", get_value(plan, "budget", "amount"))
+            writer.value("budgetCurrency", get_value(plan, "budget", "currency"))
+            writer.value("budgetAmountNet", get_value(plan, "budget", "amountNet"))
+            writer.value("tenderPeriodStartDate", get_date_value(plan, "tender", "tenderPeriod", "startDate"))
+            writer.value("tenderProcurementMethodType", get_value(plan, "tender", "procurementMethodType"))
+            with writer.element("breakdowns"):
+                for breakdown in plan.get("budget", {}).get("breakdown", ""):
+                    with writer.element("breakdown"):
+                        writer.value("breakdownId", get_value(breakdown, "id"))
+                        writer.value("breakdownTitle", get_value(breakdown, "title"))
+                        writer.value("breakdownDescription", get_value(breakdown, "description"))
+                        writer.value("breakdownAmount", get_value(breakdown, "value", "amount"))
+
+
+def _write_items_tender_xml(writer, context):
+    for item in context["contract"]["items"]:
+        with writer.element("item"):
+            writer.value("itemsId", item["id"])
+            writer.value("itemsDescription", get_value(item, "description"))
+            writer.value("itemsClassificationScheme", get_value(item, "classification", "scheme"))
+            writer.value("itemsClassificationId", get_value(item, "classification", "id"))
+            writer.value("itemsClassificationDescription", get_value(item, "classification", "description"))
+            with writer.element("itemsAdditionalClassifications"):
+                for classification in item.get("additionalClassifications", ""):
+                    with writer.element("itemsAdditionalClassification"):
+                        writer.value("itemsAdditionalClassificationsScheme", get_value(classification, "scheme"))
+                        writer.value("itemsAdditionalClassificationsId", get_value(classification, "id"))
+                        writer.value("itemsAdditionalClassificationsDescription",
+                                     get_value(classification, "description"))
+            writer.value("itemsQuantity", get_value(item, "quantity"))
+            writer.value("itemsUnitName", get_value(item, "unit", "name"))
+            writer.value("itemsDeliveryAddress", get_value(item, "item_delivery_address"))
+            writer.value("itemsDeliveryDateEndDate", get_date_value(item, "deliveryDate", "endDate"))
+
+
+def _write_tender_xml(writer, context):
     tender = context["tender"]
     tender_contract = context["tender_contract"]
     if "suppliers" not in context["tender_contract"]:
         tender_contract = context["contract"]
-    tender_bid = context["tender_bid"]
     initial_bids = context["initial_bids"]
     secondary_data = context["secondary_data"]
 
     lot = context.get("lot")
-    result = maker.report(
-        maker.tenderID(tender["tenderID"]),
-        maker.date(get_date_value(
-            lot if lot else tender,
-            "date"
-        )),
-        maker.procuringEntityName(secondary_data["tender_procuring_entity_name"]),
-        maker.procuringEntityIdentifierId(secondary_data["tender_procuring_entity_identifier_id"]),
-        maker.mainProcurementCategory(get_value(tender, "mainProcurementCategory")),
-        maker.items(*_build_items_tender_xml(maker, context)),
-        maker.milestones(
-            * (maker.milestone(
-                maker.milestonesId(milestone["id"]),
-                maker.milestonesTitle(get_value(milestone, "title")),
-                maker.milestonesDescription(get_value(milestone, "description")),
-                maker.milestonesCode(get_value(milestone, "code")),
-                maker.milestonesDurationDays(get_value(milestone, "duration", "days")),
-                maker.milestonesDurationType(get_value(milestone, "duration", "type")),
-                maker.milestonesPercentage(get_value(milestone, "percentage")),
-            ) for milestone in tender.get("milestones", ""))
-        ),
-        maker.startDate(format_date(secondary_data["tender_start_date"])),
-        maker.bids(* (
-            maker.bid(
-                maker.bidsId(bid["id"]),
-                maker.bidsSuppliersIdentifierName(get_value(bid, "bid_suppliers_identifier_name")),
-                maker.bidsValueAmount(get_value(initial_bids, bid["id"])),
-                maker.bidsValueAmountLast(get_value(bid, "value", "amount")),
-                maker.awardQualifiedEligible(get_value(bid, "award_qualified_eligible")),
-            ) for bid in tender["bids"]  # can be empty bids list here
-        )),
-        maker.awardComplaintPeriodStartDate(
-            format_date(secondary_data["award_complaint_period_start_date"])
-        ),
-        maker.contractsDateSigned(get_date_value(tender_contract, "dateSigned")),
-        maker.contractsSuppliersIdentifierName(
-            secondary_data["contracts_suppliers_identifier_name"]
-        ),
-        maker.contractsSuppliersAddress(
-            secondary_data["contracts_suppliers_address"]
-        ),
-        maker.bidSubcontractingDetails(secondary_data["bid_subcontracting_details"]),
-        maker.ContractsValueAmount(get_value(tender_contract, "value", "amount")),
-        maker.startDateCfaua(None),  # will be added later
-        maker.ContractsContractID(tender_contract["id"]),  # will be added later
-        maker.lotsTitle(get_value(lot, "title") if lot else None),
-        maker.procuringEntityKind(secondary_data["procuring_entity_kind"])
-    )
-    return result
+    with writer.element("report"):
+        writer.value("tenderID", tender["tenderID"])
+        writer.value("date", get_date_value(lot if lot else tender, "date"))
+        writer.value("procuringEntityName", secondary_data["tender_procuring_entity_name"])
+        writer.value("procuringEntityIdentifierId", secondary_data["tender_procuring_entity_identifier_id"])
+        writer.value("mainProcurementCategory", get_value(tender, "mainProcurementCategory"))
+        with writer.element("items"):
+            _write_items_tender_xml(writer, context)
+        with writer.element("milestones"):
+            for milestone in tender.get("milestones", ""):
+                with writer.element("milestone"):
+                    writer.value("milestonesId", milestone["id"])
+                    writer.value("milestonesTitle", get_value(milestone, "title"))
+                    writer.value("milestonesDescription", get_value(milestone, "description"))
+                    writer.value("milestonesCode", get_value(milestone, "code"))
+                    writer.value("milestonesDurationDays", get_value(milestone, "duration", "days"))
+                    writer.value("milestonesDurationType", get_value(milestone, "duration", "type"))
+                    writer.value("milestonesPercentage", get_value(milestone, "percentage"))
+        writer.value("startDate", format_date(secondary_data["tender_start_date"]))
+        with writer.element("bids"):
+            for bid in tender["bids"]:  # can be empty bids list here
+                with writer.element("bid"):
+                    writer.value("bidsId", bid["id"])
+                    writer.value("bidsSuppliersIdentifierName", get_value(bid, "bid_suppliers_identifier_name"))
+                    writer.value("bidsValueAmount", get_value(initial_bids, bid["id"]))
+                    writer.value("bidsValueAmountLast", get_value(bid, "value", "amount"))
+                    writer.value("awardQualifiedEligible", get_value(bid, "award_qualified_eligible"))
+        writer.value("awardComplaintPeriodStartDate", format_date(secondary_data["award_complaint_period_start_date"]))
+        writer.value("contractsDateSigned", get_date_value(tender_contract, "dateSigned"))
+        writer.value("contractsSuppliersIdentifierName", secondary_data["contracts_suppliers_identifier_name"])
+        writer.value("contractsSuppliersAddress", secondary_data["contracts_suppliers_address"])
+        writer.value("bidSubcontractingDetails", secondary_data["bid_subcontracting_details"])
+        writer.value("ContractsValueAmount", get_value(tender_contract, "value", "amount"))
+        writer.value("ContractsContractID", tender_contract["id"])
+        writer.value("lotsTitle", get_value(lot, "title") if lot else None)
+        writer.value("procuringEntityKind", secondary_data["procuring_entity_kind"])
+
+
+def _write_contract_xml(writer, context):
+    contract = context["contract"]
+    with writer.element("contract"):
+        writer.value("contractId", contract["id"])
+        writer.value("contractNumber", get_value(contract, "contractNumber"))
+        writer.value("contractsPeriodStartDate", get_date_value(contract, "period", "startDate"))
+        writer.value("contractsPeriodEndDate", get_date_value(contract, "period", "endDate"))
+        writer.value("contractsValueAmount", get_value(contract, "value", "amount"))
+        writer.value("contractsValueCurrency", get_value(contract, "value", "currency"))
+        writer.value("contractsValueAmountNet", get_value(contract, "value", "amountNet"))
+        writer.value("contractsDateSigned", get_date_value(contract, "dateSigned"))
+        writer.value("contractsDocuments", get_value(contract, "documents"))
+    with writer.element("changes"):
+        for change in contract.get("changes", ""):
+            with writer.element("change"):
+                writer.value("changeId", change["id"])
+                writer.value("contractNumber", change["contractNumber"])
+                writer.value("changeRationale", get_value(change, "rationale"))
+                writer.value("changeRationaleTypes", get_value(change, "rationaleTypes"))
+                writer.value("contractsDateSigned", get_date_value(change, "dateSigned"))
+                writer.value("changeDocuments", get_value(change, "documents"))
+    _write_plan_xml(writer, context)
+    _write_tender_xml(writer, context)
+
+
+def render_change_xml(context):
+    return _stream_xml(_write_change_xml, context, "PrChange")
 
 
 def render_contract_xml(context):
-    contract = context["contract"]
-    maker = TreasuryElementMaker()
-    parts = [
-        maker.contract(
-            maker.contractId(contract["id"]),
-            maker.contractNumber(get_value(contract, "contractNumber")),
-            maker.contractsPeriodStartDate(get_date_value(contract, "period", "startDate")),
-            maker.contractsPeriodEndDate(get_date_value(contract, "period", "endDate")),
-            maker.contractsValueAmount(get_value(contract, "value", "amount")),
-            maker.contractsValueCurrency(get_value(contract, "value", "currency")),
-            maker.contractsValueAmountNet(get_value(contract, "value", "amountNet")),
-            maker.contractsDateSigned(get_date_value(contract, "dateSigned")),
-            maker.contractsDocuments(get_value(contract, "documents")),
-        ),
-        maker.changes(
-            * (maker.change(
-                maker.changeId(change["id"]),
-                maker.contractNumber(change["contractNumber"]),
-                maker.changeRationale(get_value(change, "rationale")),
-                maker.changeRationaleTypes(get_value(change, "rationaleTypes")),
-                maker.contractsDateSigned(get_date_value(change, "dateSigned")),
-                maker.changeDocuments(get_value(change, "documents")),
-            ) for change in contract.get("changes", ""))
-        ),
-    ]
-    plan = _build_plan_xml(maker, context)
-    if plan is not None:
-        parts.append(plan)
-    parts.append(
-        _build_tender_xml(maker, context)
-    )
-    xml = maker.root(
-        *parts,
-        method_name="PrContract",
-    )
-    return _render_tree(xml)
+    return _stream_xml(_write_contract_xml, context, "PrContract")
 
 
 def render_catalog_xml(context):
@@ -1,6 +1,8 @@
 from app.tests.base import BaseTestCase
 from unittest.mock import patch, Mock, call
 from copy import deepcopy
+from tasks_utils.tenders import TenderObjectNotFound
+from datetime import datetime, timezone
 from treasury.domain.prcontract import (
     get_first_stage_tender,
     prepare_contract_context,
@@ -15,7 +17,12 @@ from treasury.domain.prcontract import (
     get_bid_subcontracting_details,
     get_procuring_entity_kind,
     get_contract_date,
+    get_plan,
+    get_plan_by_buyer,
+    load_yaml_section,
+    get_initial_bids,
 )
+import yaml
 
 
 class TestCase(BaseTestCase):
@@ -48,6 +55,12 @@ class TestCase(BaseTestCase):
         result = get_contract_date("check_contract_task", contract)
         self.assertEqual(result, "2020-01-01T10:37:44.884962+03:00")
 
+        # 3
+        get_tender_mock.reset_mock()
+        result = get_contract_date("check_contract_task", contract, tender)
+        self.assertEqual(result, "2020-01-01T10:37:44.884962+03:00")
+        get_tender_mock.assert_not_called()
+
     @patch("treasury.domain.prcontract.get_public_api_data")
     def test_get_first_stage_tender(self, get_tender_mock):
 
@@ -354,6 +367,16 @@ class TestCase(BaseTestCase):
         self.assertEqual(result["cancellation"], tender["cancellations"][0])
         self.assertEqual(result["lot"], tender["lots"][1])
 
+    def test_prepare_context_missing_award(self):
+        contract = dict(id="222", awardID="33")
+        tender = dict(id="45677", contracts=[dict(id="222")], awards=[dict(id="22")])
+
+        with patch("treasury.domain.prcontract.prepare_contract_context"):
+            with self.assertRaises(TenderObjectNotFound) as e:
+                prepare_context(Mock(), contract, tender, dict(id="1243455"), dict())
+
+        self.assertEqual(str(e.exception), "Award 33 is not found in tender 45677")
+
     def test_prepare_context_without_tender_bids(self):
         task = Mock()
         enquiry_period_start_date = "2019-03-26T14:20:07.813257+03:00"
@@ -876,3 +899,162 @@ class TestCase(BaseTestCase):
         del tender["procuringEntity"]["kind"]
         result = get_procuring_entity_kind(tender_start_date, tender)
         self.assertEqual(result, None)
+
+    @patch("treasury.domain.prcontract.save_cached_plan")
+    @patch("treasury.domain.prcontract.get_cached_plan")
+    @patch("treasury.domain.prcontract.get_public_api_data")
+    def test_get_plan(self, get_data_mock, get_cached_plan_mock, save_cached_plan_mock):
+        task = Mock()
+        plan = {"id": "1" * 32, "dateModified": "2021-03-11T13:49:00+02:00"}
+
+        # 1 not cached
+        get_cached_plan_mock.return_value = None
+        get_data_mock.return_value = plan
+
+        result = get_plan(task, plan["id"])
+
+        self.assertEqual(result, plan)
+        get_cached_plan_mock.assert_called_once_with(plan["id"], fetched_since=None)
+        get_data_mock.assert_called_once_with(task, plan["id"], "plan")
+        save_cached_plan_mock.assert_called_once_with(plan)
+
+        # 2 cached
+        get_data_mock.reset_mock()
+        save_cached_plan_mock.reset_mock()
+        get_cached_plan_mock.return_value = plan
+
+        result = get_plan(task, plan["id"])
+
+        self.assertEqual(result, plan)
+        get_data_mock.assert_not_called()
+        save_cached_plan_mock.assert_not_called()
+
+        # 3 versions fetched before the tender was modified are skipped
+        get_cached_plan_mock.reset_mock()
+
+        get_plan(task, plan["id"], modified_since="2021-03-12T10:00:00+02:00")
+
+        get_cached_plan_mock.assert_called_once_with(
+            plan["id"], fetched_since=datetime(2021, 3, 12, 8, tzinfo=timezone.utc)
+        )
+
+    @patch("treasury.domain.prcontract.get_plan")
+    def test_get_plan_by_buyer(self, get_plan_mock):
+        task = Mock()
+        tender = {"plans": [{"id": "1"}, {"id": "2"}, {"id": "3"}]}
+        plans = {
+            "1": {"id": "1", "buyers": [{"identifier": {"id": "111"}}]},
+            "2": {"id": "2", "buyers": [{"identifier": {"id": "222"}}]},
+            "3": {"id": "3", "buyers": [{"identifier": {"id": "222"}}]},
+        }
+        get_plan_mock.side_effect = lambda _, plan_id, modified_since: plans[plan_id]
+
+        result = get_plan_by_buyer(task, tender, {"identifier": {"id": "222"}})
+        self.assertEqual(result, plans["2"])
+        self.assertEqual(
+            sorted(get_plan_mock.mock_calls),
+            [call(task, plan_id, modified_since=None) for plan_id in ("1", "2", "3")]
+        )
+
+        result = get_plan_by_buyer(task, tender, {"identifier": {"id": "333"}})
+        self.assertEqual(result, {})
+
+    def test_load_yaml_section(self):
+        content = b"""---
+id: 45677
+? [complex, key]
+: ignored
+results:
+  bids:
+  - {bidder: 1111, amount: 100}
+timeline:
+  round_1: {}
+  auction_start:
+    time: '2019-02-08T12:48:23.869715+02:00'
+    initial_bids:
+    - amount: 77400.0
+      bidder: 1111
+      date: '2019-02-08T12:48:23.869715+02:00'
+    - amount: 1/3
+      bidder: 2222
+      labels: [a, b]
+      flag: true
+  round_2: [
+"""  # the tail isn't valid yaml, parsing must stop before it
+        result = load_yaml_section(content, ("timeline", "auction_start", "initial_bids"))
+
+        self.assertEqual(
+            result,
+            [
+                {"amount": 77400.0, "bidder": 1111, "date": "2019-02-08T12:48:23.869715+02:00"},
+                {"amount": "1/3", "bidder": 2222, "labels": ["a", "b"], "flag": True},
+            ]
+        )
+
+        content = content.replace(b"  round_2: [\n", b"")
+        with self.assertRaises(KeyError):
+            load_yaml_section(content, ("timeline", "round_1", "initial_bids"))
+
+        with self.assertRaises(KeyError):
+            load_yaml_section(content, ("auction",))
+
+        with self.assertRaises(KeyError):
+            load_yaml_section(b"", ("timeline",))
+
+    def test_load_yaml_section_alias(self):
+        bidder = {"bidder": 1111, "amount": 10}
+        content = yaml.safe_dump(
+            {"results": [bidder], "timeline": {"auction_start": {"initial_bids": [bidder]}}}
+        ).encode()
+        self.assertIn(b"*id", content)
+
+        result = load_yaml_section(content, ("timeline", "auction_start", "initial_bids"))
+
+        self.assertEqual(result, [bidder])
+
+    @patch("treasury.domain.prcontract.save_cached_initial_bids")
+    @patch("treasury.domain.prcontract.get_cached_initial_bids")
+    @patch("treasury.domain.prcontract.download_file")
+    def test_get_initial_bids(self, download_file_mock, get_cached_mock, save_cached_mock):
+        task = Mock()
+        date_modified = "2019-02-08T13:00:00+02:00"
+        tender = dict(
+            id="45677",
+            documents=[
+                dict(title="audit_45677.yaml", url="<audit_url>", dateModified=date_modified),
+                dict(title="audit_45677_22222.yaml", url="<lot_audit_url>", dateModified=date_modified),
+            ]
+        )
+        download_file_mock.return_value = None, b"""timeline:
+          auction_start:
+            initial_bids:
+            - amount: 1/4
+              bidder: 1111"""
+
+        # 1 not cached
+        get_cached_mock.return_value = None
+
+        result = get_initial_bids(task, tender, "22222")
+
+        self.assertEqual(result, {"1111": 0.25})
+        download_file_mock.assert_called_once_with(task, "<lot_audit_url>")
+        get_cached_mock.assert_called_once_with("45677_22222", date_modified)
+        save_cached_mock.assert_called_once_with("45677_22222", date_modified, {"1111": 0.25})
+
+        # 2 cached
+        download_file_mock.reset_mock()
+        save_cached_mock.reset_mock()
+        get_cached_mock.return_value = {"1111": 0.25}
+
+        result = get_initial_bids(task, tender, None)
+
+        self.assertEqual(result, {"1111": 0.25})
+        get_cached_mock.assert_called_with("45677", date_modified)
+        download_file_mock.assert_not_called()
+        save_cached_mock.assert_not_called()
+
+        # 3 no audit
+        result = get_initial_bids(task, tender, "33333")
+
+        self.assertEqual(result, {})
+        download_file_mock.assert_not_called()
@@ -16,6 +16,7 @@ from treasury.settings import (
     PUT_TRANSACTION_FAILED_REQUESTS_EXCEPTIONS,
 )
 from tasks_utils.settings import RETRY_REQUESTS_EXCEPTIONS
+from tasks_utils.cookies import server_id_cookies
 
 
 @app.task
@@ -24,6 +25,11 @@ def _mock_task(self):
 
 
 class TestCase(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        server_id_cookies.reset()
+
     @patch("treasury.domain.prtrans.ds_upload")
     def test_save_transaction_xml(self, ds_upload_mock):
         ds_upload_mock.return_value = {
@@ -21,7 +21,8 @@ class CheckTestCase(unittest.TestCase):
                 await contract_handler(contract)
 
         check_contract_mock.delay.assert_called_once_with(
-            contract_id="123"
+            contract_id="123",
+            date_modified=contract["dateModified"],
         )
 
     @async_test
@@ -1,11 +1,18 @@
 from treasury.storage import get_collection, init_organisations_index, ORG_UNIQUE_FIELD, \
-    get_contract_context, save_contract_context, update_organisations, get_organisation
-from environment_settings import TREASURY_DB_NAME, TREASURY_ORG_COLLECTION
+    get_contract_context, save_contract_context, update_organisations, get_organisation, \
+    init_plans_index, get_cached_plan, save_cached_plan, PLAN_FINAL_STATUSES, \
+    init_audits_index, get_cached_initial_bids, save_cached_initial_bids, \
+    migrate_contract_contexts, save_xml_template, CONTEXT_SCHEMA_VERSION, \
+    get_contract_state, save_contract_state
+from environment_settings import TREASURY_DB_NAME, TREASURY_ORG_COLLECTION, TREASURY_PLANS_COLLECTION, \
+    TREASURY_AUDITS_COLLECTION, TREASURY_XML_TEMPLATES_COLLECTION
 from pymongo import UpdateOne, DeleteMany
 from pymongo.errors import PyMongoError
 from celery.exceptions import Retry
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, ANY
+from datetime import datetime
 import unittest
+import zlib
 
 
 class StorageTestCase(unittest.TestCase):
@@ -60,27 +67,153 @@ class StorageTestCase(unittest.TestCase):
     def test_save_contract_context(self, get_collection_mock):
         uid = "123"
         task = Mock()
-        data = ["ja ja"]
+        data = {
+            "contract": {"id": uid, "status": "active", "changes": [{"id": "1", "status": "active"}]},
+            "buyer": {"id": "2"},
+        }
 
         save_contract_context(task, uid, data)
 
         get_collection_mock.assert_called_once_with()
         get_collection_mock.return_value.update_one.assert_called_once_with(
             {"_id": uid},
-            {"$set": {"context": data}},
+            {"$set": {"context": ANY, "schema_version": CONTEXT_SCHEMA_VERSION}},
             upsert=True
         )
 
+        # reading the saved document
+        saved = get_collection_mock.return_value.update_one.call_args[0][1]["$set"]
+        self.assertIsInstance(saved["context"], bytes)
+        get_collection_mock.return_value.find_one.return_value = dict(saved)
+
+        result = get_contract_context(task, uid)
+
+        self.assertEqual(result, {"contract": {"id": uid, "changes": [{"id": "1"}]}})
+
     @patch("treasury.storage.get_collection")
     def test_save_contract_context_error(self, get_collection_mock):
         uid = "123"
         task = Mock(retry=Retry)
-        data = ["ja ja"]
+        data = {"contract": {"id": uid}}
         get_collection_mock.return_value.update_one.side_effect = PyMongoError("Connection error")
 
         with self.assertRaises(Retry):
             save_contract_context(task, uid, data)
 
+    @patch("treasury.storage.get_collection")
+    def test_get_contract_state(self, get_collection_mock):
+        state = {"dateModified": "2021-03-11T13:49:00+02:00"}
+        get_collection_mock.return_value.find_one.return_value = {"_id": "123", "state": state}
+
+        result = get_contract_state("123")
+
+        self.assertEqual(result, state)
+        get_collection_mock.assert_called_once_with()
+        get_collection_mock.return_value.find_one.assert_called_once_with({"_id": "123"}, {"state": 1})
+
+        get_collection_mock.return_value.find_one.return_value = {"_id": "123"}
+        self.assertIsNone(get_contract_state("123"))
+
+        get_collection_mock.return_value.find_one.return_value = None
+        self.assertIsNone(get_contract_state("123"))
+
+    @patch("treasury.storage.get_collection")
+    def test_get_contract_state_error(self, get_collection_mock):
+        get_collection_mock.return_value.find_one.side_effect = PyMongoError("Connection error")
+
+        self.assertIsNone(get_contract_state("123"))
+
+    @patch("treasury.storage.get_collection")
+    def test_save_contract_state(self, get_collection_mock):
+        contract = {
+            "id": "123",
+            "status": "active",
+            "dateModified": "2021-03-11T13:49:00+02:00",
+            "changes": [{"id": "333"}, {"id": "222"}],
+        }
+
+        save_contract_state(contract)
+
+        get_collection_mock.assert_called_once_with()
+        get_collection_mock.return_value.update_one.assert_called_once_with(
+            {"_id": "123"},
+            {"$set": {"state": {
+                "dateModified": "2021-03-11T13:49:00+02:00",
+            }}},
+        )
+
+    @patch("treasury.storage.get_collection")
+    def test_save_contract_state_error(self, get_collection_mock):
+        get_collection_mock.return_value.update_one.side_effect = PyMongoError("Connection error")
+
+        save_contract_state({"id": "123", "status": "active"})  # fails silently
+
+    @patch("treasury.storage.get_collection")
+    def test_migrate_contract_contexts(self, get_collection_mock):
+        collection = get_collection_mock.return_value
+        legacy_docs = [
+            {"_id": "1", "context": {"contract": {"id": "1", "status": "active"}}},
+            {"_id": "2"},
+        ]
+        collection.find.side_effect = [legacy_docs, []]
+
+        result = migrate_contract_contexts(batch_size=2)
+
+        self.assertEqual(result, 2)
+        query = {"schema_version": {"$ne": CONTEXT_SCHEMA_VERSION}}
+        collection.find.assert_called_with(query, limit=2)
+        operations = collection.bulk_write.call_args[0][0]
+        self.assertEqual(
+            operations,
+            [
+                UpdateOne(
+                    {"_id": doc["_id"], **query},
+                    {"$set": {"context": ANY, "schema_version": CONTEXT_SCHEMA_VERSION}},
+                )
+                for doc in legacy_docs
+            ]
+        )
+
+        # migrated contexts
+        task = Mock()
+        contexts = []
+        for operation in operations:
+            collection.find_one.return_value = operation._doc["$set"]
+            contexts.append(get_contract_context(task, "1"))
+        self.assertEqual(contexts, [{"contract": {"id": "1"}}, {}])
+
+    @patch("treasury.storage.get_collection")
+    def test_migrate_contract_contexts_error(self, get_collection_mock):
+        get_collection_mock.return_value.find.side_effect = PyMongoError("Connection error")
+
+        with self.assertRaises(Retry):
+            migrate_contract_contexts()
+
+    @patch("treasury.storage.get_collection")
+    def test_save_xml_template(self, get_collection_mock):
+        task = Mock()
+        xml = '<?xml version="1.0" encoding="windows-1251"?><root>Тест</root>'.encode("windows-1251")
+
+        save_xml_template(task, "123", xml, xml_was_changed=True)
+
+        get_collection_mock.assert_called_once_with(collection_name=TREASURY_XML_TEMPLATES_COLLECTION)
+        get_collection_mock.return_value.update_one.assert_called_once_with(
+            {"contract_id": "123", "xml_changed": True},
+            {"$set": {"xml_data": ANY, "schema_version": CONTEXT_SCHEMA_VERSION}},
+            upsert=True
+        )
+
+        saved = get_collection_mock.return_value.update_one.call_args[0][1]["$set"]
+        self.assertEqual(zlib.decompress(saved["xml_data"]), xml)
+
+    @patch("treasury.storage.get_collection")
+    def test_save_xml_template_error(self, get_collection_mock):
+        task = Mock(retry=Retry)
+        get_collection_mock.return_value.update_one.side_effect = PyMongoError("Connection error")
+
+        with self.assertRaises(Retry):
+            save_xml_template(task, "123", b"<root/>")
+
     @patch("treasury.storage.get_collection")
     def test_update_organisations(self, get_collection_mock):
         task = Mock()
@@ -134,3 +267,131 @@ class StorageTestCase(unittest.TestCase):
 
         with self.assertRaises(Retry):
             get_organisation(task, uid)
+
+    @patch("treasury.storage.get_collection")
+    def test_init_plans_index(self, get_collection_mock):
+        get_collection_mock.return_value.create_index.side_effect = PyMongoError("Connection error")
+
+        with self.assertRaises(Retry):
+            init_plans_index()
+
+        get_collection_mock.assert_called_once_with(TREASURY_PLANS_COLLECTION)
+
+    @patch("treasury.storage.get_collection")
+    def test_get_cached_plan(self, get_collection_mock):
+        plan = {"id": "1" * 32}
+        get_collection_mock.return_value.find_one.return_value = {"plan": plan}
+
+        result = get_cached_plan(plan["id"])
+
+        self.assertEqual(result, plan)
+        get_collection_mock.assert_called_once_with(collection_name=TREASURY_PLANS_COLLECTION)
+        get_collection_mock.return_value.find_one.assert_called_once_with(
+            {"plan_id": plan["id"]},
+            sort=[("dateModified", -1)],
+        )
+
+        get_collection_mock.return_value.find_one.return_value = None
+        self.assertIsNone(get_cached_plan(plan["id"]))
+
+    @patch("treasury.storage.get_collection")
+    def test_get_cached_plan_fetched_since(self, get_collection_mock):
+        fetched_since = datetime(2021, 3, 12, 8)
+
+        get_cached_plan("1" * 32, fetched_since=fetched_since)
+
+        get_collection_mock.return_value.find_one.assert_called_once_with(
+            {
+                "plan_id": "1" * 32,
+                "$or": [
+                    {"plan.status": {"$in": PLAN_FINAL_STATUSES}},
+                    {"createdAt": {"$gte": fetched_since}},
+                ],
+            },
+            sort=[("dateModified", -1)],
+        )
+
+    @patch("treasury.storage.get_collection")
+    def test_get_cached_plan_error(self, get_collection_mock):
+        get_collection_mock.return_value.find_one.side_effect = PyMongoError("Connection error")
+
+        result = get_cached_plan("1" * 32)
+
+        self.assertIsNone(result)
+
+    @patch("treasury.storage.get_collection")
+    def test_save_cached_plan(self, get_collection_mock):
+        plan = {"id": "1" * 32, "dateModified": "2021-03-11T13:49:00+02:00"}
+
+        save_cached_plan(plan)
+
+        get_collection_mock.assert_called_once_with(collection_name=TREASURY_PLANS_COLLECTION)
+        get_collection_mock.return_value.update_one.assert_called_once_with(
+            {"_id": f"{plan['id']}_{plan['dateModified']}"},
+            {"$set": {
+                "plan_id": plan["id"],
+                "dateModified": plan["dateModified"],
+                "plan": plan,
+                "createdAt": ANY,
+            }},
+            upsert=True
+        )
+
+    @patch("treasury.storage.get_collection")
+    def test_save_cached_plan_error(self, get_collection_mock):
+        get_collection_mock.return_value.update_one.side_effect = PyMongoError("Connection error")
+
+        save_cached_plan({"id": "1" * 32})  # fails silently
+
+    @patch("treasury.storage.get_collection")
+    def test_init_audits_index(self, get_collection_mock):
+        get_collection_mock.return_value.create_index.side_effect = PyMongoError("Connection error")
+
+        with self.assertRaises(Retry):
+            init_audits_index()
+
+        get_collection_mock.assert_called_once_with(TREASURY_AUDITS_COLLECTION)
+
+    @patch("treasury.storage.get_collection")
+    def test_get_cached_initial_bids(self, get_collection_mock):
+        initial_bids = {"1111": 77400.0}
+        get_collection_mock.return_value.find_one.return_value = {"initial_bids": initial_bids}
+
+        result = get_cached_initial_bids("1" * 32, "2021-03-11T13:49:00+02:00")
+
+        self.assertEqual(result, initial_bids)
+        get_collection_mock.assert_called_once_with(collection_name=TREASURY_AUDITS_COLLECTION)
+        get_collection_mock.return_value.find_one.assert_called_once_with(
+            {"_id": f"{'1' * 32}_2021-03-11T13:49:00+02:00"}
+        )
+
+        get_collection_mock.return_value.find_one.return_value = None
+        self.assertIsNone(get_cached_initial_bids("1" * 32, "2021-03-11T13:49:00+02:00"))
+
+    @patch("treasury.storage.get_collection")
+    def test_get_cached_initial_bids_error(self, get_collection_mock):
+        get_collection_mock.return_value.find_one.side_effect = PyMongoError("Connection error")
+
+        result = get_cached_initial_bids("1" * 32, "2021-03-11T13:49:00+02:00")
+
+        self.assertIsNone(result)
+
+    @patch("treasury.storage.get_collection")
+    def test_save_cached_initial_bids(self, get_collection_mock):
+        save_cached_initial_bids("1" * 32, "2021-03-11T13:49:00+02:00", {"1111": 77400.0})
+
+        get_collection_mock.assert_called_once_with(collection_name=TREASURY_AUDITS_COLLECTION)
+        get_collection_mock.return_value.update_one.assert_called_once_with(
+            {"_id": f"{'1' * 32}_2021-03-11T13:49:00+02:00"},
+            {"$set": {
+                "initial_bids": {"1111": 77400.0},
+                "createdAt": ANY,
+            }},
+            upsert=True
+        )
+
+    @patch("treasury.storage.get_collection")
+    def test_save_cached_initial_bids_error(self, get_collection_mock):
+        get_collection_mock.return_value.update_one.side_effect = PyMongoError("Connection error")
+
+        save_cached_initial_bids("1" * 32, "2021-03-11T13:49:00+02:00", {})  # fails silently
@@ -76,6 +76,7 @@ class CheckTestCase(unittest.TestCase):
         with self.assertRaises(Retry):
             receive_org_catalog(message_id)
 
+    @patch("treasury.tasks.save_contract_state")
     @patch("treasury.tasks.send_contract_xml")
     @patch("treasury.tasks.save_contract_context")
     @patch("treasury.tasks.prepare_context")
@@ -84,7 +85,8 @@ class CheckTestCase(unittest.TestCase):
     @patch("treasury.tasks.get_first_stage_tender")
     @patch("treasury.tasks.get_public_api_data")
     def test_check_contract(self, get_data_mock, get_first_stage_tender_mock, get_org_mock, get_context_mock,
-                            prepare_context_mock, save_context_mock, send_contract_xml_mock):
+                            prepare_context_mock, save_context_mock, send_contract_xml_mock,
+                            save_state_mock):
         contract_id = "4444"
         get_org_mock.return_value = {"org data"}
         contract_data = dict(
@@ -143,6 +145,7 @@ class CheckTestCase(unittest.TestCase):
             prepare_context_mock.return_value
         )
         send_contract_xml_mock.delay.assert_called_once_with(contract_id)
+        save_state_mock.assert_called_once_with(contract_data)
 
     @patch("treasury.tasks.send_contract_xml")
     @patch("treasury.tasks.save_contract_context")
@@ -392,6 +395,7 @@ class CheckTestCase(unittest.TestCase):
         save_context_mock.assert_not_called()
         send_contract_xml_mock.delay.assert_not_called()
 
+    @patch("treasury.tasks.save_contract_state")
     @patch("treasury.tasks.send_change_xml")
     @patch("treasury.tasks.save_contract_context")
     @patch("treasury.tasks.prepare_contract_context")
@@ -399,7 +403,7 @@ class CheckTestCase(unittest.TestCase):
     @patch("treasury.tasks.get_organisation")
     @patch("treasury.tasks.get_public_api_data")
     def test_check_contract_update(self, get_data_mock, get_org_mock, get_context_mock, prepare_context_mock,
-                                   save_context_mock, send_change_xml_mock):
+                                   save_context_mock, send_change_xml_mock, save_state_mock):
         contract_id = "4444"
         tender_id = "555555555"
         get_org_mock.return_value = {"org data"}
@@ -441,6 +445,7 @@ class CheckTestCase(unittest.TestCase):
             contract_id,
             {"contract": contract_data}
         )
+        save_state_mock.assert_called_once_with(contract_data)
         self.assertEqual(
             send_change_xml_mock.delay.mock_calls,
             [
@@ -449,6 +454,7 @@ class CheckTestCase(unittest.TestCase):
             ]
         )
 
+    @patch("treasury.tasks.save_contract_state")
     @patch("treasury.tasks.send_change_xml")
     @patch("treasury.tasks.save_contract_context")
     @patch("treasury.tasks.prepare_contract_context")
@@ -457,7 +463,8 @@ class CheckTestCase(unittest.TestCase):
     @patch("treasury.domain.prcontract.get_public_api_data")
     @patch("treasury.tasks.get_public_api_data")
     def test_check_contract_no_updates(self, get_data_mock, get_data_mock_prcontract, get_org_mock, get_context_mock,
-                                       prepare_context_mock, save_context_mock, send_change_xml_mock):
+                                       prepare_context_mock, save_context_mock, send_change_xml_mock,
+                                       save_state_mock):
         contract_id = "4444"
         tender_id = "555555555"
         get_org_mock.return_value = {"org data"}
@@ -488,8 +495,7 @@ class CheckTestCase(unittest.TestCase):
             procurementMethodType="aboveThresholdUA",
 
         )
-        get_data_mock.return_value = contract_data
-        get_data_mock_prcontract.return_value = tender_data
+        get_data_mock.side_effect = [contract_data, tender_data]
         get_context_mock.return_value = dict(contract=dict(changes=[
             dict(id="111"),
             dict(id="222"),
@@ -500,11 +506,56 @@ class CheckTestCase(unittest.TestCase):
 
         # checks
         self.assertEqual(get_data_mock.call_count, 2)
-        get_data_mock_prcontract.assert_called_once_with(check_contract, contract_data["tender_id"], "tender")
+        get_data_mock_prcontract.assert_not_called()  # already loaded tender is used to get the contract date
         get_org_mock.assert_called_once_with(check_contract, contract_data["procuringEntity"]["identifier"]["id"])
         prepare_context_mock.assert_not_called()
         save_context_mock.assert_not_called()
         send_change_xml_mock.assert_not_called()
+        save_state_mock.assert_called_once_with(contract_data)
+
+    @patch("treasury.tasks.get_contract_context")
+    @patch("treasury.tasks.get_public_api_data")
+    @patch("treasury.tasks.get_contract_state")
+    def test_check_contract_not_modified(self, get_state_mock, get_data_mock, get_context_mock):
+        contract_id = "4444"
+        get_state_mock.return_value = {"dateModified": "2021-03-11T13:49:00+02:00"}
+
+        for date_modified in ("2021-03-11T13:49:00+02:00", "2021-03-11T11:49:00+00:00"):
+            check_contract(contract_id, date_modified=date_modified)
+
+        self.assertEqual(get_state_mock.mock_calls, [call(contract_id), call(contract_id)])
+        get_data_mock.assert_not_called()
+        get_context_mock.assert_not_called()
+
+    @patch("treasury.tasks.get_public_api_data")
+    @patch("treasury.tasks.get_contract_state")
+    def test_check_contract_modified(self, get_state_mock, get_data_mock):
+        contract_id = "4444"
+        get_data_mock.return_value = dict(id=contract_id, status="cancelled", tender_id="1234")
+
+        for state, date_modified in (
+            (None, "2021-03-11T13:49:01+02:00"),
+            ({"dateModified": "2021-03-11T13:49:00+02:00"}, "2021-03-11T13:49:01+02:00"),
+            # later, though the string is less
+            ({"dateModified": "2021-03-11T13:49:00+02:00"}, "2021-03-11T11:50:00+00:00"),
+        ):
+            get_state_mock.return_value = state
+            get_data_mock.reset_mock()
+
+            check_contract(contract_id, date_modified=date_modified)
+
+            self.assertEqual(get_data_mock.mock_calls[0], call(check_contract, contract_id, "contract"))
+
+    @patch("treasury.tasks.get_public_api_data")
+    @patch("treasury.tasks.get_contract_state")
+    def test_check_contract_without_date_modified(self, get_state_mock, get_data_mock):
+        contract_id = "4444"
+        get_data_mock.return_value = dict(id=contract_id, status="cancelled", tender_id="1234")
+
+        check_contract(contract_id)
+
+        get_state_mock.assert_not_called()
+        self.assertEqual(get_data_mock.mock_calls[0], call(check_contract, contract_id, "contract"))
 
     @patch("treasury.tasks.save_xml_template")
     @patch("treasury.tasks.sign_data")
@@ -2,8 +2,10 @@
 
 from treasury.templates import (
     render_catalog_xml, render_change_xml, render_contract_xml,
-    format_date, render_transactions_confirmation_xml,
+    format_date, render_transactions_confirmation_xml, project_context, TreasuryXmlWriter,
 )
+from lxml import etree
+from io import BytesIO
 from copy import deepcopy
 from datetime import datetime
 import unittest
@@ -460,6 +462,39 @@ class TemplatesTestCase(unittest.TestCase):
             b'</root>'
         )
 
+    def test_contract_projected_context(self):
+        test_contract["items"] = test_tender["items"]
+        context = dict(
+            contract=test_contract,
+            plan=test_plan,
+            tender=test_tender,
+            tender_bid=test_tender["bids"][0],
+            tender_contract=test_tender_contract,
+            cancellation={"id": "1"},
+            initial_bids=test_initial_bids,
+            lot=test_lot,
+            secondary_data=test_secondary_data,
+            buyer={"id": "2"},
+        )
+        projected = project_context(deepcopy(context))
+
+        self.assertNotIn("cancellation", projected)
+        self.assertNotIn("buyer", projected)
+        self.assertNotIn("contracts", projected["tender"])
+        self.assertEqual(render_contract_xml(projected), render_contract_xml(context))
+
+        for projected_change, change in zip(projected["contract"]["changes"], context["contract"]["changes"]):
+            self.assertEqual(
+                render_change_xml(dict(projected, change=projected_change)),
+                render_change_xml(dict(context, change=change)),
+            )
+
+    def test_project_context(self):
+        data = {"id": 1, "items": [{"id": 2, "name": "a"}, {"name": "b"}], "lot": None}
+        fields = {"items": {"id": True}, "lot": {"id": True}, "plan": True}
+
+        self.assertEqual(project_context(data, fields), {"items": [{"id": 2}, {}], "lot": None})
+
     def test_contract_min(self):
         context = dict(
             contract=test_contract,
@@ -534,6 +569,71 @@ class TemplatesTestCase(unittest.TestCase):
             expected_result
         )
 
+    def test_large_contract(self):
+        contract = deepcopy(test_contract)
+        tender = deepcopy(test_tender)
+        initial_bids = {}
+        contract["changes"] = []
+        contract["items"] = []
+        tender["bids"] = []
+        tender["milestones"] = []
+        for i in range(30):
+            contract["changes"].append(dict(
+                id=f"change-{i}", contractNumber="" if i % 7 else f"{i} & <{i}>",
+                rationale="Зміна ціни €" if i % 2 else None, rationaleTypes=["a", "b"][:i % 3],
+                dateSigned=datetime(2020, 1, 1 + i % 28), documents=[] if i % 5 else "ZG9j",
+            ))
+            contract["items"].append(dict(
+                deepcopy(test_tender["items"][i % len(test_tender["items"])]),
+                id=f"item-{i}", description=f"Товар \r\n\t{i} 😀" if i % 3 else "",
+            ))
+            tender["bids"].append(dict(
+                id=f"bid-{i}", bid_suppliers_identifier_name=f"ТОВ \"Постачальник {i}\"",
+                value={"amount": i * 1.5} if i % 4 else {}, award_qualified_eligible=[True, None, "no"][i % 3],
+            ))
+            tender["milestones"].append(dict(
+                id=f"milestone-{i}", title="" if i % 2 else "signingTheContract",
+                duration={"days": i, "type": "banking"}, percentage=i % 100,
+            ))
+            if i % 2:
+                initial_bids[f"bid-{i}"] = i * 2
+        context = dict(
+            contract=contract,
+            plan=test_plan,
+            tender=tender,
+            tender_bid=tender["bids"][0],
+            tender_contract=test_tender_contract,
+            initial_bids=initial_bids,
+            lot=test_lot,
+            secondary_data=test_secondary_data,
+        )
+
+        with open("treasury/tests/fixtures/large_contract.xml", "rb") as f:
+            self.assertEqual(render_contract_xml(context), f.read())
+
+        with open("treasury/tests/fixtures/large_changes.xml", "rb") as f:
+            expected_changes = f.read().splitlines()
+        self.assertEqual(
+            [render_change_xml(dict(context, change=change)) for change in contract["changes"]],
+            expected_changes,
+        )
+
+    def test_xml_writer(self):
+        output = BytesIO()
+        with etree.xmlfile(output) as xf:
+            writer = TreasuryXmlWriter(xf)
+            with writer.element("root", name="test"):
+                with writer.element("empty"):
+                    with writer.element("nested"):
+                        writer.value("value", None)
+                with writer.element("ul"):
+                    writer.value("li", "1")
+                    writer.value("li", None)
+                    writer.value("li", "")
+                writer.value("p", "text")
+
+        self.assertEqual(output.getvalue(), b'<root name="test"><ul><li>1</li><li></li></ul><p>text</p></root>')
+
     def test_build_transactions_result_xml(self):
         params = dict(
             register_id='123',